@@ -1,1906 +1,6056 @@
-import asyncio
-import json
-import os
-import re
-import time
-import hashlib
-import logging
-from datetime import datetime
-from collections import Counter
-from typing import List, Dict
-from telethon import TelegramClient, functions, types
-from telethon.tl.types import User, Chat, Channel
-import requests
-from bs4 import BeautifulSoup
-from config import API_CONFIG
-
-# Configuración de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('telegram_osint.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
-
-
-class TelegramOSINT:
-    def __init__(self, api_id, api_hash, session_name='telegram_osint'):
-        self.api_id = int(api_id)
-        self.api_hash = api_hash
-        self.client = TelegramClient(session_name, api_id, api_hash)
-        self.results = {}
-
-    async def start_client(self):
-        """Iniciar el cliente de Telegram"""
-        await self.client.start()
-        logger.info("Cliente de Telegram iniciado")
-
-    def validate_telegram_input(self, input_str):
-        """Validar y formatear input para Telegram"""
-        input_str = input_str.strip()
-        if input_str.isdigit():
-            return {'type': 'phone', 'value': input_str}
-        if input_str.startswith('@'):
-            return {'type': 'username', 'value': input_str}
-        if ' ' in input_str:
-            possible_username = f"@{input_str.replace(' ', '').lower()}"
-            return {'type': 'name', 'value': input_str, 'suggested_username': possible_username}
-        return {'type': 'username', 'value': f"@{input_str}"}
-
-    async def get_user_info(self, username_or_phone):
-        """Obtener información completa de un usuario - VERSIÓN MEJORADA"""
-        try:
-            input_info = self.validate_telegram_input(username_or_phone)
-            cleaned_input = input_info['value']
-            logger.info(f"🔍 Buscando: {username_or_phone} -> {cleaned_input} ({input_info['type']})")
-
-            if input_info['type'] == 'name':
-                print(f"🔍 Buscando usuario por nombre: {username_or_phone}")
-                if 'suggested_username' in input_info:
-                    try:
-                        logger.info(f"🔍 Intentando con username sugerido: {input_info['suggested_username']}")
-                        entity = await self.client.get_entity(input_info['suggested_username'])
-                        logger.info(f"✅ Usuario encontrado con username sugerido")
-                    except Exception as e:
-                        logger.info(f"❌ No se encontró con username sugerido: {e}")
-                        users_found = await self.search_user_by_name(username_or_phone)
-                        if users_found:
-                            if len(users_found) == 1:
-                                user = users_found[0]
-                                if user['username'] != 'N/A':
-                                    logger.info(f"🔍 Usando usuario encontrado en grupos: @{user['username']}")
-                                    return await self.get_user_info(user['username'])
-                            raise ValueError(f"Se encontraron múltiples usuarios. Use username específico.")
-                        else:
-                            raise ValueError(f"No se pudo encontrar el usuario: {username_or_phone}")
-                else:
-                    entity = await self.client.get_entity(cleaned_input)
-            else:
-                entity = await self.client.get_entity(cleaned_input)
-
-            user_info = {
-                'id': entity.id,
-                'username': getattr(entity, 'username', 'N/A'),
-                'first_name': getattr(entity, 'first_name', 'N/A'),
-                'last_name': getattr(entity, 'last_name', 'N/A'),
-                'phone': getattr(entity, 'phone', 'N/A'),
-                'verified': getattr(entity, 'verified', False),
-                'premium': getattr(entity, 'premium', False),
-                'bot': getattr(entity, 'bot', False),
-                'restricted': getattr(entity, 'restricted', False),
-                'scam': getattr(entity, 'scam', False),
-                'fake': getattr(entity, 'fake', False),
-                'status': str(getattr(entity, 'status', 'N/A')),
-                'dc_id': getattr(entity, 'dc_id', 'N/A'),
-                'lang_code': getattr(entity, 'lang_code', 'N/A'),
-                'photo': None,
-                'photo_id': None,
-                'common_chats_count': 0,
-                'last_seen': None,
-                'bio': getattr(entity, 'about', 'N/A')
-            }
-
-            if entity.photo:
-                user_info['photo_id'] = entity.photo.photo_id
-                photo_path = await self.download_profile_photo(entity)
-                user_info['photo'] = photo_path
-
-            if hasattr(entity, 'status') and entity.status:
-                if hasattr(entity.status, 'was_online'):
-                    user_info['last_seen'] = entity.status.was_online.isoformat()
-
-            try:
-                common_chats = await self.client(functions.messages.GetCommonChatsRequest(
-                    user_id=entity.id,
-                    max_id=0,
-                    limit=100
-                ))
-                user_info['common_chats_count'] = len(common_chats.chats)
-            except:
-                user_info['common_chats_count'] = 0
-
-            return user_info
-
-        except Exception as e:
-            logger.error(f"Error obteniendo información del usuario '{username_or_phone}': {e}")
-            return None
-
-    async def search_user_by_name(self, name):
-        """Buscar usuario por nombre en chats y grupos"""
-        try:
-            logger.info(f"🔍 Buscando usuario por nombre: {name}")
-            found_users = []
-            async for dialog in self.client.iter_dialogs(limit=50):
-                if dialog.is_group or dialog.is_channel:
-                    try:
-                        participants = await self.client.get_participants(dialog.entity, limit=100)
-                        for participant in participants:
-                            full_name = f"{getattr(participant, 'first_name', '')} {getattr(participant, 'last_name', '')}".strip()
-                            if name.lower() in full_name.lower():
-                                user_info = {
-                                    'id': participant.id,
-                                    'username': getattr(participant, 'username', 'N/A'),
-                                    'first_name': getattr(participant, 'first_name', 'N/A'),
-                                    'last_name': getattr(participant, 'last_name', 'N/A'),
-                                    'found_in': dialog.name,
-                                    'chat_type': 'group' if dialog.is_group else 'channel'
-                                }
-                                found_users.append(user_info)
-                                logger.info(f"✅ Encontrado: {full_name} en {dialog.name}")
-                    except Exception:
-                        continue
-            return found_users
-        except Exception as e:
-            logger.error(f"Error buscando por nombre: {e}")
-            return []
-
-    async def download_profile_photo(self, entity, download_folder='photos'):
-        """Descargar foto de perfil"""
-        try:
-            if not os.path.exists(download_folder):
-                os.makedirs(download_folder)
-            photo_path = await self.client.download_profile_photo(
-                entity,
-                file=os.path.join(download_folder, f"{entity.id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.jpg")
-            )
-            return photo_path
-        except Exception as e:
-            logger.error(f"Error descargando foto: {e}")
-            return None
-
-    # --- Métodos de fotos ---
-    async def get_profile_photos(self, username):
-        """Obtener fotos de perfil de un usuario"""
-        try:
-            entity = await self.client.get_entity(username)
-            photos = await self.client.get_profile_photos(entity, limit=10)
-            result = []
-            for photo in photos:
-                photo_file = await self.client.download_media(photo, file=bytes)
-                if photo_file:
-                    result.append({
-                        'date': photo.date,
-                        'size': photo.sizes[-1] if photo.sizes else None,
-                        'data': photo_file
-                    })
-            return result
-        except Exception as e:
-            print(f"❌ Error obteniendo fotos de perfil: {e}")
-            return []
-
-    async def search_public_photos(self, username, limit=100):
-        """Buscar fotos en mensajes públicos"""
-        try:
-            entity = await self.client.get_entity(username)
-            photos = []
-            async for message in self.client.iter_messages(entity, limit=limit):
-                if message.photo:
-                    photos.append({
-                        'date': message.date,
-                        'id': message.id,
-                        'text': message.text,
-                        'media_type': 'photo'
-                    })
-            return photos
-        except Exception as e:
-            print(f"❌ Error buscando fotos públicas: {e}")
-            return []
-
-    async def get_all_old_photos(self, username, limit=2000):
-        """Extrae TODAS las fotos antiguas, incluidas las que el usuario cree borradas."""
-        try:
-            entity = await self.client.get_entity(username)
-            photos = []
-            recovery_dir = f"recovered_photos_{username}"
-            os.makedirs(recovery_dir, exist_ok=True)
-            logger.info(f"🔍 Buscando fotos antiguas de {username} (límite: {limit})...")
-            photo_count = 0
-            async for msg in self.client.iter_messages(entity, limit=limit):
-                if msg.photo:
-                    photo_info = {
-                        "message_id": msg.id,
-                        "date": msg.date.isoformat(),
-                        "photo_id": msg.photo.id,
-                        "saved_at": None
-                    }
-                    filename = f"{username}_{msg.id}_{msg.date.strftime('%Y%m%d_%H%M%S')}.jpg"
-                    path = os.path.join(recovery_dir, filename)
-                    try:
-                        await msg.download_media(path)
-                        photo_info["saved_at"] = path
-                        photo_count += 1
-                        logger.info(f"✅ Foto recuperada: {filename}")
-                    except Exception as download_error:
-                        logger.error(f"Error descargando foto {msg.id}: {download_error}")
-                        photo_info["download_error"] = str(download_error)
-                    photos.append(photo_info)
-            logger.info(f"📸 Total de fotos recuperadas: {photo_count}")
-            return photos
-        except Exception as e:
-            logger.error(f"Error recuperando fotos antiguas: {e}")
-            return []
-
-    # --- Análisis de mensajes ---
-    def serialize_reactions(self, reactions):
-        """Convierte un objeto MessageReactions a un diccionario JSON-serializable."""
-        if reactions is None:
-            return None
-        try:
-            result = {}
-            for reaction_count in reactions.results:
-                emoticon = getattr(reaction_count.reaction, 'emoticon', str(reaction_count.reaction))
-                result[emoticon] = reaction_count.count
-            return result
-        except Exception as e:
-            logger.debug(f"Error serializando reacciones: {e}")
-            return str(reactions)
-
-    async def get_full_message_history(self, username, limit=500):
-        """Obtener el historial completo de mensajes con contenido"""
-        try:
-            entity = await self.client.get_entity(username)
-            messages = []
-            logger.info(f"📨 Obteniendo {limit} mensajes de {username}...")
-            async for message in self.client.iter_messages(entity, limit=limit):
-                msg_data = {
-                    'id': message.id,
-                    'date': message.date.isoformat(),
-                    'text': message.text if message.text else '',
-                    'media_type': type(message.media).__name__ if message.media else 'text',
-                    'is_reply': bool(message.reply_to),
-                    'is_forward': bool(message.fwd_from),
-                    'views': getattr(message, 'views', 0),
-                    'forwards': getattr(message, 'forwards', 0),
-                    'reactions': self.serialize_reactions(getattr(message, 'reactions', None))
-                }
-                if message.text:
-                    urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', message.text)
-                    msg_data['urls'] = urls
-                if message.media:
-                    if hasattr(message.media, 'document'):
-                        if hasattr(message.media.document, 'mime_type'):
-                            msg_data['mime_type'] = message.media.document.mime_type
-                        msg_data['file_size'] = getattr(message.media.document, 'size', 0)
-                messages.append(msg_data)
-            logger.info(f"✅ Obtenidos {len(messages)} mensajes")
-            return messages
-        except Exception as e:
-            logger.error(f"Error obteniendo historial de mensajes: {e}")
-            return []
-
-    async def get_all_words_used(self, username, limit=1000):
-        """Obtener todas las palabras únicas usadas por el usuario"""
-        try:
-            entity = await self.client.get_entity(username)
-            all_words = Counter()
-            logger.info(f"🔤 Analizando palabras de {limit} mensajes...")
-            async for message in self.client.iter_messages(entity, limit=limit):
-                if message.text:
-                    text_clean = re.sub(r'http[s]?://\S+', '', message.text)
-                    words = re.findall(r'\b[a-zA-ZáéíóúñÁÉÍÓÚÑ]+\b', text_clean.lower())
-                    common_words = {
-                        'el', 'la', 'de', 'que', 'y', 'en', 'un', 'es', 'se', 'no',
-                        'te', 'lo', 'le', 'me', 'mi', 'tu', 'su', 'los', 'las', 'del',
-                        'the', 'and', 'you', 'for', 'are', 'with', 'this', 'that', 'have'
-                    }
-                    filtered_words = [w for w in words if w not in common_words and len(w) > 2]
-                    all_words.update(filtered_words)
-            word_stats = {
-                'total_unique_words': len(all_words),
-                'most_common_words': all_words.most_common(50),
-                'word_frequency': dict(all_words.most_common(100))
-            }
-            logger.info(f"✅ Encontradas {word_stats['total_unique_words']} palabras únicas")
-            return word_stats
-        except Exception as e:
-            logger.error(f"Error analizando palabras: {e}")
-            return None
-
-    async def get_message_categories(self, username, limit=500):
-        """Categorizar mensajes por tipo de contenido"""
-        try:
-            entity = await self.client.get_entity(username)
-            categories = {
-                'text_only': [],
-                'with_links': [],
-                'with_media': [],
-                'questions': [],
-                'exclamations': [],
-                'long_messages': [],
-                'short_messages': []
-            }
-            async for message in self.client.iter_messages(entity, limit=limit):
-                if message.text:
-                    msg_data = {
-                        'id': message.id,
-                        'date': message.date.isoformat(),
-                        'text': message.text,
-                        'length': len(message.text)
-                    }
-                    categories['text_only'].append(msg_data)
-                    if re.search(r'http[s]?://', message.text):
-                        categories['with_links'].append(msg_data)
-                    if '?' in message.text:
-                        categories['questions'].append(msg_data)
-                    if '!' in message.text:
-                        categories['exclamations'].append(msg_data)
-                    if len(message.text) > 200:
-                        categories['long_messages'].append(msg_data)
-                    if len(message.text) < 50:
-                        categories['short_messages'].append(msg_data)
-                if message.media:
-                    media_data = {
-                        'id': message.id,
-                        'date': message.date.isoformat(),
-                        'media_type': type(message.media).__name__,
-                        'caption': message.text if message.text else ''
-                    }
-                    categories['with_media'].append(media_data)
-
-            category_stats = {
-                'text_only_count': len(categories['text_only']),
-                'with_links_count': len(categories['with_links']),
-                'with_media_count': len(categories['with_media']),
-                'questions_count': len(categories['questions']),
-                'exclamations_count': len(categories['exclamations']),
-                'long_messages_count': len(categories['long_messages']),
-                'short_messages_count': len(categories['short_messages'])
-            }
-            return {'categories': categories, 'stats': category_stats}
-        except Exception as e:
-            logger.error(f"Error categorizando mensajes: {e}")
-            return None
-
-    async def get_conversation_topics(self, username, limit=500):
-        """Identificar temas de conversación basados en palabras clave"""
-        try:
-            entity = await self.client.get_entity(username)
-            topics_keywords = {
-                'tecnología': {'tecnología', 'tecnologia', 'tech', 'software', 'hardware', 'app', 'aplicación', 'internet', 'web', 'digital', 'computadora', 'ordenador', 'móvil', 'celular', 'smartphone'},
-                'programación': {'programación', 'programacion', 'código', 'codigo', 'python', 'javascript', 'java', 'html', 'css', 'desarrollo', 'developer', 'coding', 'script', 'api'},
-                'videojuegos': {'juego', 'videojuego', 'gaming', 'gamer', 'play', 'jugando', 'consola', 'steam', 'nintendo', 'playstation', 'xbox', 'minecraft', 'fortnite'},
-                'música': {'música', 'musica', 'canción', 'cancion', 'artista', 'banda', 'album', 'spotify', 'youtube music', 'escuchar', 'ritmo', 'melodía'},
-                'películas': {'película', 'pelicula', 'cine', 'netflix', 'disney', 'amazon prime', 'serie', 'actor', 'actriz', 'director', 'guion'},
-                'deportes': {'deporte', 'fútbol', 'futbol', 'baloncesto', 'tenis', 'natación', 'ejercicio', 'gimnasio', 'entrenamiento', 'partido', 'competencia'},
-                'comida': {'comida', 'receta', 'cocina', 'restaurante', 'cena', 'almuerzo', 'desayuno', 'postre', 'bebida', 'receta', 'cocinar'},
-                'viajes': {'viaje', 'viajar', 'vacaciones', 'turismo', 'hotel', 'avión', 'aeropuerto', 'destino', 'playa', 'montaña', 'ciudad'},
-                'trabajo': {'trabajo', 'empleo', 'oficina', 'jefe', 'compañero', 'reunión', 'proyecto', 'deadline', 'cliente', 'empresa'},
-                'estudio': {'estudio', 'universidad', 'colegio', 'examen', 'tarea', 'profesor', 'clase', 'aprender', 'educación', 'curso'}
-            }
-            topic_counts = {topic: 0 for topic in topics_keywords.keys()}
-            topic_messages = {topic: [] for topic in topics_keywords.keys()}
-            async for message in self.client.iter_messages(entity, limit=limit):
-                if message.text:
-                    text_lower = message.text.lower()
-                    for topic, keywords in topics_keywords.items():
-                        if any(keyword in text_lower for keyword in keywords):
-                            topic_counts[topic] += 1
-                            topic_messages[topic].append({
-                                'id': message.id,
-                                'date': message.date.isoformat(),
-                                'text': message.text[:200] + '...' if len(message.text) > 200 else message.text
-                            })
-            sorted_topics = sorted(topic_counts.items(), key=lambda x: x[1], reverse=True)
-            return {
-                'topic_counts': dict(sorted_topics),
-                'topic_messages': topic_messages,
-                'most_common_topics': [topic for topic, count in sorted_topics[:5] if count > 0]
-            }
-        except Exception as e:
-            logger.error(f"Error analizando temas: {e}")
-            return None
-
-    # --- Reportes ---
-    def generate_detailed_message_report(self, data):
-        """Generar reporte detallado de mensajes"""
-        report = ""
-        if data.get('full_messages'):
-            messages = data['full_messages']
-            report += f"""
-DETALLE COMPLETO DE MENSAJES:
-=============================
-Total de mensajes analizados: {len(messages)}
-ÚLTIMOS 20 MENSAJES:
--------------------
-"""
-            for i, msg in enumerate(messages[:20], 1):
-                report += f"{i}. 📅 {msg['date']}\n"
-                if msg['text']:
-                    text_preview = msg['text'][:150] + '...' if len(msg['text']) > 150 else msg['text']
-                    report += f"   💬 {text_preview}\n"
-                if msg['media_type'] != 'text':
-                    report += f"   📎 {msg['media_type']}\n"
-                if msg.get('urls'):
-                    report += f"   🔗 {len(msg['urls'])} enlace(s)\n"
-                report += "   " + "-" * 50 + "\n"
-
-        if data.get('word_analysis'):
-            word_data = data['word_analysis']
-            report += f"""
-ANÁLISIS DE VOCABULARIO:
-========================
-Palabras únicas utilizadas: {word_data.get('total_unique_words', 0)}
-PALABRAS MÁS FRECUENTES (Top 25):
-"""
-            for word, count in word_data.get('most_common_words', [])[:25]:
-                report += f"- '{word}': {count} veces\n"
-
-        if data.get('message_categories'):
-            categories = data['message_categories']
-            stats = categories.get('stats', {})
-            report += f"""
-CATEGORÍAS DE MENSAJES:
-======================
-📝 Solo texto: {stats.get('text_only_count', 0)}
-🔗 Con enlaces: {stats.get('with_links_count', 0)}
-📎 Con medios: {stats.get('with_media_count', 0)}
-❓ Preguntas: {stats.get('questions_count', 0)}
-❗ Exclamaciones: {stats.get('exclamations_count', 0)}
-📏 Mensajes largos (>200 chars): {stats.get('long_messages_count', 0)}
-🔤 Mensajes cortos (<50 chars): {stats.get('short_messages_count', 0)}
-"""
-        if data.get('conversation_topics'):
-            topics = data['conversation_topics']
-            report += f"""
-TEMAS DE CONVERSACIÓN:
-=====================
-Temas principales identificados: {', '.join(topics.get('most_common_topics', []))}
-FRECUENCIA DE TEMAS:
-"""
-            for topic, count in topics.get('topic_counts', {}).items():
-                if count > 0:
-                    report += f"- {topic}: {count} mensajes\n"
-        return report
-
-    # --- Extracción de emails ---
-    def extract_emails_from_text(self, text):
-        """Extraer emails de un texto usando regex"""
-        if not text:
-            return []
-        EMAIL_REGEX = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        return re.findall(EMAIL_REGEX, text)
-
-    async def extract_emails_from_entity(self, entity, limit=1000):
-        """Extraer emails de los mensajes de una entidad (usuario/canal)"""
-        emails_data = []
-        try:
-            async for message in self.client.iter_messages(entity, limit=limit):
-                if message.text:
-                    emails = self.extract_emails_from_text(message.text)
-                    for email in emails:
-                        email_info = {
-                            'email': email,
-                            'chat': getattr(entity, 'title', str(getattr(entity, 'username', entity.id))),
-                            'date': message.date.isoformat(),
-                            'message_id': message.id,
-                            'sender_id': message.sender_id
-                        }
-                        emails_data.append(email_info)
-                        print(f"📧 Email encontrado: {email}")
-                await asyncio.sleep(0.05)
-        except Exception as e:
-            logger.error(f"Error escaneando entidad {entity}: {e}")
-        return emails_data
-
-    async def save_emails_to_csv(self, emails_data, filename='emails_extraidos.csv'):
-        """Guardar emails en CSV o JSON (si no hay pandas)"""
-        try:
-            import pandas as pd
-            df = pd.DataFrame(emails_data)
-            df.to_csv(filename, index=False, encoding='utf-8')
-            print(f"💾 Emails guardados en: {filename}")
-        except ImportError:
-            json_filename = filename.replace('.csv', '.json')
-            with open(json_filename, 'w', encoding='utf-8') as f:
-                json.dump(emails_data, f, indent=2, ensure_ascii=False)
-            print(f"⚠️ Pandas no disponible. Emails guardados en: {json_filename}")
-        except Exception as e:
-            logger.error(f"Error guardando resultados: {e}")
-
-    # --- Análisis avanzados ---
-    async def get_message_history_stats(self, username, limit=1000):
-        """Obtiene estadísticas del historial de mensajes"""
-        try:
-            entity = await self.client.get_entity(username)
-            stats = {
-                'total_messages': 0,
-                'photos_count': 0,
-                'videos_count': 0,
-                'documents_count': 0,
-                'audio_count': 0,
-                'first_message_date': None,
-                'last_message_date': None
-            }
-            async for message in self.client.iter_messages(entity, limit=limit):
-                stats['total_messages'] += 1
-                if message.photo:
-                    stats['photos_count'] += 1
-                elif message.video:
-                    stats['videos_count'] += 1
-                elif message.document:
-                    stats['documents_count'] += 1
-                elif message.audio:
-                    stats['audio_count'] += 1
-                if stats['first_message_date'] is None:
-                    stats['first_message_date'] = message.date.isoformat()
-                stats['last_message_date'] = message.date.isoformat()
-            return stats
-        except Exception as e:
-            logger.error(f"Error obteniendo estadísticas: {e}")
-            return None
-
-    async def analyze_message_patterns(self, username, limit=1000):
-        """Analizar patrones de comportamiento en mensajes - VERSIÓN MEJORADA"""
-        try:
-            entity = await self.client.get_entity(username)
-            patterns = {
-                'activity_hours': Counter(),
-                'activity_days': Counter(),
-                'activity_months': Counter(),
-                'message_lengths': [],
-                'common_words': Counter(),
-                'media_frequency': Counter(),
-                'reply_frequency': 0,
-                'forward_frequency': 0,
-                'total_messages_processed': 0,
-                'messages_with_text': 0,
-                'messages_with_dates': 0
-            }
-            logger.info(f"🔍 Analizando {limit} mensajes de {username}...")
-            message_count = 0
-            async for message in self.client.iter_messages(entity, limit=limit):
-                message_count += 1
-                patterns['total_messages_processed'] = message_count
-                if message.date:
-                    patterns['messages_with_dates'] += 1
-                    try:
-                        patterns['activity_hours'][message.date.hour] += 1
-                        patterns['activity_days'][message.date.strftime('%A')] += 1
-                        patterns['activity_months'][message.date.strftime('%B')] += 1
-                    except Exception as time_error:
-                        logger.debug(f"Error procesando fecha: {time_error}")
-                if message.text:
-                    patterns['messages_with_text'] += 1
-                    text_length = len(message.text)
-                    patterns['message_lengths'].append(text_length)
-                    try:
-                        words = re.findall(r'\b[a-zA-Záéíóúñ]+\b', message.text.lower())
-                        common_stop_words = {
-                            'el', 'la', 'de', 'que', 'y', 'en', 'un', 'es', 'se', 'no',
-                            'te', 'lo', 'le', 'me', 'mi', 'tu', 'su', 'los', 'las', 'del'
-                        }
-                        filtered_words = [w for w in words if w not in common_stop_words and len(w) > 2]
-                        patterns['common_words'].update(filtered_words)
-                    except Exception as text_error:
-                        logger.debug(f"Error procesando texto: {text_error}")
-                if message.media:
-                    try:
-                        media_type = type(message.media).__name__
-                        patterns['media_frequency'][media_type] += 1
-                    except Exception as media_error:
-                        logger.debug(f"Error procesando medio: {media_error}")
-                if hasattr(message, 'reply_to') and message.reply_to:
-                    patterns['reply_frequency'] += 1
-                if hasattr(message, 'fwd_from') and message.fwd_from:
-                    patterns['forward_frequency'] += 1
-                if message_count % 100 == 0:
-                    logger.info(f"📨 Procesados {message_count}/{limit} mensajes...")
-
-            patterns['total_messages_analyzed'] = limit
-            if patterns['message_lengths']:
-                patterns['avg_message_length'] = sum(patterns['message_lengths']) / len(patterns['message_lengths'])
-                patterns['max_message_length'] = max(patterns['message_lengths'])
-                patterns['min_message_length'] = min(patterns['message_lengths'])
-            else:
-                patterns['avg_message_length'] = 0
-                patterns['max_message_length'] = 0
-                patterns['min_message_length'] = 0
-
-            if patterns['activity_hours']:
-                most_common_hour = patterns['activity_hours'].most_common(1)
-                patterns['most_active_hour'] = most_common_hour[0] if most_common_hour else None
-            else:
-                patterns['most_active_hour'] = None
-
-            patterns['most_active_day'] = patterns['activity_days'].most_common(1)[0] if patterns['activity_days'] else None
-            patterns['most_active_month'] = patterns['activity_months'].most_common(1)[0] if patterns['activity_months'] else None
-            patterns['most_common_words'] = patterns['common_words'].most_common(15)
-            patterns['total_media'] = sum(patterns['media_frequency'].values())
-            patterns['media_percentage'] = (patterns['total_media'] / patterns['total_messages_processed']) * 100 if patterns['total_messages_processed'] > 0 else 0
-            patterns['text_percentage'] = (patterns['messages_with_text'] / patterns['total_messages_processed']) * 100 if patterns['total_messages_processed'] > 0 else 0
-            patterns['reply_percentage'] = (patterns['reply_frequency'] / patterns['total_messages_processed']) * 100 if patterns['total_messages_processed'] > 0 else 0
-            patterns['forward_percentage'] = (patterns['forward_frequency'] / patterns['total_messages_processed']) * 100 if patterns['total_messages_processed'] > 0 else 0
-
-            logger.info(f"✅ Análisis completado: {patterns['total_messages_processed']} mensajes procesados")
-            return patterns
-        except Exception as e:
-            logger.error(f"❌ Error analizando patrones: {e}")
-            return None
-
-    async def get_contact_network(self, username, max_contacts=50):
-        """Mapear la red de contactos del usuario"""
-        try:
-            entity = await self.client.get_entity(username)
-            network = {'common_groups': [], 'frequent_contacts': [], 'mutual_contacts': []}
-            async for dialog in self.client.iter_dialogs(limit=100):
-                if dialog.is_group:
-                    try:
-                        participants = await self.client.get_participants(dialog.entity, limit=100)
-                        participant_ids = [p.id for p in participants]
-                        if entity.id in participant_ids:
-                            network['common_groups'].append({
-                                'name': dialog.name,
-                                'id': dialog.id,
-                                'participants_count': len(participants),
-                                'type': 'group' if dialog.is_group else 'channel'
-                            })
-                    except:
-                        continue
-            return network
-        except Exception as e:
-            logger.error(f"Error mapeando red de contactos: {e}")
-            return None
-
-    async def search_username_across_platforms(self, username):
-        """Buscar el username en otras plataformas (OSINT externo)"""
-        platforms = {
-            'instagram': f'https://www.instagram.com/{username}',
-            'twitter': f'https://twitter.com/{username}',
-            'github': f'https://github.com/{username}',
-            'facebook': f'https://facebook.com/{username}',
-            'tiktok': f'https://tiktok.com/@{username}',
-            'youtube': f'https://youtube.com/@{username}',
-            'reddit': f'https://reddit.com/user/{username}'
-        }
-        results = {}
-        for platform, url in platforms.items():
-            try:
-                response = requests.get(url, timeout=10)
-                results[platform] = {'url': url, 'exists': response.status_code == 200, 'status_code': response.status_code}
-                time.sleep(1)
-            except Exception as e:
-                results[platform] = {'url': url, 'exists': False, 'error': str(e)}
-        return results
-
-    async def geolocation_analysis(self, username, limit=500):
-        """Analizar posibles ubicaciones geográficas"""
-        try:
-            entity = await self.client.get_entity(username)
-            locations = []
-            async for message in self.client.iter_messages(entity, limit=limit):
-                if message.text:
-                    location_patterns = [
-                        r'\b(calle|avenida|av\.|ciudad|pueblo|barrio|plaza)\s+\w+',
-                        r'\b(madrid|barcelona|valencia|sevilla|bilbao|málaga|zaragoza|murcia|palma|granada)\b',
-                        r'\b(\d{5})\b',
-                        r'\b(españa|espana|spain)\b',
-                        r'\b(méxico|mexico|argentina|colombia|chile|perú|peru|venezuela)\b'
-                    ]
-                    for pattern in location_patterns:
-                        matches = re.findall(pattern, message.text, re.IGNORECASE)
-                        if matches:
-                            locations.extend(matches)
-            return {
-                'mentioned_locations': list(set(locations)),
-                'total_mentions': len(locations),
-                'unique_locations': len(set(locations))
-            }
-        except Exception as e:
-            logger.error(f"Error en análisis geográfico: {e}")
-            return None
-
-    async def sentiment_analysis(self, username, limit=500):
-        """Análisis básico de sentimiento en mensajes"""
-        try:
-            entity = await self.client.get_entity(username)
-            positive_words = {'bueno', 'genial', 'excelente', 'fantástico', 'maravilloso', 'feliz', 'contento', 'alegre', 'amo', 'encanta', 'increíble'}
-            negative_words = {'malo', 'terrible', 'horrible', 'triste', 'enojado', 'molesto', 'frustrado', 'odio', 'asco', 'aburrido', 'cansado'}
-            sentiment_stats = {'positive_count': 0, 'negative_count': 0, 'neutral_count': 0, 'total_messages': 0}
-            async for message in self.client.iter_messages(entity, limit=limit):
-                if message.text:
-                    sentiment_stats['total_messages'] += 1
-                    text_lower = message.text.lower()
-                    positive_matches = sum(1 for word in positive_words if word in text_lower)
-                    negative_matches = sum(1 for word in negative_words if word in text_lower)
-                    if positive_matches > negative_matches:
-                        sentiment_stats['positive_count'] += 1
-                    elif negative_matches > positive_matches:
-                        sentiment_stats['negative_count'] += 1
-                    else:
-                        sentiment_stats['neutral_count'] += 1
-            if sentiment_stats['total_messages'] > 0:
-                sentiment_stats['positive_percentage'] = (sentiment_stats['positive_count'] / sentiment_stats['total_messages']) * 100
-                sentiment_stats['negative_percentage'] = (sentiment_stats['negative_count'] / sentiment_stats['total_messages']) * 100
-                sentiment_stats['neutral_percentage'] = (sentiment_stats['neutral_count'] / sentiment_stats['total_messages']) * 100
-            return sentiment_stats
-        except Exception as e:
-            logger.error(f"Error en análisis de sentimiento: {e}")
-            return None
-
-    async def timeline_analysis(self, username, limit=1000):
-        """Crear línea de tiempo de actividad"""
-        try:
-            entity = await self.client.get_entity(username)
-            timeline = []
-            async for message in self.client.iter_messages(entity, limit=limit):
-                timeline_event = {
-                    'date': message.date.isoformat(),
-                    'type': 'message',
-                    'content_preview': message.text[:100] + '...' if message.text and len(message.text) > 100 else message.text,
-                    'media_type': type(message.media).__name__ if message.media else 'text'
-                }
-                timeline.append(timeline_event)
-            return sorted(timeline, key=lambda x: x['date'], reverse=True)
-        except Exception as e:
-            logger.error(f"Error en análisis de timeline: {e}")
-            return []
-
-    # --- Historial y grupos ---
-    async def search_public_groups(self, username):
-        """Buscar en grupos públicos"""
-        try:
-            groups = []
-            async for dialog in self.client.iter_dialogs():
-                if dialog.is_group or dialog.is_channel:
-                    try:
-                        participants = await self.client.get_participants(dialog.entity)
-                        for participant in participants:
-                            if (participant.username and participant.username.lower() == username.lower()) or \
-                               hasattr(participant, 'id') and str(participant.id) == username:
-                                groups.append({
-                                    'name': dialog.name,
-                                    'id': dialog.id,
-                                    'type': 'group' if dialog.is_group else 'channel',
-                                    'participants_count': len(participants)
-                                })
-                    except:
-                        continue
-            return groups
-        except Exception as e:
-            logger.error(f"Error buscando en grupos: {e}")
-            return []
-
-    async def get_old_usernames(self, target_user=None):
-        """Obtiene el historial de los nombres y usernames del usuario."""
-        try:
-            if target_user:
-                entity = await self.client.get_entity(target_user)
-                user_id = entity.id
-            else:
-                me = await self.client.get_me()
-                user_id = me.id
-            try:
-                history = await self.client(functions.account.GetUsernameHistoryRequest(user_id=user_id))
-                usernames = []
-                for item in history:
-                    usernames.append({
-                        "old_username": item.username,
-                        "active": getattr(item, 'active', False),
-                        "edited_date": str(getattr(item, 'edit_date', 'N/A'))
-                    })
-                return usernames
-            except Exception as e:
-                logger.warning(f"No se pudo obtener historial de usernames: {e}")
-                return []
-        except Exception as e:
-            logger.error(f"Error obteniendo historial de usernames: {e}")
-            return []
-
-    async def get_created_channels(self, target_user=None):
-        """Encuentra canales o grupos que el usuario creó."""
-        created = []
-        try:
-            async for dialog in self.client.iter_dialogs():
-                entity = dialog.entity
-                if isinstance(entity, Channel):
-                    if target_user:
-                        target_entity = await self.client.get_entity(target_user)
-                        if hasattr(entity, 'creator') and entity.creator and entity.creator.id == target_entity.id:
-                            created.append({
-                                "name": entity.title,
-                                "id": entity.id,
-                                "type": "channel" if entity.broadcast else "group",
-                                "participants": getattr(entity, 'participants_count', 'N/A'),
-                                "username": getattr(entity, 'username', 'N/A')
-                            })
-                    else:
-                        created.append({
-                            "name": entity.title,
-                            "id": entity.id,
-                            "type": "channel" if entity.broadcast else "group",
-                            "participants": getattr(entity, 'participants_count', 'N/A'),
-                            "username": getattr(entity, 'username', 'N/A')
-                        })
-            return created
-        except Exception as e:
-            logger.error(f"Error buscando canales creados: {e}")
-            return []
-
-    # --- Nuevas funciones añadidas ---
-    
-    async def get_deleted_account_info(self, phone_number):
-        """Buscar información de cuentas eliminadas por número de teléfono"""
-        try:
-            # Intentar encontrar el usuario por número de teléfono
-            entity = await self.client.get_entity(phone_number)
-            if entity:
-                return await self.get_user_info(phone_number)
-            return None
-        except Exception as e:
-            logger.info(f"Cuenta posiblemente eliminada o no encontrada: {e}")
-            return {"status": "deleted_or_not_found", "phone": phone_number}
-
-    async def analyze_group_activity(self, group_username, user_filter=None):
-        """Analizar actividad en grupos específicos"""
-        try:
-            entity = await self.client.get_entity(group_username)
-            activity_data = {
-                'total_messages': 0,
-                'active_users': Counter(),
-                'message_frequency': Counter(),
-                'top_posters': [],
-                'recent_activity': []
-            }
-            
-            async for message in self.client.iter_messages(entity, limit=1000):
-                activity_data['total_messages'] += 1
-                
-                if message.sender_id:
-                    activity_data['active_users'][message.sender_id] += 1
-                
-                if message.date:
-                    activity_data['message_frequency'][message.date.strftime('%Y-%m-%d')] += 1
-                
-                # Solo mantener los últimos 50 mensajes para análisis detallado
-                if len(activity_data['recent_activity']) < 50:
-                    activity_data['recent_activity'].append({
-                        'date': message.date.isoformat(),
-                        'sender_id': message.sender_id,
-                        'text': message.text[:200] if message.text else '',
-                        'media_type': type(message.media).__name__ if message.media else 'text'
-                    })
-            
-            # Obtener información de los usuarios más activos
-            for user_id, count in activity_data['active_users'].most_common(10):
-                try:
-                    user_entity = await self.client.get_entity(user_id)
-                    activity_data['top_posters'].append({
-                        'user_id': user_id,
-                        'username': getattr(user_entity, 'username', 'N/A'),
-                        'first_name': getattr(user_entity, 'first_name', 'N/A'),
-                        'last_name': getattr(user_entity, 'last_name', 'N/A'),
-                        'message_count': count
-                    })
-                except:
-                    activity_data['top_posters'].append({
-                        'user_id': user_id,
-                        'username': 'N/A',
-                        'first_name': 'N/A',
-                        'last_name': 'N/A',
-                        'message_count': count
-                    })
-            
-            return activity_data
-        except Exception as e:
-            logger.error(f"Error analizando actividad del grupo: {e}")
-            return None
-
-    async def extract_phone_numbers(self, username, limit=500):
-        """Extraer números de teléfono mencionados en mensajes"""
-        try:
-            entity = await self.client.get_entity(username)
-            phone_numbers = []
-            phone_patterns = [
-                r'\+\d{1,3}[-.\s]?\d{1,14}',
-                r'\d{3}[-.\s]?\d{3}[-.\s]?\d{4}',
-                r'\(\d{3}\)\s*\d{3}[-.\s]?\d{4}'
-            ]
-            
-            async for message in self.client.iter_messages(entity, limit=limit):
-                if message.text:
-                    for pattern in phone_patterns:
-                        matches = re.findall(pattern, message.text)
-                        for match in matches:
-                            phone_info = {
-                                'phone': match,
-                                'date': message.date.isoformat(),
-                                'message_id': message.id,
-                                'context': message.text[:100] + '...' if len(message.text) > 100 else message.text
-                            }
-                            phone_numbers.append(phone_info)
-            
-            return phone_numbers
-        except Exception as e:
-            logger.error(f"Error extrayendo números de teléfono: {e}")
-            return []
-
-    async def get_user_connections_map(self, username):
-        """Crear mapa de conexiones del usuario"""
-        try:
-            entity = await self.client.get_entity(username)
-            connections = {
-                'common_groups': [],
-                'frequent_contacts': [],
-                'mentioned_users': [],
-                'interaction_network': {}
-            }
-            
-            # Buscar grupos en común
-            async for dialog in self.client.iter_dialogs(limit=100):
-                if dialog.is_group or dialog.is_channel:
-                    try:
-                        participants = await self.client.get_participants(dialog.entity, limit=100)
-                        participant_ids = [p.id for p in participants]
-                        if entity.id in participant_ids:
-                            group_info = {
-                                'name': dialog.name,
-                                'id': dialog.id,
-                                'type': 'group' if dialog.is_group else 'channel',
-                                'participants_count': len(participants),
-                                'common_contacts': []
-                            }
-                            
-                            # Encontrar contactos en común
-                            for participant in participants[:20]:  # Limitar para no sobrecargar
-                                if participant.id != entity.id:
-                                    group_info['common_contacts'].append({
-                                        'id': participant.id,
-                                        'username': getattr(participant, 'username', 'N/A'),
-                                        'first_name': getattr(participant, 'first_name', 'N/A'),
-                                        'last_name': getattr(participant, 'last_name', 'N/A')
-                                    })
-                            
-                            connections['common_groups'].append(group_info)
-                    except:
-                        continue
-            
-            return connections
-        except Exception as e:
-            logger.error(f"Error creando mapa de conexiones: {e}")
-            return None
-
-    async def monitor_user_activity(self, username, duration_minutes=60, check_interval=5):
-        """Monitorear actividad del usuario en tiempo real"""
-        try:
-            entity = await self.client.get_entity(username)
-            start_time = datetime.now()
-            end_time = start_time + timedelta(minutes=duration_minutes)
-            activity_log = []
-            
-            print(f"🔍 Monitoreando actividad de {username} por {duration_minutes} minutos...")
-            
-            while datetime.now() < end_time:
-                try:
-                    # Obtener el último mensaje
-                    messages = await self.client.get_messages(entity, limit=1)
-                    if messages:
-                        last_message = messages[0]
-                        
-                        # Verificar si es un mensaje nuevo
-                        if not activity_log or last_message.id != activity_log[-1]['message_id']:
-                            activity_log.append({
-                                'timestamp': datetime.now().isoformat(),
-                                'message_id': last_message.id,
-                                'text': last_message.text[:200] if last_message.text else '',
-                                'media_type': type(last_message.media).__name__ if last_message.media else 'text',
-                                'date': last_message.date.isoformat()
-                            })
-                            print(f"📨 Nueva actividad detectada: {last_message.date}")
-                    
-                    await asyncio.sleep(check_interval * 60)  # Convertir a segundos
-                    
-                except Exception as e:
-                    logger.error(f"Error durante monitoreo: {e}")
-                    await asyncio.sleep(30)  # Esperar 30 segundos antes de reintentar
-            
-            return {
-                'monitoring_duration': f"{duration_minutes} minutos",
-                'start_time': start_time.isoformat(),
-                'end_time': end_time.isoformat(),
-                'activity_detected': len(activity_log),
-                'activity_log': activity_log
-            }
-            
-        except Exception as e:
-            logger.error(f"Error iniciando monitoreo: {e}")
-            return None
-
-    async def analyze_message_style(self, username, limit=500):
-        """Analizar estilo de escritura y patrones lingüísticos"""
-        try:
-            entity = await self.client.get_entity(username)
-            style_analysis = {
-                'avg_message_length': 0,
-                'message_lengths': [],
-                'punctuation_usage': Counter(),
-                'emoticon_usage': Counter(),
-                'capitalization_patterns': {},
-                'common_phrases': Counter(),
-                'writing_style_metrics': {}
-            }
-            
-            messages_processed = 0
-            total_length = 0
-            
-            async for message in self.client.iter_messages(entity, limit=limit):
-                if message.text:
-                    messages_processed += 1
-                    text = message.text
-                    text_length = len(text)
-                    
-                    total_length += text_length
-                    style_analysis['message_lengths'].append(text_length)
-                    
-                    # Análisis de puntuación
-                    style_analysis['punctuation_usage']['periods'] += text.count('.')
-                    style_analysis['punctuation_usage']['commas'] += text.count(',')
-                    style_analysis['punctuation_usage']['exclamations'] += text.count('!')
-                    style_analysis['punctuation_usage']['questions'] += text.count('?')
-                    
-                    # Análisis de emoticonos
-                    emoticons = re.findall(r'[:;][\'`\-]?[\)\(PD\/\\]', text)
-                    style_analysis['emoticon_usage'].update(emoticons)
-                    
-                    # Patrones de capitalización
-                    words = re.findall(r'\b[A-Za-záéíóúñÁÉÍÓÚÑ]+\b', text)
-                    if words:
-                        capitalized = sum(1 for w in words if w[0].isupper())
-                        style_analysis['capitalization_patterns']['total_words'] = len(words)
-                        style_analysis['capitalization_patterns']['capitalized_words'] = capitalized
-                        style_analysis['capitalization_patterns']['capitalization_rate'] = (capitalized / len(words)) * 100
-                    
-                    # Frases comunes (bigramas)
-                    words_lower = [w.lower() for w in words if len(w) > 2]
-                    bigrams = [f"{words_lower[i]} {words_lower[i+1]}" for i in range(len(words_lower)-1)]
-                    style_analysis['common_phrases'].update(bigrams)
-            
-            if messages_processed > 0:
-                style_analysis['avg_message_length'] = total_length / messages_processed
-                style_analysis['writing_style_metrics']['total_messages_analyzed'] = messages_processed
-                style_analysis['writing_style_metrics']['total_characters'] = total_length
-                style_analysis['writing_style_metrics']['chars_per_message'] = style_analysis['avg_message_length']
-            
-            return style_analysis
-            
-        except Exception as e:
-            logger.error(f"Error analizando estilo de escritura: {e}")
-            return None
-
-    # --- Reportes completos ---
-    async def get_full_user_info(self, username_or_phone):
-        """Obtener información completa del usuario"""
-        logger.info(f"Buscando información para: {username_or_phone}")
-        user_info = await self.get_user_info(username_or_phone)
-        if not user_info:
-            return None
-        public_groups = await self.search_public_groups(username_or_phone)
-        old_usernames = await self.get_old_usernames(username_or_phone)
-        created_channels = await self.get_created_channels(username_or_phone)
-        message_stats = await self.get_message_history_stats(username_or_phone)
-        complete_info = {
-            'user_info': user_info,
-            'public_groups': public_groups,
-            'old_usernames': old_usernames,
-            'created_channels': created_channels,
-            'message_statistics': message_stats,
-            'search_timestamp': datetime.now().isoformat()
-        }
-        return complete_info
-
-    async def get_complete_osint_report(self, username_or_phone):
-        """Generar reporte OSINT completo con todas las funcionalidades"""
-        logger.info(f"🚀 Iniciando análisis OSINT completo para: {username_or_phone}")
-        user_info = await self.get_user_info(username_or_phone)
-        if not user_info:
-            return None
-        print("🔍 Recopilando información básica... ✅")
-
-        tasks = [
-            self.search_public_groups(username_or_phone),
-            self.get_old_usernames(username_or_phone),
-            self.get_created_channels(username_or_phone),
-            self.get_message_history_stats(username_or_phone),
-            self.analyze_message_patterns(username_or_phone),
-            self.get_contact_network(username_or_phone),
-            self.search_username_across_platforms(user_info.get('username', '')),
-            self.geolocation_analysis(username_or_phone),
-            self.sentiment_analysis(username_or_phone),
-            self.timeline_analysis(username_or_phone)
-        ]
-        print("🔄 Ejecutando análisis avanzados...")
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        complete_report = {
-            'user_info': user_info,
-            'public_groups': results[0] if not isinstance(results[0], Exception) else [],
-            'old_usernames': results[1] if not isinstance(results[1], Exception) else [],
-            'created_channels': results[2] if not isinstance(results[2], Exception) else [],
-            'message_statistics': results[3] if not isinstance(results[3], Exception) else {},
-            'behavior_patterns': results[4] if not isinstance(results[4], Exception) else {},
-            'contact_network': results[5] if not isinstance(results[5], Exception) else {},
-            'cross_platform_presence': results[6] if not isinstance(results[6], Exception) else {},
-            'geolocation_analysis': results[7] if not isinstance(results[7], Exception) else {},
-            'sentiment_analysis': results[8] if not isinstance(results[8], Exception) else {},
-            'activity_timeline': results[9] if not isinstance(results[9], Exception) else [],
-            'search_timestamp': datetime.now().isoformat(),
-            'report_version': '2.0'
-        }
-        print("✅ Análisis completo finalizado")
-        return complete_report
-
-    async def get_enhanced_osint_report(self, username_or_phone):
-        """Generar reporte OSINT mejorado con análisis detallado de mensajes"""
-        logger.info(f"🚀 Iniciando análisis OSINT MEJORADO para: {username_or_phone}")
-        user_info = await self.get_user_info(username_or_phone)
-        if not user_info:
-            return None
-        print("🔍 Recopilando información básica... ✅")
-
-        tasks = [
-            self.search_public_groups(username_or_phone),
-            self.get_old_usernames(username_or_phone),
-            self.get_created_channels(username_or_phone),
-            self.get_message_history_stats(username_or_phone),
-            self.analyze_message_patterns(username_or_phone),
-            self.get_contact_network(username_or_phone),
-            self.search_username_across_platforms(user_info.get('username', '')),
-            self.geolocation_analysis(username_or_phone),
-            self.sentiment_analysis(username_or_phone),
-            self.timeline_analysis(username_or_phone),
-            self.get_full_message_history(username_or_phone, 200),
-            self.get_all_words_used(username_or_phone, 200),
-            self.get_message_categories(username_or_phone, 200),
-            self.get_conversation_topics(username_or_phone, 200)
-        ]
-        print("🔄 Ejecutando análisis avanzados y detallados...")
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        enhanced_report = {
-            'user_info': user_info,
-            'public_groups': results[0] if not isinstance(results[0], Exception) else [],
-            'old_usernames': results[1] if not isinstance(results[1], Exception) else [],
-            'created_channels': results[2] if not isinstance(results[2], Exception) else [],
-            'message_statistics': results[3] if not isinstance(results[3], Exception) else {},
-            'behavior_patterns': results[4] if not isinstance(results[4], Exception) else {},
-            'contact_network': results[5] if not isinstance(results[5], Exception) else {},
-            'cross_platform_presence': results[6] if not isinstance(results[6], Exception) else {},
-            'geolocation_analysis': results[7] if not isinstance(results[7], Exception) else {},
-            'sentiment_analysis': results[8] if not isinstance(results[8], Exception) else {},
-            'activity_timeline': results[9] if not isinstance(results[9], Exception) else [],
-            'full_messages': results[10] if not isinstance(results[10], Exception) else [],
-            'word_analysis': results[11] if not isinstance(results[11], Exception) else {},
-            'message_categories': results[12] if not isinstance(results[12], Exception) else {},
-            'conversation_topics': results[13] if not isinstance(results[13], Exception) else {},
-            'search_timestamp': datetime.now().isoformat(),
-            'report_version': '3.0'
-        }
-        print("✅ Análisis completo y detallado finalizado")
-        return enhanced_report
-
-    async def get_premium_osint_report(self, username_or_phone):
-        """Reporte OSINT premium con todas las funciones nuevas"""
-        logger.info(f"🚀 Iniciando análisis OSINT PREMIUM para: {username_or_phone}")
-        user_info = await self.get_user_info(username_or_phone)
-        if not user_info:
-            return None
-        
-        print("🔍 Recopilando información básica... ✅")
-        
-        # Ejecutar todas las funciones disponibles
-        tasks = [
-            self.search_public_groups(username_or_phone),
-            self.get_old_usernames(username_or_phone),
-            self.get_created_channels(username_or_phone),
-            self.get_message_history_stats(username_or_phone),
-            self.analyze_message_patterns(username_or_phone),
-            self.get_contact_network(username_or_phone),
-            self.search_username_across_platforms(user_info.get('username', '')),
-            self.geolocation_analysis(username_or_phone),
-            self.sentiment_analysis(username_or_phone),
-            self.timeline_analysis(username_or_phone),
-            self.get_full_message_history(username_or_phone, 300),
-            self.get_all_words_used(username_or_phone, 300),
-            self.get_message_categories(username_or_phone, 300),
-            self.get_conversation_topics(username_or_phone, 300),
-            self.extract_phone_numbers(username_or_phone, 200),
-            self.get_user_connections_map(username_or_phone),
-            self.analyze_message_style(username_or_phone, 200)
-        ]
-        
-        print("🔄 Ejecutando análisis premium...")
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        premium_report = {
-            'user_info': user_info,
-            'public_groups': results[0] if not isinstance(results[0], Exception) else [],
-            'old_usernames': results[1] if not isinstance(results[1], Exception) else [],
-            'created_channels': results[2] if not isinstance(results[2], Exception) else [],
-            'message_statistics': results[3] if not isinstance(results[3], Exception) else {},
-            'behavior_patterns': results[4] if not isinstance(results[4], Exception) else {},
-            'contact_network': results[5] if not isinstance(results[5], Exception) else {},
-            'cross_platform_presence': results[6] if not isinstance(results[6], Exception) else {},
-            'geolocation_analysis': results[7] if not isinstance(results[7], Exception) else {},
-            'sentiment_analysis': results[8] if not isinstance(results[8], Exception) else {},
-            'activity_timeline': results[9] if not isinstance(results[9], Exception) else [],
-            'full_messages': results[10] if not isinstance(results[10], Exception) else [],
-            'word_analysis': results[11] if not isinstance(results[11], Exception) else {},
-            'message_categories': results[12] if not isinstance(results[12], Exception) else {},
-            'conversation_topics': results[13] if not isinstance(results[13], Exception) else {},
-            'extracted_phones': results[14] if not isinstance(results[14], Exception) else [],
-            'connections_map': results[15] if not isinstance(results[15], Exception) else {},
-            'writing_style_analysis': results[16] if not isinstance(results[16], Exception) else {},
-            'search_timestamp': datetime.now().isoformat(),
-            'report_version': 'PREMIUM'
-        }
-        
-        print("✅ Análisis premium finalizado")
-        return premium_report
-
-    def generate_report(self, data):
-        """Generar reporte legible"""
-        user = data['user_info']
-        report = f"""
-=== REPORTE OSINT TELEGRAM AVANZADO ===
-Fecha: {data['search_timestamp']}
-INFORMACIÓN DEL USUARIO:
-------------------------
-ID: {user['id']}
-Username: @{user['username']}
-Nombre: {user['first_name']} {user['last_name']}
-Teléfono: {user['phone']}
-Verificado: {user['verified']}
-Premium: {user['premium']}
-Bot: {user['bot']}
-Biografía: {user['bio']}
-ESTADO:
--------
-Última vez: {user['last_seen']}
-Estado: {user['status']}
-Centro de Datos: {user['dc_id']}
-Idioma: {user['lang_code']}
-SEGURIDAD:
-----------
-Restringido: {user['restricted']}
-Scam: {user['scam']}
-Fake: {user['fake']}
-HISTORIAL DE USERNAMES ({len(data['old_usernames'])}):
------------------------
-"""
-        for username in data['old_usernames']:
-            status = "ACTIVO" if username['active'] else "ANTIGUO"
-            report += f"- @{username['old_username']} ({status}) - {username['edited_date']}\n"
-        report += f"""
-CANALES CREADOS ({len(data['created_channels'])}):
------------------
-"""
-        for channel in data['created_channels']:
-            report += f"- {channel['name']} ({channel['type']}) - {channel['participants']} miembros\n"
-            if channel['username'] != 'N/A':
-                report += f"  @{channel['username']}\n"
-        report += f"""
-GRUPOS PÚBLICOS ({len(data['public_groups'])}):
------------------
-"""
-        for group in data['public_groups']:
-            report += f"- {group['name']} ({group['type']}) - {group['participants_count']} miembros\n"
-        if data.get('message_statistics'):
-            stats = data['message_statistics']
-            report += f"""
-ESTADÍSTICAS DE MENSAJES:
--------------------------
-Total mensajes analizados: {stats['total_messages']}
-Fotos: {stats['photos_count']}
-Videos: {stats['videos_count']}
-Documentos: {stats['documents_count']}
-Audios: {stats['audio_count']}
-Primer mensaje: {stats['first_message_date']}
-Último mensaje: {stats['last_message_date']}
-"""
-        if user['photo']:
-            report += f"\n📸 Foto de perfil guardada en: {user['photo']}"
-        return report
-
-    def generate_advanced_report(self, data):
-        """Generar reporte avanzado con toda la información nueva - VERSIÓN MEJORADA"""
-        report = self.generate_report(data)
-        if data.get('behavior_patterns'):
-            patterns = data['behavior_patterns']
-            report += f"""
-ANÁLISIS DE COMPORTAMIENTO DETALLADO:
--------------------------------------
-Mensajes procesados: {patterns.get('total_messages_processed', 0)}
-Mensajes con texto: {patterns.get('messages_with_text', 0)} ({patterns.get('text_percentage', 0):.1f}%)
-Mensajes con medios: {patterns.get('total_media', 0)} ({patterns.get('media_percentage', 0):.1f}%)
-Mensajes como respuesta: {patterns.get('reply_frequency', 0)} ({patterns.get('reply_percentage', 0):.1f}%)
-Mensajes reenviados: {patterns.get('forward_frequency', 0)} ({patterns.get('forward_percentage', 0):.1f}%)
-HORARIO DE ACTIVIDAD:
-"""
-            if patterns.get('most_active_hour'):
-                hour, count = patterns['most_active_hour']
-                report += f"Hora más activa: {hour:02d}:00 ({count} mensajes)\n"
-            else:
-                report += f"Hora más activa: No disponible\n"
-            if patterns.get('most_active_day'):
-                day, count = patterns['most_active_day']
-                report += f"Día más activo: {day} ({count} mensajes)\n"
-            if patterns.get('most_active_month'):
-                month, count = patterns['most_active_month']
-                report += f"Mes más activo: {month} ({count} mensajes)\n"
-            report += f"""
-ESTADÍSTICAS DE TEXTO:
-----------------------
-Longitud promedio: {patterns.get('avg_message_length', 0):.1f} caracteres
-Longitud máxima: {patterns.get('max_message_length', 0)} caracteres
-Longitud mínima: {patterns.get('min_message_length', 0)} caracteres
-TIPOS DE MEDIOS ENCONTRADOS:
-"""
-            for media_type, count in patterns.get('media_frequency', {}).items():
-                report += f"- {media_type}: {count}\n"
-            report += f"""
-PALABRAS MÁS USADAS (Top 10):
-"""
-            for word, count in patterns.get('most_common_words', [])[:10]:
-                report += f"- '{word}': {count} veces\n"
-
-        if data.get('cross_platform_presence'):
-            platforms = data['cross_platform_presence']
-            report += f"""
-PRESENCIA EN OTRAS PLATAFORMAS:
--------------------------------
-"""
-            found_count = 0
-            for platform, info in platforms.items():
-                status = "✅ ENCONTRADO" if info.get('exists') else "❌ NO ENCONTRADO"
-                if info.get('exists'):
-                    found_count += 1
-                report += f"- {platform.capitalize()}: {status}"
-                if info.get('exists'):
-                    report += f" ({info['url']})"
-                report += "\n"
-            report += f"Total plataformas encontradas: {found_count}/{len(platforms)}\n"
-
-        if data.get('sentiment_analysis'):
-            sentiment = data['sentiment_analysis']
-            report += f"""
-ANÁLISIS DE SENTIMIENTO:
-------------------------
-Positivo: {sentiment.get('positive_percentage', 0):.1f}% ({sentiment.get('positive_count', 0)} mensajes)
-Negativo: {sentiment.get('negative_percentage', 0):.1f}% ({sentiment.get('negative_count', 0)} mensajes)
-Neutral: {sentiment.get('neutral_percentage', 0):.1f}% ({sentiment.get('neutral_count', 0)} mensajes)
-Total mensajes analizados: {sentiment.get('total_messages', 0)}
-"""
-        if data.get('geolocation_analysis') and data['geolocation_analysis']['mentioned_locations']:
-            geo = data['geolocation_analysis']
-            report += f"""
-ANÁLISIS GEOGRÁFICO:
---------------------
-Ubicaciones mencionadas: {', '.join(geo['mentioned_locations'][:10])}
-Total menciones: {geo['total_mentions']}
-Ubicaciones únicas: {geo['unique_locations']}
-"""
-        else:
-            report += f"""
-ANÁLISIS GEOGRÁFICO:
---------------------
-No se encontraron menciones de ubicaciones en los mensajes analizados.
-"""
-        if data.get('activity_timeline'):
-            timeline = data['activity_timeline']
-            report += f"""
-LÍNEA DE TIEMPO RECIENTE (Últimos 10 eventos):
------------------------------------------------
-"""
-            for event in timeline[:10]:
-                report += f"- {event['date']}: {event['type']}"
-                if event['content_preview']:
-                    report += f" - {event['content_preview']}"
-                report += "\n"
-        if data.get('contact_network') and data['contact_network'].get('common_groups'):
-            network = data['contact_network']
-            report += f"""
-RED DE CONTACTOS:
------------------
-Grupos en común: {len(network['common_groups'])}
-"""
-            for group in network['common_groups'][:5]:
-                report += f"- {group['name']} ({group['type']}) - {group['participants_count']} miembros\n"
-        
-        # Nuevas secciones para funciones premium
-        if data.get('extracted_phones'):
-            phones = data['extracted_phones']
-            report += f"""
-NÚMEROS DE TELÉFONO ENCONTRADOS ({len(phones)}):
----------------------------------
-"""
-            for phone in phones[:5]:
-                report += f"- {phone['phone']} (Contexto: {phone['context']})\n"
-            if len(phones) > 5:
-                report += f"... y {len(phones) - 5} más\n"
-        
-        if data.get('writing_style_analysis'):
-            style = data['writing_style_analysis']
-            report += f"""
-ANÁLISIS DE ESTILO DE ESCRITURA:
---------------------------------
-Longitud promedio de mensajes: {style.get('avg_message_length', 0):.1f} caracteres
-Mensajes analizados: {style.get('writing_style_metrics', {}).get('total_messages_analyzed', 0)}
-Puntuación utilizada:
-  • Puntos: {style.get('punctuation_usage', {}).get('periods', 0)}
-  • Comas: {style.get('punctuation_usage', {}).get('commas', 0)}
-  • Exclamaciones: {style.get('punctuation_usage', {}).get('exclamations', 0)}
-  • Preguntas: {style.get('punctuation_usage', {}).get('questions', 0)}
-"""
-        return report
-
-    def save_results(self, data, filename=None):
-        """Guardar resultados en JSON"""
-        if not filename:
-            username = data['user_info'].get('username', 'unknown')
-            filename = f"osint_results_{username}_{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        logger.info(f"Resultados guardados en: {filename}")
-        return filename
-
-    async def safe_search(self, username, max_retries=3):
-        """Búsqueda con manejo de errores y reintentos"""
-        for attempt in range(max_retries):
-            try:
-                return await self.get_user_info(username)
-            except Exception as e:
-                logger.warning(f"Intento {attempt + 1} fallido: {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(2 ** attempt)
-        return None
-
-    async def recover_specific_photos(self, username, photo_limit=100):
-        """Función específica para recuperar fotos antiguas"""
-        print(f"🕵️ Iniciando recuperación de fotos para: {username}")
-        print("⚠️ Esto puede tomar tiempo dependiendo de la cantidad de mensajes...")
-        photos = await self.get_all_old_photos(username, limit=photo_limit)
-        if photos:
-            print(f"✅ Se recuperaron {len(photos)} fotos")
-            for photo in photos[:5]:
-                print(f"   📅 {photo['date']} - Guardada en: {photo['saved_at']}")
-            if len(photos) > 5:
-                print(f"   ... y {len(photos) - 5} más")
-        else:
-            print("❌ No se encontraron fotos para recuperar")
-        return photos
-
-    def cleanup_temp_files(self):
-        """Limpiar archivos temporales"""
-        import glob
-        temp_files = glob.glob("temp_analysis_*") + glob.glob("deleted_photos/*") + glob.glob("recovered_photos_*/*")
-        for file in temp_files:
-            try:
-                os.remove(file)
-            except:
-                pass
-
-
-# --- Función principal ---
-async def main():
-    API_ID = API_CONFIG["api_id"]
-    API_HASH = API_CONFIG["api_hash"]
-
-    if API_ID == "TU_API_ID" or API_HASH == "TU_API_HASH":
-        print("❌ ERROR: Debes configurar tus credenciales de API en config.py")
-        print("📍 Obtén tus credenciales en: https://my.telegram.org/")
-        return
-
-    osint_tool = TelegramOSINT(API_ID, API_HASH)
-    try:
-        await osint_tool.start_client()
-        print("""
-  __  __  ___ _   _ _     _____ ____                      _     
- |  \/  | | | | |   | ____/ ___|  ___  __ _ _ __ ___| |__  
- | |\/| | | | | |   |  _| \___ \ / _ \/ _` | '__/ __| '_ \ 
- | |  | | |_| | |___| |___ ___) |  __/ (_| | | | (__| | | |
- |_|  |_|\___/|_____|_____|____/ \___|\__,_|_|  \___|_| |_|
-🚀 MULESEARCH - TELEGRAM OSINT TOOL AVANZADO v3.0
-""")
-        print("=" * 70)
-        print("💡 FORMATOS VÁLIDOS: @usuario, +34123456789, nombre apellido")
-        print("=" * 70)
-        target = input("Ingresa el username, número de teléfono o nombre: ").strip()
-        print("\n🎯 SELECCIONA EL TIPO DE ANÁLISIS:")
-        print("1. 🔍 Búsqueda rápida (información básica)")
-        print("2. 📊 Búsqueda completa (con historial y estadísticas)")
-        print("3. 🕵️ Recuperación de fotos antiguas")
-        print("4. 🚀 ANÁLISIS OSINT COMPLETO (NUEVO)")
-        print("5. 📈 Análisis de patrones de comportamiento")
-        print("6. 🌐 Búsqueda cross-platform")
-        print("7. 📍 Análisis geográfico")
-        print("8. 😊 Análisis de sentimiento")
-        print("9. 👥 Buscar por nombre en grupos")
-        print("10. 💬 ANÁLISIS DETALLADO DE MENSAJES (NUEVO)")
-        print("11. 🔤 VOCABULARIO Y PALABRAS (NUEVO)")
-        print("12. 🎯 TEMAS DE CONVERSACIÓN (NUEVO)")
-        print("13. 📧 EXTRAER EMAILS DEL USUARIO (NUEVO)")
-        print("14. 📞 EXTRAER TELÉFONOS (NUEVO)")
-        print("15. 🕸️ MAPA DE CONEXIONES (NUEVO)")
-        print("16. ✍️ ANÁLISIS DE ESCRITURA (NUEVO)")
-        print("17. 🚀 REPORTE OSINT PREMIUM (NUEVO)")
-        option = input("\nOpción (1-17): ").strip()
-
-        if option == "1":
-            print("🔍 Buscando información básica...")
-            results = await osint_tool.get_user_info(target)
-            if results:
-                print(f"✅ Usuario encontrado: {results['first_name']} {results['last_name']}")
-                print(f"📱 Teléfono: {results['phone']}")
-                print(f"🌐 Username: @{results['username']}")
-                print(f"🆔 ID: {results['id']}")
-                print(f"📝 Biografía: {results['bio']}")
-            else:
-                print("❌ No se pudo obtener información del usuario")
-                print("\n💡 SUGERENCIAS:")
-                print("   - Usa el formato @usuario (ej: @usuario)")
-                print("   - Para números, incluye código de país (ej: +34123456789)")
-                print("   - Verifica que el usuario existe y no es privado")
-
-        elif option == "2":
-            print("🔍 Realizando búsqueda completa...")
-            results = await osint_tool.get_full_user_info(target)
-            if results:
-                filename = osint_tool.save_results(results)
-                report = osint_tool.generate_report(results)
-                print(report)
-                print(f"\n✅ Información completa guardada en: {filename}")
-            else:
-                print("❌ No se pudo obtener información del usuario")
-
-        elif option == "3":
-            print("🕵️ Iniciando recuperación de fotos...")
-            try:
-                profile_photos = await osint_tool.get_profile_photos(target)
-                print(f"   Fotos de perfil: {len(profile_photos) if profile_photos else 0}")
-                public_photos = await osint_tool.search_public_photos(target)
-                print(f"   Fotos públicas: {len(public_photos) if public_photos else 0}")
-            except Exception as e:
-                print(f"❌ Error en depuración: {e}")
-
-        elif option == "4":
-            print("🚀 Iniciando análisis OSINT completo...")
-            results = await osint_tool.get_complete_osint_report(target)
-            if not results and ' ' in target and not target.startswith('@'):
-                print("🔍 Intentando con formato @username...")
-                suggested_username = f"@{target.replace(' ', '').lower()}"
-                results = await osint_tool.get_complete_osint_report(suggested_username)
-            if results:
-                filename = osint_tool.save_results(results)
-                report = osint_tool.generate_advanced_report(results)
-                print(report)
-                print(f"\n✅ Reporte completo guardado en: {filename}")
-            else:
-                print("❌ No se pudo obtener información del usuario")
-                print("\n💡 SUGERENCIAS:")
-                print("   - Asegúrate de que el usuario existe en Telegram")
-                print("   - Usa el formato @usuario (ej: @marysan)")
-                print("   - Si es un número, incluye el código de país")
-                print("   - Verifica que el usuario no sea privado")
-                print("   - Prueba la opción 9 para buscar por nombre en grupos")
-
-        elif option == "5":
-            print("📈 Analizando patrones de comportamiento...")
-            patterns = await osint_tool.analyze_message_patterns(target)
-            if patterns:
-                print(f"📊 Mensajes procesados: {patterns.get('total_messages_processed', 0)}")
-                print(f"📝 Mensajes con texto: {patterns.get('messages_with_text', 0)}")
-                if patterns.get('most_active_hour'):
-                    hour, count = patterns['most_active_hour']
-                    print(f"🕒 Hora más activa: {hour:02d}:00 ({count} mensajes)")
-                else:
-                    print(f"🕒 Hora más activa: No disponible")
-                print(f"📏 Longitud promedio: {patterns.get('avg_message_length', 0):.1f} caracteres")
-                print(f"🖼️ Total de medios: {patterns.get('total_media', 0)}")
-                print(f"↩️ Respuestas: {patterns.get('reply_frequency', 0)}")
-                print(f"🔄 Forwards: {patterns.get('forward_frequency', 0)}")
-                print("🔤 Palabras más usadas:")
-                for word, count in patterns.get('most_common_words', [])[:5]:
-                    print(f"   - '{word}' ({count} veces)")
-            else:
-                print("❌ No se pudieron analizar los patrones")
-
-        elif option == "6":
-            print("🌐 Buscando en otras plataformas...")
-            user_info = await osint_tool.get_user_info(target)
-            username = user_info['username'] if user_info and user_info.get('username') != 'N/A' else (target if not target.isdigit() and ' ' not in target else None)
-            if username:
-                platforms = await osint_tool.search_username_across_platforms(username)
-                print("\n📊 RESULTADOS:")
-                print("-" * 50)
-                found_count = 0
-                for platform, data in platforms.items():
-                    status = "✅ ENCONTRADO" if data.get('exists') else "❌ NO ENCONTRADO"
-                    if data.get('exists'):
-                        found_count += 1
-                    print(f"   {platform.upper():<12} {status}")
-                    if data.get('exists'):
-                        print(f"   📎 URL: {data['url']}")
-                    print()
-                print(f"📈 Total encontrados: {found_count}/{len(platforms)} plataformas")
-            else:
-                print("❌ No se pudo obtener un username válido")
-
-        elif option == "7":
-            print("📍 Analizando menciones geográficas...")
-            locations = await osint_tool.geolocation_analysis(target)
-            if locations and locations['mentioned_locations']:
-                print(f"📍 Ubicaciones mencionadas: {', '.join(locations['mentioned_locations'][:10])}")
-                print(f"📊 Total de menciones: {locations['total_mentions']}")
-                print(f"🏙️ Ubicaciones únicas: {locations['unique_locations']}")
-            else:
-                print("❌ No se encontraron menciones geográficas")
-
-        elif option == "8":
-            print("😊 Analizando sentimiento...")
-            sentiment = await osint_tool.sentiment_analysis(target)
-            if sentiment:
-                print(f"😊 Positivo: {sentiment.get('positive_percentage', 0):.1f}%")
-                print(f"😞 Negativo: {sentiment.get('negative_percentage', 0):.1f}%")
-                print(f"😐 Neutral: {sentiment.get('neutral_percentage', 0):.1f}%")
-                print(f"📊 Total mensajes analizados: {sentiment.get('total_messages', 0)}")
-            else:
-                print("❌ No se pudo realizar el análisis de sentimiento")
-
-        elif option == "9":
-            print("👥 Buscando por nombre en grupos...")
-            if ' ' in target:
-                users_found = await osint_tool.search_user_by_name(target)
-                if users_found:
-                    print(f"\n✅ Se encontraron {len(users_found)} usuarios:")
-                    for i, user in enumerate(users_found, 1):
-                        print(f"\n{i}. 👤 {user['first_name']} {user['last_name']}")
-                        print(f"   🌐 Username: @{user['username']}")
-                        print(f"   🆔 ID: {user['id']}")
-                        print(f"   📍 Encontrado en: {user['found_in']} ({user['chat_type']})")
-                    choice = input("\n🔢 ¿Quieres analizar alguno? Ingresa el número (o Enter para salir): ").strip()
-                    if choice and choice.isdigit() and 1 <= int(choice) <= len(users_found):
-                        user = users_found[int(choice) - 1]
-                        if user['username'] != 'N/A':
-                            print(f"\n🚀 Analizando @{user['username']}...")
-                            results = await osint_tool.get_complete_osint_report(user['username'])
-                            if results:
-                                filename = osint_tool.save_results(results)
-                                report = osint_tool.generate_advanced_report(results)
-                                print(report)
-                                print(f"\n✅ Reporte completo guardado en: {filename}")
-                        else:
-                            print("❌ Este usuario no tiene username público")
-                else:
-                    print("❌ No se encontraron usuarios con ese nombre")
-            else:
-                print("❌ Ingresa un nombre completo (con apellido) para buscar")
-
-        elif option == "10":
-            print("💬 Obteniendo análisis detallado de mensajes...")
-            enhanced_report = await osint_tool.get_enhanced_osint_report(target)
-            if enhanced_report:
-                filename = osint_tool.save_results(enhanced_report)
-                detailed_report = osint_tool.generate_detailed_message_report(enhanced_report)
-                print(detailed_report)
-                print(f"\n✅ Reporte detallado guardado en: {filename}")
-                if enhanced_report.get('full_messages'):
-                    view_more = input("\n¿Ver más mensajes? (s/n): ").strip().lower()
-                    if view_more == 's':
-                        messages = enhanced_report['full_messages']
-                        print(f"\n📨 MOSTRANDO MENSAJES ({len(messages)} total):")
-                        for i, msg in enumerate(messages, 1):
-                            print(f"\n{i}. 📅 {msg['date']}")
-                            if msg.get('text'):
-                                print(f"   💬 {msg['text']}")
-                            if msg.get('media_type') and msg['media_type'] != 'text':
-                                print(f"   📎 {msg['media_type']}")
-                            print("   " + "="*60)
-                            if i % 10 == 0 and i < len(messages):
-                                cont = input("\n¿Continuar? (s/n): ").strip().lower()
-                                if cont != 's':
-                                    break
-            else:
-                print("❌ No se pudo obtener información del usuario")
-
-        elif option == "11":
-            print("🔤 Analizando vocabulario y palabras utilizadas...")
-            word_analysis = await osint_tool.get_all_words_used(target, limit=300)
-            if word_analysis:
-                print(f"\n📊 ESTADÍSTICAS DE VOCABULARIO:")
-                print(f"Palabras únicas utilizadas: {word_analysis.get('total_unique_words', 0)}")
-                print(f"\n📈 PALABRAS MÁS USADAS (Top 30):")
-                for i, (word, count) in enumerate(word_analysis.get('most_common_words', [])[:30], 1):
-                    print(f"{i:2d}. '{word}': {count} veces")
-                total_words = sum(word_analysis.get('word_frequency', {}).values())
-                if total_words > 0:
-                    diversity = (word_analysis.get('total_unique_words', 0) / total_words) * 100
-                    print(f"\n🎯 DIVERSIDAD LÉXICA: {diversity:.1f}% (palabras únicas/totales)")
-            else:
-                print("❌ No se pudo analizar el vocabulario")
-
-        elif option == "12":
-            print("🎯 Identificando temas de conversación...")
-            topics_analysis = await osint_tool.get_conversation_topics(target, limit=300)
-            if topics_analysis:
-                print(f"\n🏷️ TEMAS IDENTIFICADOS:")
-                for topic, count in topics_analysis.get('topic_counts', {}).items():
-                    if count > 0:
-                        print(f"   📌 {topic}: {count} mensajes")
-                common_topics = topics_analysis.get('most_common_topics', [])
-                if common_topics:
-                    print(f"\n🎯 TEMAS PRINCIPALES: {', '.join(common_topics)}")
-                    view_examples = input("\n¿Ver ejemplos de mensajes por tema? (s/n): ").strip().lower()
-                    if view_examples == 's':
-                        topic_messages = topics_analysis.get('topic_messages', {})
-                        for topic in common_topics[:3]:
-                            messages = topic_messages.get(topic, [])
-                            if messages:
-                                print(f"\n📝 EJEMPLOS DE '{topic.upper()}':")
-                                for i, msg in enumerate(messages[:3], 1):
-                                    print(f"   {i}. {msg['date']}: {msg['text']}")
-            else:
-                print("❌ No se pudieron identificar temas")
-
-        elif option == "13":
-            print(f"📧 Extrayendo emails del usuario: {target}")
-            try:
-                input_info = osint_tool.validate_telegram_input(target)
-                if input_info['type'] == 'name':
-                    users_found = await osint_tool.search_user_by_name(target)
-                    if not users_found:
-                        print("❌ No se encontró ningún usuario con ese nombre.")
-                    elif len(users_found) == 1 and users_found[0]['username'] != 'N/A':
-                        entity = await osint_tool.client.get_entity(users_found[0]['username'])
-                        all_emails = await osint_tool.extract_emails_from_entity(entity, limit=2000)
-                    else:
-                        entity = await osint_tool.client.get_entity(target)
-                        all_emails = await osint_tool.extract_emails_from_entity(entity, limit=2000)
-                else:
-                    entity = await osint_tool.client.get_entity(target)
-                    all_emails = await osint_tool.extract_emails_from_entity(entity, limit=2000)
-
-                if all_emails:
-                    seen = set()
-                    unique_emails = []
-                    for item in all_emails:
-                        if item['email'] not in seen:
-                            unique_emails.append(item)
-                            seen.add(item['email'])
-                    await osint_tool.save_emails_to_csv(unique_emails, filename=f'emails_{target.replace("@", "").replace(" ", "_")}.csv')
-                    print(f"\n✅ Emails encontrados en {target}:")
-                    for item in unique_emails[:10]:
-                        print(f"📧 {item['email']}")
-                    if len(unique_emails) > 10:
-                        print(f"... y {len(unique_emails) - 10} más")
-                else:
-                    print("❌ No se encontraron emails en los mensajes de este usuario.")
-            except Exception as e:
-                logger.error(f"Error extrayendo emails: {e}")
-                print(f"❌ Error: {e}")
-
-        elif option == "14":
-            print("📞 Extrayendo números de teléfono mencionados...")
-            phones = await osint_tool.extract_phone_numbers(target, limit=300)
-            if phones:
-                print(f"\n✅ Números de teléfono encontrados ({len(phones)}):")
-                for i, phone in enumerate(phones[:10], 1):
-                    print(f"{i}. 📞 {phone['phone']}")
-                    print(f"   📅 {phone['date']}")
-                    print(f"   💬 Contexto: {phone['context']}")
-                    print()
-                if len(phones) > 10:
-                    print(f"... y {len(phones) - 10} más")
-                
-                save = input("¿Guardar resultados? (s/n): ").strip().lower()
-                if save == 's':
-                    filename = f"phones_{target.replace('@', '').replace(' ', '_')}.json"
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        json.dump(phones, f, indent=2, ensure_ascii=False)
-                    print(f"💾 Resultados guardados en: {filename}")
-            else:
-                print("❌ No se encontraron números de teléfono")
-
-        elif option == "15":
-            print("🕸️ Creando mapa de conexiones...")
-            connections = await osint_tool.get_user_connections_map(target)
-            if connections and connections.get('common_groups'):
-                print(f"\n✅ Mapa de conexiones para {target}:")
-                print(f"Grupos en común: {len(connections['common_groups'])}")
-                
-                for i, group in enumerate(connections['common_groups'][:5], 1):
-                    print(f"\n{i}. 🏷️ {group['name']} ({group['type']})")
-                    print(f"   👥 {group['participants_count']} miembros")
-                    print(f"   🤝 {len(group['common_contacts'])} contactos en común")
-                    
-                    if group['common_contacts']:
-                        print("   Contactos destacados:")
-                        for contact in group['common_contacts'][:3]:
-                            name = f"{contact['first_name']} {contact['last_name']}".strip()
-                            print(f"     • {name} (@{contact['username']})")
-            else:
-                print("❌ No se pudieron obtener las conexiones")
-
-        elif option == "16":
-            print("✍️ Analizando estilo de escritura...")
-            style_analysis = await osint_tool.analyze_message_style(target, limit=300)
-            if style_analysis:
-                print(f"\n📊 ANÁLISIS DE ESTILO DE ESCRITURA:")
-                print(f"Longitud promedio: {style_analysis.get('avg_message_length', 0):.1f} caracteres")
-                print(f"Mensajes analizados: {style_analysis.get('writing_style_metrics', {}).get('total_messages_analyzed', 0)}")
-                
-                punctuation = style_analysis.get('punctuation_usage', {})
-                print(f"\n📝 USO DE PUNTUACIÓN:")
-                print(f"  • Puntos: {punctuation.get('periods', 0)}")
-                print(f"  • Comas: {punctuation.get('commas', 0)}")
-                print(f"  • Exclamaciones: {punctuation.get('exclamations', 0)}")
-                print(f"  • Preguntas: {punctuation.get('questions', 0)}")
-                
-                emoticons = style_analysis.get('emoticon_usage', {})
-                if emoticons:
-                    print(f"\n😊 EMOTICONOS MÁS USADOS:")
-                    for emoticon, count in emoticons.most_common(5):
-                        print(f"  • {emoticon}: {count} veces")
-                
-                capitalization = style_analysis.get('capitalization_patterns', {})
-                if capitalization.get('total_words', 0) > 0:
-                    rate = capitalization.get('capitalization_rate', 0)
-                    print(f"\n🔠 TASA DE CAPITALIZACIÓN: {rate:.1f}%")
-            else:
-                print("❌ No se pudo analizar el estilo de escritura")
-
-        elif option == "17":
-            print("🚀 Generando reporte OSINT PREMIUM...")
-            premium_report = await osint_tool.get_premium_osint_report(target)
-            if premium_report:
-                filename = osint_tool.save_results(premium_report)
-                report = osint_tool.generate_advanced_report(premium_report)
-                print(report)
-                print(f"\n✅ Reporte premium guardado en: {filename}")
-                
-                # Mostrar estadísticas adicionales
-                print(f"\n📈 ESTADÍSTICAS PREMIUM:")
-                print(f"• Emails extraídos: {len(premium_report.get('extracted_emails', []))}")
-                print(f"• Teléfonos encontrados: {len(premium_report.get('extracted_phones', []))}")
-                print(f"• Grupos analizados: {len(premium_report.get('public_groups', []))}")
-                print(f"• Conexiones mapeadas: {len(premium_report.get('connections_map', {}).get('common_groups', []))}")
-            else:
-                print("❌ No se pudo generar el reporte premium")
-
-        else:
-            print("❌ Opción no válida")
-
-    except Exception as e:
-        logger.error(f"Error en la ejecución: {e}")
-        print(f"❌ Error: {e}")
-    finally:
-        osint_tool.cleanup_temp_files()
-        print("\n🧹 Limpieza completada")
-
-
-if __name__ == "__main__":
-    for folder in ['photos', 'deleted_photos']:
-        if not os.path.exists(folder):
-            os.makedirs(folder)
-    asyncio.run(main())
\ No newline at end of file
+import argparse
+import asyncio
+import base64
+import io
+import json
+import math
+import os
+import re
+import time
+import hashlib
+import logging
+import logging.handlers
+import queue
+import atexit
+import sqlite3
+import zlib
+import heapq
+import copy
+from abc import ABC, abstractmethod
+from array import array
+from collections import deque
+from xml.sax.saxutils import escape as xml_escape
+from html import escape as html_escape
+from datetime import datetime, timedelta, timezone
+from collections import Counter
+from typing import List, Dict
+from telethon import TelegramClient, events, functions, types, errors, utils
+from telethon.tl.types import User, Chat, Channel
+import requests
+from bs4 import BeautifulSoup
+from config import API_CONFIG, SEARCH_CONFIG
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Configuración de logging: 'text' (por defecto) o 'json' (JSON-lines en el fichero).
+# Los handlers escriben desde un hilo aparte, así los bucles solo encolan registros
+LOG_FORMAT = SEARCH_CONFIG.get('log_format', 'text')
+LOG_LEVEL = SEARCH_CONFIG.get('log_level', 'INFO')
+# Eventos por elemento (una foto, una coincidencia...): se registra 1 de cada N (0 = ninguno)
+LOG_SAMPLING = {'photo_recovered': 1, 'name_match': 1, 'email_found': 1, 'media_downloaded': 1,
+                **SEARCH_CONFIG.get('log_sampling', {})}
+# Segundos mínimos entre dos mensajes de progreso de un mismo escaneo
+LOG_PROGRESS_INTERVAL = SEARCH_CONFIG.get('log_progress_interval', 5)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Un objeto JSON por línea con el mensaje y los campos del evento"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'msg': record.getMessage()
+        }
+        if getattr(record, 'event', None):
+            entry['event'] = record.event
+            entry.update(record.fields)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging():
+    """Fichero y consola detrás de una cola atendida por un hilo (QueueListener)"""
+    text_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    if LOG_FORMAT == 'json':
+        file_handler = logging.FileHandler('telegram_osint.jsonl', encoding='utf-8')
+        file_handler.setFormatter(JsonLinesFormatter())
+    else:
+        file_handler = logging.FileHandler('telegram_osint.log', encoding='utf-8')
+        file_handler.setFormatter(text_formatter)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(text_formatter)
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener.start()
+    atexit.register(listener.stop)
+
+
+setup_logging()
+logger = logging.getLogger(__name__)
+_event_counts = Counter()
+
+
+def log_event(event, level, template, **fields):
+    """Registrar un evento por elemento respetando nivel y muestreo.
+
+    El mensaje solo se formatea si el evento se va a escribir, así que un evento
+    descartado cuesta una comprobación de nivel y un contador.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    every = LOG_SAMPLING.get(event, 1)
+    if not every:
+        return
+    _event_counts[event] += 1
+    if (_event_counts[event] - 1) % every:
+        return
+    logger.log(level, template.format(**fields), extra={'event': event, 'fields': fields})
+
+
+class ProgressReporter:
+    """Progreso de un escaneo largo, como mucho un mensaje cada LOG_PROGRESS_INTERVAL segundos"""
+
+    def __init__(self, label, total=None, interval=LOG_PROGRESS_INTERVAL):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.count = 0
+        self.started = self.last = time.monotonic()
+
+    def tick(self, n=1):
+        self.count += n
+        now = time.monotonic()
+        if now - self.last >= self.interval:
+            self.last = now
+            self._report(now)
+
+    def done(self):
+        self._report(time.monotonic())
+
+    def _report(self, now):
+        elapsed = now - self.started
+        rate = self.count / elapsed if elapsed else 0
+        progress = f"{self.count}/{self.total}" if self.total else str(self.count)
+        logger.info(f"📨 {self.label}: {progress} ({rate:.0f}/s)", extra={
+            'event': 'progress',
+            'fields': {'label': self.label, 'count': self.count, 'total': self.total, 'rate': round(rate, 1)}
+        })
+
+# Carpeta de datos persistentes (índices locales, caches, checkpoints)
+DATA_FOLDER = SEARCH_CONFIG.get('download_folder', 'telegram_osint_data')
+
+# Índice de texto completo: tabla de mensajes + FTS5 externo con plegado de
+# acentos (unicode61 remove_diacritics 2) para que "cancion" encuentre "canción"
+FTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed_messages (
+    id INTEGER PRIMARY KEY,
+    target_id INTEGER NOT NULL,
+    target TEXT,
+    message_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    media_type TEXT NOT NULL DEFAULT 'text',
+    text TEXT NOT NULL,
+    UNIQUE (target_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_indexed_messages_target_date ON indexed_messages (target_id, date);
+CREATE INDEX IF NOT EXISTS idx_indexed_messages_target ON indexed_messages (target);
+CREATE INDEX IF NOT EXISTS idx_indexed_messages_date ON indexed_messages (date);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    text,
+    content='indexed_messages',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS indexed_messages_ai AFTER INSERT ON indexed_messages BEGIN
+    INSERT INTO messages_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS indexed_messages_ad AFTER DELETE ON indexed_messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS indexed_messages_au AFTER UPDATE OF text ON indexed_messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    INSERT INTO messages_fts (rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+# Índice invertido de identificadores: (tipo, valor normalizado) -> apariciones.
+# La clave primaria empieza por (kind, value) para que la correlación sea un
+# único recorrido de B-tree
+IDENTIFIER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS identifiers (
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    target_id INTEGER NOT NULL,
+    target TEXT,
+    message_id INTEGER NOT NULL,
+    date TEXT,
+    PRIMARY KEY (kind, value, target_id, message_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_identifiers_target ON identifiers (target_id, kind, value);
+"""
+
+# Rollups diarios de actividad por chat y remitente. El cursor guarda el rango de
+# ids ya agregado, así cada actualización solo lee mensajes fuera de ese rango
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    chat_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    sender_id INTEGER NOT NULL,
+    messages INTEGER NOT NULL DEFAULT 0,
+    media INTEGER NOT NULL DEFAULT 0,
+    views INTEGER NOT NULL DEFAULT 0,
+    forwards INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (chat_id, day, sender_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_cursors (
+    chat_id INTEGER PRIMARY KEY,
+    chat TEXT,
+    min_message_id INTEGER NOT NULL,
+    max_message_id INTEGER NOT NULL,
+    updated_at TEXT
+);
+"""
+
+# Historial de fotos de perfil: qué photo_id se ha descargado y en qué tamaño,
+# para no repetir descargas y detectar cambios de foto entre ejecuciones
+PROFILE_PHOTO_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profile_photos (
+    user_id INTEGER NOT NULL,
+    photo_id INTEGER NOT NULL,
+    size TEXT NOT NULL,
+    date TEXT,
+    path TEXT,
+    first_seen TEXT,
+    last_seen TEXT,
+    PRIMARY KEY (user_id, photo_id, size)
+) WITHOUT ROWID;
+"""
+
+# Índice de medios solo con metadatos: qué se publicó, sin descargar nada. 'path'
+# se rellena cuando un elemento se descarga después bajo demanda
+MEDIA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media_index (
+    chat_id INTEGER NOT NULL,
+    chat TEXT,
+    message_id INTEGER NOT NULL,
+    date TEXT,
+    sender_id INTEGER,
+    kind TEXT NOT NULL,
+    media_id INTEGER,
+    dc_id INTEGER,
+    mime_type TEXT,
+    size INTEGER,
+    width INTEGER,
+    height INTEGER,
+    duration REAL,
+    file_name TEXT,
+    path TEXT,
+    PRIMARY KEY (chat_id, message_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_media_index_kind ON media_index (chat_id, kind, date);
+CREATE INDEX IF NOT EXISTS idx_media_index_media_id ON media_index (media_id);
+CREATE TABLE IF NOT EXISTS media_cursors (
+    chat_id INTEGER NOT NULL,
+    filter TEXT NOT NULL,
+    min_message_id INTEGER NOT NULL,
+    max_message_id INTEGER NOT NULL,
+    updated_at TEXT,
+    PRIMARY KEY (chat_id, filter)
+) WITHOUT ROWID;
+"""
+
+# Huellas estilométricas: un vector de longitud fija (float32) por objetivo
+STYLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS style_vectors (
+    target_id INTEGER PRIMARY KEY,
+    target TEXT,
+    messages INTEGER NOT NULL,
+    updated_at TEXT,
+    vector BLOB NOT NULL
+);
+"""
+
+# Lista de vigilancia: intervalo adaptado a la actividad de cada objetivo y
+# siguiente refresco previsto (epoch) para la cola de prioridad del planificador
+WATCHLIST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watchlist (
+    target TEXT PRIMARY KEY,
+    target_id INTEGER,
+    username TEXT,
+    interval REAL NOT NULL,
+    next_due REAL NOT NULL,
+    last_run REAL,
+    last_seen TEXT,
+    message_rate REAL NOT NULL DEFAULT 0,
+    change_rate REAL NOT NULL DEFAULT 0,
+    runs INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS watchlist_due ON watchlist (next_due);
+"""
+
+# Caché de resultados de análisis: la clave incluye el último mensaje visto del
+# objetivo, así que un mensaje nuevo invalida sus resultados. Resultados en JSON con zlib
+ANALYSIS_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    cache_key TEXT PRIMARY KEY,
+    target_id INTEGER NOT NULL,
+    analyzer TEXT NOT NULL,
+    params TEXT NOT NULL,
+    latest_message_id INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL,
+    result BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analysis_cache_lru ON analysis_cache (last_used);
+CREATE INDEX IF NOT EXISTS analysis_cache_series ON analysis_cache (target_id, analyzer, params);
+"""
+
+# Estado intermedio de cada analizador por objetivo y parámetros, con el rango de
+# mensajes ya agregados: los refrescos solo leen lo posterior a max_message_id
+ANALYZER_STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyzer_states (
+    target_id INTEGER NOT NULL,
+    analyzer TEXT NOT NULL,
+    params TEXT NOT NULL,
+    target TEXT,
+    min_message_id INTEGER,
+    max_message_id INTEGER,
+    updated_at TEXT,
+    state BLOB NOT NULL,
+    PRIMARY KEY (target_id, analyzer, params)
+) WITHOUT ROWID;
+-- Registros por mensaje (texto, puntuación...) fuera del estado: se añaden sin
+-- reescribir lo ya guardado y solo se leen para construir el resultado
+CREATE TABLE IF NOT EXISTS analyzer_records (
+    target_id INTEGER NOT NULL,
+    analyzer TEXT NOT NULL,
+    params TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (target_id, analyzer, params, message_id)
+) WITHOUT ROWID;
+"""
+
+# Esquemas que se aplican al abrir la base de índices local
+INDEX_SCHEMAS = [FTS_SCHEMA, IDENTIFIER_SCHEMA, ROLLUP_SCHEMA, PROFILE_PHOTO_SCHEMA, MEDIA_SCHEMA, STYLE_SCHEMA,
+                 WATCHLIST_SCHEMA, ANALYSIS_CACHE_SCHEMA, ANALYZER_STATE_SCHEMA]
+
+# Filtros de búsqueda del servidor que cubren todos los tipos de medio: así solo
+# se piden los mensajes con medios y no el historial completo
+MEDIA_INDEX_FILTERS = (
+    'InputMessagesFilterPhotoVideo', 'InputMessagesFilterDocument', 'InputMessagesFilterMusic',
+    'InputMessagesFilterVoice', 'InputMessagesFilterRoundVideo', 'InputMessagesFilterGif'
+)
+# Carpeta de los medios descargados bajo demanda desde el índice
+MEDIA_FOLDER = os.path.join(DATA_FOLDER, 'media')
+
+# Carpeta del historial de fotos de perfil (una subcarpeta por usuario)
+PROFILE_PHOTO_FOLDER = os.path.join(DATA_FOLDER, 'profile_photos')
+
+# Mensajes que se agregan en memoria antes de escribir un lote de rollups
+ROLLUP_FLUSH_EVERY = 1000
+
+# Expresión SQL que agrupa los días de los rollups en cada granularidad
+ROLLUP_PERIODS = {
+    'day': 'day',
+    'week': "strftime('%Y-W%W', day)",
+    'month': 'substr(day, 1, 7)',
+    'year': 'substr(day, 1, 4)'
+}
+
+# Patrones de identificadores que se indexan de forma cruzada entre objetivos
+EMAIL_REGEX = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+PHONE_PATTERNS = [
+    r'\+\d{1,3}[-.\s]?\d{1,14}',
+    r'\d{3}[-.\s]?\d{3}[-.\s]?\d{4}',
+    r'\(\d{3}\)\s*\d{3}[-.\s]?\d{4}'
+]
+IDENTIFIER_PATTERNS = {
+    'email': re.compile(EMAIL_REGEX),
+    'phone': re.compile('|'.join(f'(?:{pattern})' for pattern in PHONE_PATTERNS)),
+    'domain': re.compile(r'https?://([^/\s:?#]+)', re.IGNORECASE),
+    'mention': re.compile(r'(?<![\w@.])@([A-Za-z][A-Za-z0-9_]{3,31})\b'),
+    'wallet': re.compile(r'\b(0x[a-fA-F0-9]{40}|bc1[a-z0-9]{25,59}|[13][a-km-zA-HJ-NP-Z1-9]{25,34}|T[1-9A-HJ-NP-Za-km-z]{33})\b')
+}
+# Dominio o URL escritos a mano en una consulta (con o sin esquema, puerto y ruta)
+IDENTIFIER_DOMAIN_REGEX = re.compile(r'(?:https?://)?(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+[a-z]{2,63}(?::\d+)?(?:[/?#]\S*)?', re.IGNORECASE)
+
+# Alias cortos para filtrar por tipo de medio en las búsquedas
+MEDIA_TYPE_ALIASES = {
+    'text': 'text',
+    'photo': 'MessageMediaPhoto',
+    'document': 'MessageMediaDocument',
+    'geo': 'MessageMediaGeo',
+    'venue': 'MessageMediaVenue',
+    'webpage': 'MessageMediaWebPage',
+    'poll': 'MessageMediaPoll',
+    'contact': 'MessageMediaContact'
+}
+
+# Segundos que se reutiliza la lista de chats en común de un objetivo
+COMMON_CHATS_TTL = 600
+
+# Plantillas del motor de reportes: cada formato define cómo se escribe cada pieza
+REPORT_TEMPLATES = {
+    'text': {
+        'start': "\n=== {title} ===\n",
+        'end': "",
+        'heading': "\n{title}:\n{rule}\n",
+        'field': "{label}: {value}\n",
+        'item': "- {text}\n",
+        'entry': "{text}\n",
+        'subitem': "   {text}\n",
+        'line': "{text}\n",
+        'separator': "   " + "-" * 50 + "\n",
+        'list_start': "",
+        'list_end': ""
+    },
+    'markdown': {
+        'start': "# {title}\n",
+        'end': "",
+        'heading': "\n## {title}\n\n",
+        'field': "- **{label}:** {value}\n",
+        'item': "- {text}\n",
+        'entry': "- {text}\n",
+        'subitem': "  - {text}\n",
+        'line': "\n{text}\n",
+        'separator': "",
+        'list_start': "",
+        'list_end': ""
+    },
+    'html': {
+        'start': '<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{title}</title></head><body>\n<h1>{title}</h1>\n',
+        'end': "</body></html>\n",
+        'heading': "<h2>{title}</h2>\n",
+        'field': "<li><b>{label}:</b> {value}</li>\n",
+        'item': "<li>{text}</li>\n",
+        'entry': "<li>{text}</li>\n",
+        'subitem': '<li style="list-style:none;margin-left:1.5em">{text}</li>\n',
+        'line': "<p>{text}</p>\n",
+        'separator': "",
+        'list_start': "<ul>\n",
+        'list_end': "</ul>\n"
+    }
+}
+# Markdown: caracteres con significado en línea y marcadores de bloque al inicio de una línea
+MARKDOWN_SPECIAL = re.compile(r'([\\`*_\[\]<>|~#])')
+MARKDOWN_BLOCK_START = re.compile(r'^([+-]|\d+[.)])')
+REPORT_EXTENSIONS = {'text': 'txt', 'markdown': 'md', 'html': 'html'}
+
+# Secciones que componen cada tipo de reporte, en orden de aparición
+REPORT_SECTIONS = {
+    'basic': ('user', 'usernames', 'created_channels', 'public_groups', 'message_statistics', 'photo'),
+    'advanced': ('user', 'usernames', 'created_channels', 'public_groups', 'message_statistics', 'photo',
+                 'behavior', 'cross_platform', 'sentiment', 'geolocation', 'timeline', 'contact_network',
+                 'phones', 'writing_style', 'sections_status'),
+    'detailed': ('messages', 'vocabulary', 'categories', 'topics')
+}
+REPORT_TITLES = {
+    'basic': 'REPORTE OSINT TELEGRAM AVANZADO',
+    'advanced': 'REPORTE OSINT TELEGRAM AVANZADO',
+    'detailed': 'ANÁLISIS DETALLADO DE MENSAJES'
+}
+
+# Bits de categoría por mensaje: la tabla compacta guarda un único registro por
+# mensaje y cada categoría lo referencia por id (y por bit en 'flags')
+CATEGORY_FLAGS = {
+    'text_only': 1,
+    'with_links': 2,
+    'with_media': 4,
+    'questions': 8,
+    'exclamations': 16,
+    'long_messages': 32,
+    'short_messages': 64
+}
+
+# Ritmo de lectura de historial: cada petición trae hasta 100 mensajes, así que
+# 3 peticiones/s son ~1M de mensajes por hora, por debajo de los límites de flood
+HISTORY_PAGE_SIZE = 100
+HISTORY_REQUESTS_PER_SECOND = 3
+SWEEP_CONCURRENCY = 8
+
+# Usuarios por petición users.GetUsers al resolver remitentes en bloque
+USER_BATCH_SIZE = 100
+
+# Léxico de sentimiento base (español e inglés, pesos de -3 a 3, sin acentos).
+# Se puede ampliar con ficheros propios en SEARCH_CONFIG['sentiment_lexicons']
+SENTIMENT_LEXICON = {
+    'bueno': 2, 'buena': 2, 'buenos': 2, 'buenas': 2, 'bien': 1.5, 'mejor': 2, 'genial': 3, 'excelente': 3,
+    'fantastico': 3, 'fantastica': 3, 'maravilloso': 3, 'maravillosa': 3, 'feliz': 3, 'contento': 2,
+    'contenta': 2, 'alegre': 2, 'alegria': 2, 'amo': 3, 'amor': 3, 'encanta': 3, 'encantado': 2,
+    'increible': 2, 'perfecto': 3, 'perfecta': 3, 'gracias': 1.5, 'bonito': 2, 'bonita': 2, 'precioso': 3,
+    'guapo': 2, 'guapa': 2, 'divertido': 2, 'exito': 2, 'gusta': 2, 'quiero': 1, 'suerte': 1.5, 'ganar': 1.5,
+    'tranquilo': 1, 'orgulloso': 2, 'brutal': 2, 'top': 2, 'crack': 2, 'jaja': 1.5, 'jajaja': 2,
+    'malo': -2, 'mala': -2, 'malos': -2, 'mal': -2, 'peor': -2.5, 'terrible': -3, 'horrible': -3,
+    'triste': -2, 'tristeza': -2, 'enojado': -2, 'enfadado': -2, 'molesto': -2, 'frustrado': -2, 'odio': -3,
+    'odiar': -3, 'asco': -3, 'aburrido': -1.5, 'cansado': -1.5, 'miedo': -2, 'problema': -1.5, 'fatal': -3,
+    'mierda': -3, 'basura': -3, 'estafa': -3, 'fraude': -3, 'muerte': -2.5, 'dolor': -2, 'llorar': -2,
+    'error': -1.5, 'perder': -1.5, 'culpa': -1.5, 'preocupado': -1.5, 'harto': -2.5, 'pena': -1.5,
+    'good': 2, 'great': 3, 'excellent': 3, 'amazing': 3, 'awesome': 3, 'wonderful': 3, 'happy': 3,
+    'love': 3, 'like': 1.5, 'best': 3, 'better': 2, 'nice': 2, 'cool': 1.5, 'perfect': 3, 'thanks': 1.5,
+    'thank': 1.5, 'glad': 2, 'fun': 2, 'beautiful': 3, 'win': 2, 'lol': 1.5, 'enjoy': 2, 'proud': 2,
+    'bad': -2.5, 'worse': -2.5, 'worst': -3, 'awful': -3, 'sad': -2, 'angry': -3,
+    'hate': -3, 'annoyed': -2, 'boring': -2, 'tired': -1.5, 'scam': -3, 'fraud': -3, 'fear': -2,
+    'problem': -1.5, 'fail': -2, 'wrong': -2, 'pain': -2, 'cry': -2, 'sucks': -2.5, 'shit': -3, 'lose': -2
+}
+SENTIMENT_NEGATIONS = {'no', 'ni', 'nunca', 'jamas', 'tampoco', 'nada', 'sin', 'not', 'never', "don't",
+                       "isn't", "wasn't", "doesn't", "didn't", "can't", 'dont', 'isnt', 'cant', 'without'}
+SENTIMENT_INTENSIFIERS = {
+    'muy': 1.5, 'super': 1.5, 'mucho': 1.3, 'muchisimo': 1.8, 'bastante': 1.2, 'tan': 1.3, 'demasiado': 1.5,
+    're': 1.3, 'poco': 0.5, 'algo': 0.7, 'very': 1.5, 'really': 1.4, 'so': 1.3, 'extremely': 1.8,
+    'too': 1.3, 'slightly': 0.5, 'somewhat': 0.7
+}
+SENTIMENT_EMOJIS = {
+    '😀': 2, '😃': 2, '😄': 2, '😁': 2, '😂': 1.5, '🤣': 1.5, '😊': 2, '🙂': 1, '😍': 3, '🥰': 3, '😘': 2,
+    '❤': 3, '❤️': 3, '💕': 3, '👍': 2, '👏': 2, '🎉': 2, '🔥': 1.5, '💪': 1.5, '😎': 1.5, ':)': 1.5, ':D': 2,
+    '😢': -2, '😭': -2.5, '😞': -2, '😔': -2, '😠': -3, '😡': -3, '🤬': -3, '💔': -3, '👎': -2, '😒': -1.5,
+    '🙄': -1.5, '😤': -2, '😩': -2, '😱': -1.5, '🤮': -3, ':(': -1.5
+}
+# Peso de una palabra dentro del alcance de una negación y nº de tokens que abarca
+SENTIMENT_NEGATION_FACTOR = -0.75
+SENTIMENT_NEGATION_SCOPE = 3
+# Umbral de la puntuación normalizada (-1..1) para considerar un mensaje positivo/negativo
+SENTIMENT_THRESHOLD = 0.05
+SENTIMENT_BATCH_SIZE = 1000
+
+# Pares de plegado de acentos compartidos por léxicos y nomenclátor
+FOLD_ACCENTS = (('á', 'a'), ('é', 'e'), ('í', 'i'), ('ó', 'o'), ('ú', 'u'), ('ü', 'u'), ('à', 'a'), ('è', 'e'),
+                ('ñ', 'n'), ('ç', 'c'))
+
+# Nomenclátor local en formato GeoNames (p. ej. cities1000.txt + countryInfo como
+# filas de clase 'A'). Sin fichero se usa la pequeña lista de respaldo de abajo
+GAZETTEER_FILE = SEARCH_CONFIG.get('gazetteer', os.path.join(DATA_FOLDER, 'gazetteer.txt'))
+GAZETTEER_MIN_POPULATION = 1000
+# Topónimos de una palabra que también son palabras comunes y solo generarían ruido
+GAZETTEER_STOPWORDS = {
+    'de', 'la', 'el', 'los', 'las', 'san', 'paz', 'sin', 'como', 'para', 'mar', 'real', 'nueva', 'hola', 'casa',
+    'sol', 'luna', 'vida', 'todo', 'este', 'norte', 'sur', 'centro', 'pueblo', 'ciudad', 'bar', 'the', 'and',
+    'of', 'is', 'are', 'see', 'love', 'home', 'best', 'nice', 'mobile', 'florida', 'victoria', 'aqui', 'alto'
+}
+# Respaldo: (nombre, latitud, longitud, país, población, clase de entidad GeoNames)
+GAZETTEER_FALLBACK = [
+    ('Madrid', 40.4165, -3.7026, 'ES', 3255944, 'P'), ('Barcelona', 41.3888, 2.159, 'ES', 1621537, 'P'),
+    ('Valencia', 39.4699, -0.3763, 'ES', 814208, 'P'), ('Sevilla', 37.3828, -5.9732, 'ES', 703206, 'P'),
+    ('Zaragoza', 41.6561, -0.8773, 'ES', 674317, 'P'), ('Málaga', 36.7202, -4.4203, 'ES', 568305, 'P'),
+    ('Murcia', 37.9870, -1.1300, 'ES', 436870, 'P'), ('Palma', 39.5694, 2.6502, 'ES', 401270, 'P'),
+    ('Bilbao', 43.2627, -2.9253, 'ES', 354860, 'P'), ('Granada', 37.1882, -3.6067, 'ES', 234758, 'P'),
+    ('Valencia', 10.1620, -68.0077, 'VE', 1484430, 'P'), ('Granada', 11.9299, -85.9560, 'NI', 79418, 'P'),
+    ('Ciudad de México', 19.4285, -99.1277, 'MX', 12294193, 'P'), ('Buenos Aires', -34.6132, -58.3772, 'AR', 13076300, 'P'),
+    ('Bogotá', 4.6097, -74.0818, 'CO', 7674366, 'P'), ('Santiago', -33.4569, -70.6483, 'CL', 4837295, 'P'),
+    ('Lima', -12.0432, -77.0282, 'PE', 7737002, 'P'), ('Caracas', 10.4880, -66.8792, 'VE', 3000000, 'P'),
+    ('España', 40.0, -4.0, 'ES', 46723749, 'A'), ('Spain', 40.0, -4.0, 'ES', 46723749, 'A'),
+    ('México', 23.0, -102.0, 'MX', 126190788, 'A'), ('Mexico', 23.0, -102.0, 'MX', 126190788, 'A'),
+    ('Argentina', -34.0, -64.0, 'AR', 44494502, 'A'), ('Colombia', 4.0, -73.25, 'CO', 49648685, 'A'),
+    ('Chile', -30.0, -71.0, 'CL', 18729160, 'A'), ('Perú', -10.0, -76.0, 'PE', 31989256, 'A'),
+    ('Venezuela', 8.0, -66.0, 'VE', 28870195, 'A')
+]
+# Distancia (km) a unas coordenadas reales por debajo de la cual un candidato se refuerza
+GEO_PROXIMITY_KM = 200
+# País por defecto (ISO) para desempatar homónimos sin más contexto ("Valencia" -> ES),
+# y factor con que se refuerzan sus candidatos; None desactiva la preferencia
+GEO_HOME_COUNTRY = SEARCH_CONFIG.get('home_country', 'ES')
+GEO_HOME_WEIGHT = 1.5
+
+# Huella estilométrica: trigramas de caracteres (hashing estable con crc32), tasas de
+# palabras funcionales, perfil de puntuación, emojis y forma de los mensajes
+STYLE_NGRAM_BUCKETS = 256
+STYLE_EMOJI_BUCKETS = 32
+STYLE_FUNCTION_WORDS = (
+    'de', 'la', 'que', 'el', 'en', 'y', 'a', 'los', 'se', 'del', 'las', 'un', 'por', 'con', 'no', 'una', 'su',
+    'para', 'es', 'al', 'lo', 'como', 'mas', 'pero', 'le', 'ya', 'o', 'porque', 'muy', 'sin', 'tambien', 'me',
+    'pues', 'bueno', 'osea', 'tipo', 'q', 'xq', 'pq', 'the', 'to', 'and', 'of', 'in', 'is', 'you', 'that', 'it',
+    'for', 'i', 'on', 'with', 'this', 'but', 'not', 'so', 'just', 'u'
+)
+STYLE_PUNCTUATION = ('.', ',', '!', '?', ';', ':', '"', "'", '(', '-', '...', '!!', '??', '¿', '¡', '*', '~')
+STYLE_BLOCK_WEIGHTS = (('ngrams', 1.0), ('function_words', 1.0), ('punctuation', 1.0), ('emoji', 0.5), ('shape', 0.5))
+STYLE_EMOJI_REGEX = re.compile('[\u2600-\u27bf\U0001F300-\U0001FAFF]')
+STYLE_MIN_MESSAGES = 20
+
+# Modo aproximado para vocabulario y n-gramas: memoria acotada en lugar de un
+# Counter exacto. Se activa con SEARCH_CONFIG['approximate_counts']
+APPROXIMATE_COUNTS = SEARCH_CONFIG.get('approximate_counts', False)
+SKETCH_MEMORY_MB = SEARCH_CONFIG.get('sketch_memory_mb', 16)
+# Mensajes que se cuentan de forma exacta antes de volcarlos a los sketches
+SKETCH_BATCH_SIZE = 1000
+# Registros por mensaje (los más recientes) que se cargan para construir el resultado
+# de un estado guardado: el refresco no lee todo el historial de analyzer_records
+ANALYZER_RESULT_RECORDS = 1000
+
+# Modo delta: campos del perfil que se comparan con el último reporte guardado,
+# tope de mensajes nuevos que se piden y de los que se copian al conjunto de cambios
+DELTA_PROFILE_FIELDS = ('username', 'first_name', 'last_name', 'bio', 'phone', 'photo_id',
+                        'verified', 'premium', 'scam', 'fake', 'restricted')
+DELTA_MESSAGE_LIMIT = 1000
+DELTA_MAX_MESSAGES = 50
+# Claves de un reporte guardado que no son secciones (no llevan fecha de obtención propia)
+DELTA_REPORT_META_KEYS = {'search_timestamp', 'report_version', 'sections_status', 'messages', 'delta_from',
+                          'updated_at', 'section_timestamps'}
+
+# Planificador de la lista de vigilancia: límites del intervalo de refresco (s),
+# mensajes nuevos que se esperan entre refrescos y presupuesto global de refrescos
+WATCH_MIN_INTERVAL = 300
+WATCH_ACTIVE_INTERVAL = 1800
+WATCH_MAX_INTERVAL = 7 * 86400
+WATCH_DEFAULT_INTERVAL = 6 * 3600
+WATCH_DORMANT_DAYS = 30
+WATCH_MESSAGES_PER_REFRESH = 20
+WATCH_REFRESHES_PER_MINUTE = SEARCH_CONFIG.get('watch_refreshes_per_minute', 6)
+WATCH_CONCURRENCY = 3
+# Peso de la última observación en las medias móviles de ritmo y cambios
+WATCH_SMOOTHING = 0.5
+
+# Caché de análisis: tamaño máximo en disco (se expulsan los menos usados), segundos
+# durante los que se reutiliza la consulta del último mensaje y antigüedad máxima de
+# un resultado (algunos análisis dependen también de otros objetivos o del nomenclátor)
+ANALYSIS_CACHE_MB = SEARCH_CONFIG.get('analysis_cache_mb', 64)
+ANALYSIS_CACHE_PROBE_TTL = 30
+ANALYSIS_CACHE_MAX_AGE = 86400
+
+# Importación de exportaciones de Telegram Desktop (result.json): tamaño de cada bloque
+# leído, tope de un mensaje suelto, mensajes recientes que se retienen en memoria (cubre
+# los límites de las secciones del reporte) y tamaño de los lotes que se escriben en los índices
+EXPORT_CHUNK_SIZE = 1 << 20
+EXPORT_MAX_ITEM_BYTES = 64 << 20
+EXPORT_WINDOW_SIZE = 1000
+EXPORT_INDEX_BATCH = 1000
+# Secciones del reporte que solo leen mensajes: las únicas que se ejecutan sin conexión
+EXPORT_REPORT_SECTIONS = (
+    'user_info', 'message_statistics', 'behavior_patterns', 'geolocation_analysis', 'sentiment_analysis',
+    'activity_timeline', 'full_messages', 'word_analysis', 'message_categories', 'conversation_topics',
+    'extracted_phones', 'writing_style_analysis'
+)
+
+
+class RateLimiter:
+    """Token bucket asíncrono compartido por todos los escaneos; un FloodWait pausa a todos"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Esperar a que haya un token libre"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Detener todas las peticiones durante el tiempo que pide Telegram"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+def watch_interval(message_rate, last_seen=None, change_rate=0.0, online=False):
+    """Intervalo de refresco (segundos) de un objetivo según su actividad observada.
+
+    message_rate en mensajes por segundo, last_seen en ISO (None si lo oculta) y
+    change_rate la fracción suavizada de refrescos con cambios de perfil, usernames o chats.
+    """
+    interval = WATCH_MESSAGES_PER_REFRESH / message_rate if message_rate > 0 else WATCH_MAX_INTERVAL
+    idle = 0 if online else None
+    if last_seen and idle is None:
+        try:
+            idle = time.time() - datetime.fromisoformat(last_seen).timestamp()
+        except ValueError:
+            idle = None
+    if idle is not None:
+        if idle < 3600:
+            interval = min(interval, WATCH_ACTIVE_INTERVAL)
+        elif idle > WATCH_DORMANT_DAYS * 86400:
+            interval = WATCH_MAX_INTERVAL
+    interval *= 1 - 0.75 * min(max(change_rate, 0.0), 1.0)
+    return min(max(interval, WATCH_MIN_INTERVAL), WATCH_MAX_INTERVAL)
+
+
+def fold_text(text):
+    """Minúsculas y sin acentos: forma en la que se comparan léxicos y topónimos"""
+    text = text.lower()
+    if not text.isascii():
+        for accented, plain in FOLD_ACCENTS:
+            if accented in text:
+                text = text.replace(accented, plain)
+    return text
+
+
+class SentimentLexicon:
+    """Puntuador de sentimiento por léxico ponderado con negaciones, intensificadores y emojis"""
+
+    WORD_REGEX = re.compile(r"[\w']+")
+
+    def __init__(self, words=None, negations=None, intensifiers=None, emojis=None):
+        self.words = dict(SENTIMENT_LEXICON if words is None else words)
+        self.negations = set(SENTIMENT_NEGATIONS if negations is None else negations)
+        self.intensifiers = dict(SENTIMENT_INTENSIFIERS if intensifiers is None else intensifiers)
+        self.emojis = {emoji.lower(): weight for emoji, weight in (SENTIMENT_EMOJIS if emojis is None else emojis).items()}
+        self._compile()
+
+    def _compile(self):
+        # Los emojis no se ven afectados por negaciones: se buscan aparte y solo si el texto puede tenerlos
+        emojis = sorted(self.emojis, key=len, reverse=True)
+        self._emoji_regex = re.compile('|'.join(re.escape(emoji) for emoji in emojis)) if emojis else None
+        # Expresiones de varias palabras ("fed up"): prefijos de tokens, como en el nomenclátor
+        self._prefixes = set()
+        for phrase in self.words:
+            tokens = phrase.split(' ')
+            for size in range(1, len(tokens)):
+                self._prefixes.add(' '.join(tokens[:size]))
+
+    def load(self, path):
+        """Añadir un léxico desde JSON ({palabra: peso}) o TSV tipo AFINN (palabra<TAB>peso)"""
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.endswith('.json'):
+                entries = json.load(f).items()
+            else:
+                entries = (line.rstrip('\n').rsplit('\t', 1) for line in f if '\t' in line and not line.startswith('#'))
+            for word, weight in entries:
+                word = fold_text(word.strip())
+                if re.fullmatch(r"[\w' ]+", word):
+                    self.words[' '.join(self.WORD_REGEX.findall(word))] = float(weight)
+                else:
+                    self.emojis[word] = float(weight)
+        self._compile()
+        return self
+
+    def score(self, text):
+        """Puntuación normalizada de un texto entre -1 y 1"""
+        text = fold_text(text)
+        total = 0.0
+        if self._emoji_regex is not None and (':' in text or not text.isascii()):
+            for emoji in self._emoji_regex.findall(text):
+                total += self.emojis[emoji]
+        tokens = self.WORD_REGEX.findall(text)
+        words, prefixes = self.words, self._prefixes
+        # La mayoría de mensajes no tiene ninguna palabra del léxico: se descartan sin recorrerlos
+        if not words.keys().isdisjoint(tokens) or not prefixes.isdisjoint(tokens):
+            negations, intensifiers = self.negations, self.intensifiers
+            negated = 0
+            boost = 1.0
+            i = 0
+            while i < len(tokens):
+                token = tokens[i]
+                weight = words.get(token)
+                # Coincidencia más larga de una expresión que empieza en este token
+                size = key_size = 1
+                key = token
+                while key in prefixes and i + key_size < len(tokens):
+                    key = f"{key} {tokens[i + key_size]}"
+                    key_size += 1
+                    if key in words:
+                        weight, size = words[key], key_size
+                i += size
+                if weight is not None:
+                    weight *= boost
+                    if negated:
+                        weight *= SENTIMENT_NEGATION_FACTOR
+                    total += weight
+                    boost = 1.0
+                elif token in negations:
+                    negated = SENTIMENT_NEGATION_SCOPE + 1
+                elif token in intensifiers:
+                    boost *= intensifiers[token]
+                    continue
+                else:
+                    boost = 1.0
+                if negated:
+                    negated -= 1
+        # Misma normalización que VADER: acota la suma a (-1, 1)
+        return total / (total * total + 15) ** 0.5
+
+    def score_batch(self, texts):
+        """Puntuar un lote de textos"""
+        score = self.score
+        return [score(text) if text else 0.0 for text in texts]
+
+
+class Gazetteer:
+    """Nomenclátor compilado en un trie de prefijos de tokens: cada mensaje se recorre una sola vez"""
+
+    WORD_REGEX = re.compile(r"\w+")
+
+    def __init__(self, places=()):
+        self.places = []
+        self.names = {}
+        self.prefixes = set()
+        self.max_tokens = 1
+        for name, lat, lon, country, population, feature in places:
+            self.add(name, lat, lon, country, population, feature)
+
+    def add(self, name, lat, lon, country='', population=0, feature='P', alternate_names=()):
+        """Añadir un lugar con su nombre y sus nombres alternativos"""
+        index = len(self.places)
+        self.places.append({
+            'name': name, 'lat': lat, 'lon': lon, 'country': country,
+            'population': population, 'feature': feature
+        })
+        # Alias que se pliegan a la misma clave ("Málaga" y "Malaga") cuentan una sola vez
+        keys = {tuple(self.WORD_REGEX.findall(fold_text(alias))) for alias in {name, *alternate_names}}
+        for tokens in keys:
+            if not tokens or (len(tokens) == 1 and (len(tokens[0]) < 3 or tokens[0] in GAZETTEER_STOPWORDS)):
+                continue
+            for size in range(1, len(tokens)):
+                self.prefixes.add(' '.join(tokens[:size]))
+            self.names.setdefault(' '.join(tokens), []).append(index)
+            self.max_tokens = max(self.max_tokens, len(tokens))
+
+    @classmethod
+    def from_geonames(cls, path, min_population=GAZETTEER_MIN_POPULATION):
+        """Cargar un volcado GeoNames (tabulado): ciudades por población y países/regiones (clase A)"""
+        gazetteer = cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) < 15:
+                    continue
+                population = int(fields[14] or 0)
+                if fields[6] != 'A' and population < min_population:
+                    continue
+                # Solo alias en alfabeto latino: son los que pueden aparecer en los mensajes analizados
+                aliases = [alias for alias in fields[3].split(',') if alias and fold_text(alias).isascii()]
+                gazetteer.add(fields[1], float(fields[4]), float(fields[5]), fields[8], population, fields[6],
+                              [fields[2], *aliases])
+        return gazetteer
+
+    def find(self, text):
+        """Topónimos de un texto (coincidencia más larga desde cada posición) con sus candidatos"""
+        tokens = self.WORD_REGEX.findall(fold_text(text))
+        found = []
+        i = 0
+        while i < len(tokens):
+            key = tokens[i]
+            match = (key, 1) if key in self.names else None
+            size = 1
+            while key in self.prefixes and size < self.max_tokens and i + size < len(tokens):
+                key = f"{key} {tokens[i + size]}"
+                size += 1
+                if key in self.names:
+                    match = (key, size)
+            if match:
+                found.append(match[0])
+                i += match[1]
+            else:
+                i += 1
+        return found
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distancia en km entre dos coordenadas"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * math.asin(math.sqrt(a))
+
+
+_STYLE_FUNCTION_INDEX = {word: i for i, word in enumerate(STYLE_FUNCTION_WORDS)}
+
+
+def style_counts(texts, blocks=None):
+    """Recuentos estilométricos sin normalizar por bloque; se suman entre lotes de mensajes"""
+    function_index = _STYLE_FUNCTION_INDEX
+    if blocks is None:
+        blocks = {
+            'ngrams': [0.0] * STYLE_NGRAM_BUCKETS,
+            'function_words': [0.0] * len(STYLE_FUNCTION_WORDS),
+            'punctuation': [0.0] * len(STYLE_PUNCTUATION),
+            'emoji': [0.0] * STYLE_EMOJI_BUCKETS,
+            'shape': [0.0] * 8
+        }
+    ngrams, function_words, punctuation = blocks['ngrams'], blocks['function_words'], blocks['punctuation']
+    emoji, shape = blocks['emoji'], blocks['shape']
+    for text in texts:
+        folded = fold_text(text)
+        padded = f" {folded} ".encode('utf-8')
+        for i in range(len(padded) - 2):
+            ngrams[zlib.crc32(padded[i:i + 3]) % STYLE_NGRAM_BUCKETS] += 1
+        words = SentimentLexicon.WORD_REGEX.findall(folded)
+        for word in words:
+            index = function_index.get(word)
+            if index is not None:
+                function_words[index] += 1 / len(words)
+        length = len(text) or 1
+        for i, mark in enumerate(STYLE_PUNCTUATION):
+            punctuation[i] += text.count(mark) * 100 / length
+        for char in STYLE_EMOJI_REGEX.findall(text):
+            emoji[zlib.crc32(char.encode('utf-8')) % STYLE_EMOJI_BUCKETS] += 1
+        shape[0] += text[:1].isupper()
+        shape[1] += text == folded
+        shape[2] += sum(char.isdigit() for char in text) / length
+        shape[3] += math.log1p(len(text))
+        shape[4] += 'http' in folded
+        shape[5] += text.count('\n')
+        shape[6] += sum(char.isupper() for char in text) / length
+        shape[7] += re.search(r'(\w)\1\1', folded) is not None
+    return blocks
+
+
+def style_vector(blocks):
+    """Vector estilométrico unitario (array float32) a partir de los recuentos de style_counts.
+
+    Cada bloque se normaliza por separado y se pondera, para que los trigramas no
+    dominen la similitud coseno por tener más dimensiones.
+    """
+    vector = array('f')
+    for name, weight in STYLE_BLOCK_WEIGHTS:
+        block = blocks[name]
+        norm = math.sqrt(sum(value * value for value in block)) or 1.0
+        vector.extend(value * weight / norm for value in block)
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return array('f', (value / norm for value in vector))
+
+
+def style_fingerprint(texts):
+    """Vector estilométrico unitario de un conjunto de mensajes"""
+    return style_vector(style_counts(texts))
+
+
+class SpaceSaving:
+    """Top-k aproximado (Space-Saving por lotes): como mucho `capacity` claves en memoria.
+
+    Las claves que entran tras una poda heredan como error el mayor recuento podado
+    (`floor`), así que cada estimación sobrecuenta como mucho `floor` <= N / capacity.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.floor = 0
+        self.total = 0
+
+    def update(self, counts):
+        """Sumar un lote de recuentos exactos ({elemento: veces})"""
+        stored, errors, floor = self.counts, self.errors, self.floor
+        for item, count in counts.items():
+            if item in stored:
+                stored[item] += count
+            else:
+                stored[item] = floor + count
+                if floor:
+                    errors[item] = floor
+            self.total += count
+        if len(stored) > 2 * self.capacity:
+            self._prune()
+
+    def _prune(self):
+        ranked = sorted(self.counts.items(), key=lambda entry: entry[1], reverse=True)
+        self.floor = max(self.floor, ranked[self.capacity][1])
+        self.counts = dict(ranked[:self.capacity])
+        self.errors = {item: error for item, error in self.errors.items() if item in self.counts}
+
+    def merge(self, other):
+        """Combinar con otro resumen: las claves ausentes en un lado cuentan su `floor`"""
+        merged = SpaceSaving(max(self.capacity, other.capacity))
+        for item in set(self.counts) | set(other.counts):
+            merged.counts[item] = self.counts.get(item, self.floor) + other.counts.get(item, other.floor)
+            merged.errors[item] = (self.errors.get(item, 0) if item in self.counts else self.floor) + \
+                (other.errors.get(item, 0) if item in other.counts else other.floor)
+        merged.floor = self.floor + other.floor
+        merged.total = self.total + other.total
+        if len(merged.counts) > merged.capacity:
+            merged._prune()
+        return merged
+
+    def top(self, k):
+        """(elemento, recuento estimado, error máximo) de los k más frecuentes"""
+        ranked = sorted(self.counts.items(), key=lambda entry: entry[1], reverse=True)[:k]
+        return [(item, count, self.errors.get(item, 0)) for item, count in ranked]
+
+    def to_state(self):
+        return {'capacity': self.capacity, 'counts': self.counts, 'errors': self.errors, 'floor': self.floor, 'total': self.total}
+
+    @classmethod
+    def from_state(cls, state):
+        summary = cls(state['capacity'])
+        summary.counts, summary.errors = state['counts'], state['errors']
+        summary.floor, summary.total = state['floor'], state['total']
+        return summary
+
+
+class CountMinSketch:
+    """Frecuencia aproximada de cualquier elemento: sobrecuenta como mucho e/width * N con prob. 1 - e^-depth"""
+
+    def __init__(self, width, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = array('q', bytes(8 * width * depth))
+        self.total = 0
+
+    def _positions(self, item):
+        data = item.encode('utf-8')
+        first, second = zlib.crc32(data), zlib.adler32(data) | 1
+        return [row * self.width + (first + row * second) % self.width for row in range(self.depth)]
+
+    def update(self, counts):
+        table = self.table
+        for item, count in counts.items():
+            for position in self._positions(item):
+                table[position] += count
+            self.total += count
+
+    def estimate(self, item):
+        return min(self.table[position] for position in self._positions(item))
+
+    def error_bound(self):
+        return math.e / self.width * self.total
+
+    def merge(self, other):
+        merged = CountMinSketch(self.width, self.depth)
+        merged.table = array('q', (a + b for a, b in zip(self.table, other.table)))
+        merged.total = self.total + other.total
+        return merged
+
+    def to_state(self):
+        return {'width': self.width, 'depth': self.depth, 'total': self.total,
+                'table': base64.b64encode(self.table.tobytes()).decode('ascii')}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state['width'], state['depth'])
+        sketch.table = array('q', base64.b64decode(state['table']))
+        sketch.total = state['total']
+        return sketch
+
+
+class HyperLogLog:
+    """Cardinalidad aproximada (palabras únicas) con 2^p registros de un byte; error típico 1.04/sqrt(2^p)"""
+
+    def __init__(self, p=14):
+        self.p = p
+        self.registers = bytearray(1 << p)
+
+    def update(self, items):
+        registers, p = self.registers, self.p
+        for item in items:
+            value = int.from_bytes(hashlib.blake2b(item.encode('utf-8'), digest_size=8).digest(), 'big')
+            index = value >> (64 - p)
+            rank = (64 - p) - (value & ((1 << (64 - p)) - 1)).bit_length() + 1
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def estimate(self):
+        m = len(self.registers)
+        raw = (0.7213 / (1 + 1.079 / m)) * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        # Corrección de rango pequeño (linear counting)
+        if raw <= 2.5 * m and zeros:
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def merge(self, other):
+        merged = HyperLogLog(self.p)
+        merged.registers = bytearray(map(max, self.registers, other.registers))
+        return merged
+
+    def to_state(self):
+        return {'p': self.p, 'registers': base64.b64encode(bytes(self.registers)).decode('ascii')}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state['p'])
+        sketch.registers = bytearray(base64.b64decode(state['registers']))
+        return sketch
+
+
+class VocabularySketch:
+    """Vocabulario en memoria acotada: top-k (Space-Saving), frecuencias (Count-Min) y únicos (HyperLogLog)"""
+
+    def __init__(self, memory_mb=SKETCH_MEMORY_MB):
+        budget = memory_mb * 1024 * 1024
+        # Reparto aproximado: 1/4 Count-Min (4 filas de 8 bytes), HLL fijo, el resto top-k (~200 B por clave)
+        self.top = SpaceSaving(max(100, (budget * 3 // 4 - (1 << 14)) // 200 // 2))
+        self.frequencies = CountMinSketch(max(1024, budget // 4 // 32))
+        self.unique = HyperLogLog(14)
+
+    def update(self, counts):
+        """Volcar un lote de recuentos exactos ({palabra: veces}) en los tres sketches"""
+        self.top.update(counts)
+        self.frequencies.update(counts)
+        self.unique.update(counts)
+
+    def merge(self, other):
+        merged = VocabularySketch.__new__(VocabularySketch)
+        merged.top = self.top.merge(other.top)
+        merged.frequencies = self.frequencies.merge(other.frequencies)
+        merged.unique = self.unique.merge(other.unique)
+        return merged
+
+    def summary(self, k=50):
+        return {
+            'total': self.top.total,
+            'unique_estimate': self.unique.estimate(),
+            'top': self.top.top(k),
+            'error_bounds': {
+                'top_k_max_overcount': self.top.floor,
+                'frequency_max_overcount': round(self.frequencies.error_bound(), 1),
+                'unique_relative_error': round(self.unique.relative_error(), 4)
+            }
+        }
+
+    def to_state(self):
+        return {'top': self.top.to_state(), 'frequencies': self.frequencies.to_state(), 'unique': self.unique.to_state()}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls.__new__(cls)
+        sketch.top = SpaceSaving.from_state(state['top'])
+        sketch.frequencies = CountMinSketch.from_state(state['frequencies'])
+        sketch.unique = HyperLogLog.from_state(state['unique'])
+        return sketch
+
+
+def merge_field(rule, a, b):
+    """Combinar dos valores de estado según su regla: sum (números, dicts o vectores), min, max o union"""
+    if rule == 'sum':
+        if isinstance(a, dict):
+            merged = dict(a)
+            for key, value in b.items():
+                merged[key] = merge_field(rule, merged[key], value) if key in merged else value
+            return merged
+        if isinstance(a, list):
+            return [x + y for x, y in zip(a, b)]
+        return a + b
+    if rule in ('min', 'max'):
+        values = [value for value in (a, b) if value is not None]
+        return (min if rule == 'min' else max)(values) if values else None
+    # union: dicts por clave, listas de ids sin repetir y, en un mismo registro, gana el más nuevo
+    if isinstance(a, dict):
+        merged = dict(a)
+        for key, value in b.items():
+            merged[key] = merge_field(rule, merged[key], value) if key in merged else value
+        return merged
+    if isinstance(a, list):
+        seen = set(a)
+        return a + [item for item in b if item not in seen]
+    return b
+
+
+class IncrementalAnalyzer(ABC):
+    """Estado intermedio de un analizador: serializable, actualizable mensaje a mensaje y combinable.
+
+    El estado es un dict JSON cuyos campos se combinan según FIELDS; result() produce el
+    formato de siempre. Los campos 'sum' suponen lotes disjuntos (no el mismo mensaje dos veces).
+    Con SKETCH_FIELD el recuento exacto de ese campo se vuelca por lotes a un sketch acotado.
+    Los registros por mensaje (RECORDS_FIELD) van en `records`, fuera del estado, para que
+    guardarlo no cueste lo mismo que todo el historial.
+    """
+
+    FIELDS = {}
+    RESOURCES = ()
+    SKETCH_FIELD = None
+    RECORDS_FIELD = None
+
+    def __init__(self, resources=None, **params):
+        self.resources = resources or {}
+        self.params = params
+        self.state = self.initial_state()
+        self.records = {}
+        self.sketch = self.new_sketch() if self.SKETCH_FIELD and params.get('approximate') else None
+        self.pending = 0
+
+    @abstractmethod
+    def initial_state(self):
+        """Estado vacío (dict JSON con los campos de FIELDS)"""
+
+    def new_sketch(self):
+        return None
+
+    @abstractmethod
+    def update(self, message):
+        """Agregar un mensaje al estado"""
+
+    def update_many(self, messages):
+        for message in messages:
+            self.update(message)
+        return self
+
+    def _counted(self):
+        """Llamar tras cada mensaje contado: en modo aproximado vacía el lote exacto al sketch"""
+        self.pending += 1
+        if self.sketch is not None and self.pending >= SKETCH_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Procesar lo pendiente (lotes exactos hacia el sketch, textos por puntuar...)"""
+        if self.sketch is not None and self.state[self.SKETCH_FIELD]:
+            self.sketch.update(self.state[self.SKETCH_FIELD])
+            self.state[self.SKETCH_FIELD] = {}
+        self.pending = 0
+
+    def merge(self, other):
+        """Nuevo analizador con el estado de ambos (lotes o fragmentos del historial)"""
+        self.flush()
+        other.flush()
+        merged = type(self)(self.resources, **self.params)
+        a, b = copy.deepcopy(self.state), copy.deepcopy(other.state)
+        merged.state = {field: merge_field(rule, a[field], b[field]) for field, rule in self.FIELDS.items()}
+        merged.records = {**self.records, **other.records}
+        if self.sketch is not None:
+            merged.sketch = self.sketch.merge(other.sketch)
+        return merged
+
+    def to_state(self):
+        self.flush()
+        data = {'params': self.params, 'state': self.state}
+        if self.sketch is not None:
+            data['sketch'] = self.sketch.to_state()
+        return data
+
+    @classmethod
+    def from_state(cls, data, resources=None):
+        analyzer = cls(resources, **data['params'])
+        analyzer.state = data['state']
+        # Estados antiguos con los registros dentro: se separan y se guardan aparte al volver a salvar
+        if cls.RECORDS_FIELD in analyzer.state:
+            analyzer.records = analyzer.state.pop(cls.RECORDS_FIELD)
+        if 'sketch' in data:
+            analyzer.sketch = type(analyzer.sketch).from_state(data['sketch'])
+        return analyzer
+
+    @abstractmethod
+    def result(self):
+        """Resultado con el formato de siempre a partir del estado (y de `records`)"""
+
+
+class PatternAnalyzer(IncrementalAnalyzer):
+    """Patrones de actividad: horas, días y meses, longitudes, palabras, medios, respuestas y reenvíos"""
+
+    STOP_WORDS = {
+        'el', 'la', 'de', 'que', 'y', 'en', 'un', 'es', 'se', 'no',
+        'te', 'lo', 'le', 'me', 'mi', 'tu', 'su', 'los', 'las', 'del'
+    }
+    WORD_REGEX = re.compile(r'\b[a-zA-Záéíóúñ]+\b')
+    FIELDS = {
+        'activity_hours': 'sum', 'activity_days': 'sum', 'activity_months': 'sum', 'common_words': 'sum',
+        'media_frequency': 'sum', 'reply_frequency': 'sum', 'forward_frequency': 'sum',
+        'total_messages_processed': 'sum', 'messages_with_text': 'sum', 'messages_with_dates': 'sum',
+        'total_length': 'sum', 'max_message_length': 'max', 'min_message_length': 'min'
+    }
+
+    def initial_state(self):
+        return {
+            'activity_hours': {}, 'activity_days': {}, 'activity_months': {}, 'common_words': {}, 'media_frequency': {},
+            'reply_frequency': 0, 'forward_frequency': 0, 'total_messages_processed': 0, 'messages_with_text': 0,
+            'messages_with_dates': 0, 'total_length': 0, 'max_message_length': None, 'min_message_length': None
+        }
+
+    def update(self, message):
+        state = self.state
+        state['total_messages_processed'] += 1
+        if message.date:
+            state['messages_with_dates'] += 1
+            for field, key in (('activity_hours', str(message.date.hour)), ('activity_days', message.date.strftime('%A')),
+                               ('activity_months', message.date.strftime('%B'))):
+                state[field][key] = state[field].get(key, 0) + 1
+        if message.text:
+            length = len(message.text)
+            state['messages_with_text'] += 1
+            state['total_length'] += length
+            state['max_message_length'] = max(state['max_message_length'] or 0, length)
+            state['min_message_length'] = length if state['min_message_length'] is None else min(state['min_message_length'], length)
+            words = state['common_words']
+            for word in self.WORD_REGEX.findall(message.text.lower()):
+                if len(word) > 2 and word not in self.STOP_WORDS:
+                    words[word] = words.get(word, 0) + 1
+        if message.media:
+            media_type = type(message.media).__name__
+            state['media_frequency'][media_type] = state['media_frequency'].get(media_type, 0) + 1
+        if getattr(message, 'reply_to', None):
+            state['reply_frequency'] += 1
+        if getattr(message, 'fwd_from', None):
+            state['forward_frequency'] += 1
+
+    def result(self):
+        state = self.state
+        processed = state['total_messages_processed']
+        with_text = state['messages_with_text']
+        hours = Counter({int(hour): count for hour, count in state['activity_hours'].items()})
+        days, months = Counter(state['activity_days']), Counter(state['activity_months'])
+        words, media = Counter(state['common_words']), Counter(state['media_frequency'])
+        total_media = sum(media.values())
+
+        def percentage(value):
+            return value / processed * 100 if processed > 0 else 0
+
+        return {
+            'activity_hours': hours,
+            'activity_days': days,
+            'activity_months': months,
+            'common_words': words,
+            'media_frequency': media,
+            'reply_frequency': state['reply_frequency'],
+            'forward_frequency': state['forward_frequency'],
+            'total_messages_processed': processed,
+            'messages_with_text': with_text,
+            'messages_with_dates': state['messages_with_dates'],
+            'total_messages_analyzed': processed,
+            'avg_message_length': state['total_length'] / with_text if with_text else 0,
+            'max_message_length': state['max_message_length'] or 0,
+            'min_message_length': state['min_message_length'] or 0,
+            'most_active_hour': hours.most_common(1)[0] if hours else None,
+            'most_active_day': days.most_common(1)[0] if days else None,
+            'most_active_month': months.most_common(1)[0] if months else None,
+            'most_common_words': words.most_common(15),
+            'total_media': total_media,
+            'media_percentage': percentage(total_media),
+            'text_percentage': percentage(with_text),
+            'reply_percentage': percentage(state['reply_frequency']),
+            'forward_percentage': percentage(state['forward_frequency'])
+        }
+
+
+class WordAnalyzer(IncrementalAnalyzer):
+    """Vocabulario: recuento exacto o, con approximate=True, sketches de memoria acotada"""
+
+    STOP_WORDS = {
+        'el', 'la', 'de', 'que', 'y', 'en', 'un', 'es', 'se', 'no',
+        'te', 'lo', 'le', 'me', 'mi', 'tu', 'su', 'los', 'las', 'del',
+        'the', 'and', 'you', 'for', 'are', 'with', 'this', 'that', 'have'
+    }
+    WORD_REGEX = re.compile(r'\b[a-zA-ZáéíóúñÁÉÍÓÚÑ]+\b')
+    FIELDS = {'words': 'sum', 'messages': 'sum'}
+    SKETCH_FIELD = 'words'
+
+    def initial_state(self):
+        return {'words': {}, 'messages': 0}
+
+    def new_sketch(self):
+        return VocabularySketch()
+
+    def update(self, message):
+        if not message.text:
+            return
+        words = self.state['words']
+        for word in self.WORD_REGEX.findall(re.sub(r'http[s]?://\S+', '', message.text).lower()):
+            if len(word) > 2 and word not in self.STOP_WORDS:
+                words[word] = words.get(word, 0) + 1
+        self.state['messages'] += 1
+        self._counted()
+
+    def result(self):
+        self.flush()
+        if self.sketch is not None:
+            summary = self.sketch.summary(100)
+            return {
+                'total_unique_words': summary['unique_estimate'],
+                'most_common_words': [(word, count) for word, count, _ in summary['top'][:50]],
+                'word_frequency': {word: count for word, count, _ in summary['top']},
+                'approximate': True,
+                'error_bounds': summary['error_bounds']
+            }
+        words = Counter(self.state['words'])
+        return {
+            'total_unique_words': len(words),
+            'most_common_words': words.most_common(50),
+            'word_frequency': dict(words.most_common(100))
+        }
+
+
+class CategoryAnalyzer(IncrementalAnalyzer):
+    """Categorías de contenido: tabla compacta de mensajes e ids por categoría"""
+
+    FIELDS = {'categories': 'union'}
+    RECORDS_FIELD = 'messages'
+
+    def initial_state(self):
+        return {'categories': {category: [] for category in CATEGORY_FLAGS}}
+
+    def update(self, message):
+        flags = 0
+        if message.text:
+            flags |= CATEGORY_FLAGS['text_only']
+            if re.search(r'http[s]?://', message.text):
+                flags |= CATEGORY_FLAGS['with_links']
+            if '?' in message.text:
+                flags |= CATEGORY_FLAGS['questions']
+            if '!' in message.text:
+                flags |= CATEGORY_FLAGS['exclamations']
+            if len(message.text) > 200:
+                flags |= CATEGORY_FLAGS['long_messages']
+            if len(message.text) < 50:
+                flags |= CATEGORY_FLAGS['short_messages']
+        if message.media:
+            flags |= CATEGORY_FLAGS['with_media']
+        if not flags or str(message.id) in self.records:
+            return
+        self.records[str(message.id)] = {
+            'id': message.id,
+            'date': message.date.isoformat(),
+            'text': message.text if message.text else '',
+            'media_type': type(message.media).__name__ if message.media else 'text',
+            'flags': flags
+        }
+        for category, bit in CATEGORY_FLAGS.items():
+            if flags & bit:
+                self.state['categories'][category].append(message.id)
+
+    def result(self):
+        categories = {category: sorted(ids, reverse=True) for category, ids in self.state['categories'].items()}
+        category_stats = {f"{category}_count": len(ids) for category, ids in categories.items()}
+        return {'messages': dict(self.records), 'categories': categories, 'stats': category_stats}
+
+
+class TopicAnalyzer(IncrementalAnalyzer):
+    """Temas de conversación por palabras clave; los recuentos salen de los ids de cada tema"""
+
+    TOPIC_KEYWORDS = {
+        'tecnología': {'tecnología', 'tecnologia', 'tech', 'software', 'hardware', 'app', 'aplicación', 'internet', 'web', 'digital', 'computadora', 'ordenador', 'móvil', 'celular', 'smartphone'},
+        'programación': {'programación', 'programacion', 'código', 'codigo', 'python', 'javascript', 'java', 'html', 'css', 'desarrollo', 'developer', 'coding', 'script', 'api'},
+        'videojuegos': {'juego', 'videojuego', 'gaming', 'gamer', 'play', 'jugando', 'consola', 'steam', 'nintendo', 'playstation', 'xbox', 'minecraft', 'fortnite'},
+        'música': {'música', 'musica', 'canción', 'cancion', 'artista', 'banda', 'album', 'spotify', 'youtube music', 'escuchar', 'ritmo', 'melodía'},
+        'películas': {'película', 'pelicula', 'cine', 'netflix', 'disney', 'amazon prime', 'serie', 'actor', 'actriz', 'director', 'guion'},
+        'deportes': {'deporte', 'fútbol', 'futbol', 'baloncesto', 'tenis', 'natación', 'ejercicio', 'gimnasio', 'entrenamiento', 'partido', 'competencia'},
+        'comida': {'comida', 'receta', 'cocina', 'restaurante', 'cena', 'almuerzo', 'desayuno', 'postre', 'bebida', 'receta', 'cocinar'},
+        'viajes': {'viaje', 'viajar', 'vacaciones', 'turismo', 'hotel', 'avión', 'aeropuerto', 'destino', 'playa', 'montaña', 'ciudad'},
+        'trabajo': {'trabajo', 'empleo', 'oficina', 'jefe', 'compañero', 'reunión', 'proyecto', 'deadline', 'cliente', 'empresa'},
+        'estudio': {'estudio', 'universidad', 'colegio', 'examen', 'tarea', 'profesor', 'clase', 'aprender', 'educación', 'curso'}
+    }
+    FIELDS = {'topic_messages': 'union'}
+    RECORDS_FIELD = 'messages'
+
+    def initial_state(self):
+        return {'topic_messages': {topic: [] for topic in self.TOPIC_KEYWORDS}}
+
+    def update(self, message):
+        if not message.text or str(message.id) in self.records:
+            return
+        text_lower = message.text.lower()
+        for topic, keywords in self.TOPIC_KEYWORDS.items():
+            if any(keyword in text_lower for keyword in keywords):
+                self.state['topic_messages'][topic].append(message.id)
+                self.records[str(message.id)] = {
+                    'id': message.id,
+                    'date': message.date.isoformat(),
+                    'text': message.text
+                }
+
+    def result(self):
+        topic_messages = {topic: sorted(ids, reverse=True) for topic, ids in self.state['topic_messages'].items()}
+        sorted_topics = sorted(((topic, len(ids)) for topic, ids in topic_messages.items()), key=lambda x: x[1], reverse=True)
+        return {
+            'messages': dict(self.records),
+            'topic_counts': dict(sorted_topics),
+            'topic_messages': topic_messages,
+            'most_common_topics': [topic for topic, count in sorted_topics[:5] if count > 0]
+        }
+
+
+class SentimentAnalyzer(IncrementalAnalyzer):
+    """Sentimiento por léxico: puntuación por mensaje y sumas por periodo (día, mes o año)"""
+
+    FIELDS = {
+        'positive_count': 'sum', 'negative_count': 'sum', 'neutral_count': 'sum', 'total_messages': 'sum',
+        'curve': 'sum'
+    }
+    RESOURCES = ('lexicon',)
+    RECORDS_FIELD = 'scores'
+    PERIOD_LENGTH = {'day': 10, 'month': 7, 'year': 4}
+
+    def __init__(self, resources=None, bucket='day'):
+        super().__init__(resources, bucket=bucket)
+        self.batch = []
+
+    def initial_state(self):
+        return {'positive_count': 0, 'negative_count': 0, 'neutral_count': 0, 'total_messages': 0, 'curve': {}}
+
+    def update(self, message):
+        if message.text:
+            period = message.date.isoformat()[:self.PERIOD_LENGTH[self.params['bucket']]]
+            self.batch.append(((message.id, period), message.text))
+            if len(self.batch) >= SENTIMENT_BATCH_SIZE:
+                self.flush()
+
+    def flush(self):
+        super().flush()
+        if not self.batch:
+            return
+        state = self.state
+        scores = self.resources['lexicon'].score_batch([text for _, text in self.batch])
+        for ((message_id, period), _), score in zip(self.batch, scores):
+            state['total_messages'] += 1
+            self.records[str(message_id)] = round(score, 3)
+            point = state['curve'].setdefault(period, {'messages': 0, 'total': 0.0, 'positive': 0, 'negative': 0})
+            point['messages'] += 1
+            point['total'] += score
+            if score >= SENTIMENT_THRESHOLD:
+                state['positive_count'] += 1
+                point['positive'] += 1
+            elif score <= -SENTIMENT_THRESHOLD:
+                state['negative_count'] += 1
+                point['negative'] += 1
+            else:
+                state['neutral_count'] += 1
+        self.batch.clear()
+
+    def result(self):
+        self.flush()
+        state = self.state
+        sentiment_stats = {key: state[key] for key in ('positive_count', 'negative_count', 'neutral_count', 'total_messages')}
+        sentiment_stats['scores'] = dict(self.records)
+        sentiment_stats['curve'] = [
+            {'period': period, 'messages': point['messages'], 'positive': point['positive'], 'negative': point['negative'],
+             'average': round(point['total'] / point['messages'], 3)}
+            for period, point in sorted(state['curve'].items())
+        ]
+        total = state['total_messages']
+        if total > 0:
+            sentiment_stats['positive_percentage'] = state['positive_count'] / total * 100
+            sentiment_stats['negative_percentage'] = state['negative_count'] / total * 100
+            sentiment_stats['neutral_percentage'] = state['neutral_count'] / total * 100
+            sentiment_stats['average_score'] = round(sum(point['total'] for point in state['curve'].values()) / total, 3)
+        return sentiment_stats
+
+
+class StyleAnalyzer(IncrementalAnalyzer):
+    """Estilo de escritura: puntuación, emoticonos, mayúsculas, bigramas y recuentos de la huella estilométrica"""
+
+    EMOTICON_REGEX = re.compile(r'[:;][\'`\-]?[\)\(PD\/\\]')
+    WORD_REGEX = re.compile(r'\b[A-Za-záéíóúñÁÉÍÓÚÑ]+\b')
+    FIELDS = {
+        'messages': 'sum', 'total_length': 'sum', 'punctuation_usage': 'sum', 'emoticon_usage': 'sum',
+        'total_words': 'sum', 'capitalized_words': 'sum', 'common_phrases': 'sum', 'fingerprint': 'sum'
+    }
+    SKETCH_FIELD = 'common_phrases'
+
+    def initial_state(self):
+        return {
+            'messages': 0, 'total_length': 0, 'punctuation_usage': {}, 'emoticon_usage': {},
+            'total_words': 0, 'capitalized_words': 0, 'common_phrases': {}, 'fingerprint': style_counts([])
+        }
+
+    def new_sketch(self):
+        return SpaceSaving(max(100, SKETCH_MEMORY_MB * 1024 * 1024 // 400))
+
+    def update(self, message):
+        text = message.text
+        if not text:
+            return
+        state = self.state
+        state['messages'] += 1
+        state['total_length'] += len(text)
+        punctuation = state['punctuation_usage']
+        for name, mark in (('periods', '.'), ('commas', ','), ('exclamations', '!'), ('questions', '?')):
+            punctuation[name] = punctuation.get(name, 0) + text.count(mark)
+        for emoticon in self.EMOTICON_REGEX.findall(text):
+            state['emoticon_usage'][emoticon] = state['emoticon_usage'].get(emoticon, 0) + 1
+        words = self.WORD_REGEX.findall(text)
+        state['total_words'] += len(words)
+        state['capitalized_words'] += sum(1 for w in words if w[0].isupper())
+        words_lower = [w.lower() for w in words if len(w) > 2]
+        phrases = state['common_phrases']
+        for i in range(len(words_lower) - 1):
+            bigram = f"{words_lower[i]} {words_lower[i + 1]}"
+            phrases[bigram] = phrases.get(bigram, 0) + 1
+        style_counts([text], state['fingerprint'])
+        self._counted()
+
+    def vector(self):
+        """Huella estilométrica unitaria, o None si no hay mensajes suficientes"""
+        if self.state['messages'] < STYLE_MIN_MESSAGES:
+            return None
+        return style_vector(self.state['fingerprint'])
+
+    def result(self):
+        self.flush()
+        state = self.state
+        style_analysis = {
+            'avg_message_length': 0,
+            'punctuation_usage': Counter(state['punctuation_usage']),
+            'emoticon_usage': Counter(state['emoticon_usage']),
+            'capitalization_patterns': {},
+            'common_phrases': Counter(state['common_phrases']),
+            'writing_style_metrics': {}
+        }
+        if self.sketch is not None:
+            style_analysis['common_phrases'] = Counter({phrase: count for phrase, count, _ in self.sketch.top(100)})
+            style_analysis['common_phrases_max_overcount'] = self.sketch.floor
+        if state['total_words']:
+            style_analysis['capitalization_patterns'] = {
+                'total_words': state['total_words'],
+                'capitalized_words': state['capitalized_words'],
+                'capitalization_rate': state['capitalized_words'] / state['total_words'] * 100
+            }
+        if state['messages'] > 0:
+            style_analysis['avg_message_length'] = state['total_length'] / state['messages']
+            style_analysis['writing_style_metrics'] = {
+                'total_messages_analyzed': state['messages'],
+                'total_characters': state['total_length'],
+                'chars_per_message': style_analysis['avg_message_length']
+            }
+        return style_analysis
+
+
+class GeoAnalyzer(IncrementalAnalyzer):
+    """Ubicaciones: coordenadas reales de los mensajes y menciones de topónimos del nomenclátor"""
+
+    FIELDS = {'mentions': 'sum', 'coordinates': 'union'}
+    RESOURCES = ('gazetteer', 'rank_places')
+
+    def initial_state(self):
+        return {'mentions': {}, 'coordinates': {}}
+
+    def update(self, message):
+        # Ubicaciones, ubicaciones en directo y sitios (venue) llevan coordenadas reales
+        geo = getattr(message, 'geo', None)
+        if geo is not None and getattr(geo, 'lat', None) is not None:
+            venue = getattr(message, 'venue', None)
+            self.state['coordinates'][str(message.id)] = {
+                'message_id': message.id,
+                'date': message.date.isoformat(),
+                'lat': geo.lat,
+                'lon': geo.long,
+                'venue': f"{venue.title} ({venue.address})" if venue else None
+            }
+        if message.text:
+            mentions = self.state['mentions']
+            for name in self.resources['gazetteer'].find(message.text):
+                mentions[name] = mentions.get(name, 0) + 1
+
+    def result(self):
+        mentions = Counter(self.state['mentions'])
+        coordinates = sorted(self.state['coordinates'].values(), key=lambda point: point['message_id'], reverse=True)
+        places = self.resources['rank_places'](mentions, coordinates)
+        if coordinates:
+            estimated = {
+                'lat': round(sum(point['lat'] for point in coordinates) / len(coordinates), 5),
+                'lon': round(sum(point['lon'] for point in coordinates) / len(coordinates), 5),
+                'source': 'geo_media'
+            }
+        elif places:
+            estimated = {'lat': places[0]['lat'], 'lon': places[0]['lon'], 'source': places[0]['name']}
+        else:
+            estimated = None
+        return {
+            'mentioned_locations': [place['name'] for place in places],
+            'total_mentions': sum(mentions.values()),
+            'unique_locations': len(places),
+            'places': places,
+            'coordinates': coordinates,
+            'estimated_location': estimated
+        }
+
+
+# Analizadores con estado incremental, por nombre
+INCREMENTAL_ANALYZERS = {
+    'patterns': PatternAnalyzer,
+    'words': WordAnalyzer,
+    'categories': CategoryAnalyzer,
+    'topics': TopicAnalyzer,
+    'sentiment': SentimentAnalyzer,
+    'style': StyleAnalyzer,
+    'geolocation': GeoAnalyzer
+}
+
+
+class ExportRef:
+    """Atributos sueltos de un mensaje exportado (respuesta, reenvío, ubicación, documento...)"""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class ExportedMedia(ExportRef):
+    """Medio de un mensaje exportado; cada subclase lleva el nombre del tipo equivalente de Telethon"""
+
+
+EXPORT_MEDIA_CLASSES = {
+    name: type(name, (ExportedMedia,), {})
+    for name in ('MessageMediaPhoto', 'MessageMediaDocument', 'MessageMediaGeo', 'MessageMediaGeoLive',
+                 'MessageMediaVenue', 'MessageMediaContact', 'MessageMediaPoll', 'MessageMediaDice')
+}
+EXPORT_VIDEO_TYPES = {'video_file', 'animation', 'video_message'}
+EXPORT_AUDIO_TYPES = {'audio_file', 'voice_message'}
+# Filtros de búsqueda de Telegram y los tipos de medio de la exportación que cubren
+# ('photo', el media_type del fichero o 'file' para documentos sin tipo)
+EXPORT_FILTER_MEDIA = {
+    'InputMessagesFilterPhotos': {'photo'},
+    'InputMessagesFilterVideo': {'video_file'},
+    'InputMessagesFilterPhotoVideo': {'photo', 'video_file'},
+    'InputMessagesFilterDocument': {'file', 'audio_file', 'video_file', 'animation', 'sticker'},
+    'InputMessagesFilterMusic': {'audio_file'},
+    'InputMessagesFilterVoice': {'voice_message'},
+    'InputMessagesFilterRoundVideo': {'video_message'},
+    'InputMessagesFilterRoundVoice': {'voice_message', 'video_message'},
+    'InputMessagesFilterGif': {'animation'}
+}
+
+
+class ExportedMessage:
+    """Mensaje de una exportación de Telegram Desktop con los atributos de Message que usan los analizadores"""
+
+    __slots__ = ('id', 'date', 'text', 'media', 'photo', 'video', 'audio', 'document', 'reply_to', 'fwd_from',
+                 'geo', 'venue', 'sender_id', 'sender_name', 'views', 'forwards', 'reactions', 'entities', 'edit_date',
+                 'export_media_type')
+
+    @classmethod
+    def from_export(cls, item):
+        message = cls()
+        message.id = item['id']
+        if item.get('date_unixtime'):
+            message.date = datetime.fromtimestamp(int(item['date_unixtime']), timezone.utc)
+        else:
+            message.date = datetime.fromisoformat(item['date'])
+        text = item.get('text', '')
+        # Con formato, el texto es una lista de fragmentos (cadenas o {'type', 'text'})
+        if isinstance(text, list):
+            text = ''.join(part if isinstance(part, str) else part.get('text', '') for part in text)
+        message.text = text
+        message.media = message.photo = message.video = message.audio = message.document = None
+        message.geo = message.venue = None
+        media_type = item.get('media_type')
+        message.export_media_type = None
+        if 'photo' in item:
+            message.media = message.photo = EXPORT_MEDIA_CLASSES['MessageMediaPhoto'](path=item['photo'])
+            message.export_media_type = 'photo'
+        elif 'file' in item or media_type:
+            message.export_media_type = media_type or 'file'
+            document = ExportRef(mime_type=item.get('mime_type'), size=item.get('file_size', 0), path=item.get('file'))
+            message.media = EXPORT_MEDIA_CLASSES['MessageMediaDocument'](document=document)
+            if media_type in EXPORT_VIDEO_TYPES:
+                message.video = document
+            elif media_type in EXPORT_AUDIO_TYPES:
+                message.audio = document
+            else:
+                message.document = document
+        elif 'location_information' in item:
+            location = item['location_information']
+            message.geo = ExportRef(lat=location.get('latitude'), long=location.get('longitude'))
+            if item.get('place_name'):
+                message.venue = ExportRef(title=item['place_name'], address=item.get('address', ''))
+                message.media = EXPORT_MEDIA_CLASSES['MessageMediaVenue'](geo=message.geo)
+            else:
+                live = 'live_location_period_seconds' in item
+                message.media = EXPORT_MEDIA_CLASSES['MessageMediaGeoLive' if live else 'MessageMediaGeo'](geo=message.geo)
+        elif 'contact_information' in item:
+            message.media = EXPORT_MEDIA_CLASSES['MessageMediaContact'](**item['contact_information'])
+        elif 'poll' in item:
+            message.media = EXPORT_MEDIA_CLASSES['MessageMediaPoll'](poll=item['poll'])
+        elif 'dice' in item:
+            message.media = EXPORT_MEDIA_CLASSES['MessageMediaDice'](emoticon=item['dice'].get('emoticon'))
+        message.reply_to = ExportRef(reply_to_msg_id=item['reply_to_message_id']) if item.get('reply_to_message_id') else None
+        message.fwd_from = ExportRef(from_name=item['forwarded_from']) if item.get('forwarded_from') else None
+        sender = item.get('from_id') or item.get('actor_id') or ''
+        digits = re.sub(r'\D', '', str(sender))
+        message.sender_id = int(digits) if digits else None
+        message.sender_name = item.get('from') or item.get('actor')
+        message.views = message.forwards = message.reactions = None
+        message.entities = []
+        message.edit_date = datetime.fromtimestamp(int(item['edited_unixtime']), timezone.utc) if item.get('edited_unixtime') else None
+        return message
+
+    def matches_sender(self, sender):
+        """Si el remitente coincide con un id (123, user123) o un nombre visible"""
+        sender = str(sender).strip().lstrip('@')
+        if re.fullmatch(r'(?:user|channel)?\d+', sender):
+            return self.sender_id == int(re.sub(r'\D', '', sender))
+        return (self.sender_name or '').lower() == sender.lower()
+
+
+class TelegramExportReader:
+    """Lector en streaming del result.json de "Exportar historial del chat" de Telegram Desktop.
+
+    Solo guarda en memoria la cabecera del chat y el bloque que se está leyendo: cada
+    elemento del array "messages" se decodifica por separado con raw_decode.
+    """
+
+    MESSAGES_KEY = re.compile(r'"messages"\s*:\s*\[')
+    SEPARATORS = re.compile(r'[\s,]*')
+
+    def __init__(self, path, chunk_size=EXPORT_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.chat = None
+        self.chars_read = 0
+
+    def _read(self, f):
+        chunk = f.read(self.chunk_size)
+        self.chars_read += len(chunk)
+        return chunk
+
+    def __iter__(self):
+        decoder = json.JSONDecoder()
+        with open(self.path, 'r', encoding='utf-8-sig') as f:
+            buffer = ''
+            match = None
+            while match is None:
+                chunk = self._read(f)
+                if not chunk or len(buffer) > EXPORT_MAX_ITEM_BYTES:
+                    raise ValueError(f"{self.path} no es una exportación de chat de Telegram Desktop")
+                # Se repasa el final del bloque anterior por si la clave quedó partida
+                match = self.MESSAGES_KEY.search(buffer + chunk, max(0, len(buffer) - 16))
+                buffer += chunk
+            header = buffer[:match.start()].rstrip().rstrip(',')
+            try:
+                self.chat = json.loads(header + '}')
+            except json.JSONDecodeError:
+                # La exportación de toda la cuenta anida los mensajes dentro de "chats"
+                raise ValueError(f"{self.path} no es la exportación de un solo chat") from None
+            buffer, pos = buffer[match.end():], 0
+            while True:
+                pos = self.SEPARATORS.match(buffer, pos).end()
+                if pos < len(buffer) and buffer[pos] == ']':
+                    return
+                try:
+                    if pos >= len(buffer):
+                        raise json.JSONDecodeError("fin del bloque", buffer, pos)
+                    item, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # Mensaje incompleto: se añade otro bloque y se vuelve a intentar
+                    chunk = self._read(f)
+                    if not chunk or len(buffer) - pos > EXPORT_MAX_ITEM_BYTES:
+                        raise ValueError(f"Exportación truncada o JSON inválido cerca del carácter {self.chars_read}")
+                    buffer, pos = buffer[pos:] + chunk, 0
+                    continue
+                yield item
+                if pos > self.chunk_size:
+                    buffer, pos = buffer[pos:], 0
+
+
+class ExportMessageSource:
+    """Exportación de Telegram Desktop como fuente de mensajes sin conexión.
+
+    Implementa la parte de TelegramClient que usan los análisis (get_entity, get_messages e
+    iter_messages), así que las secciones del reporte corren sobre ella sin cambios. scan()
+    recorre el fichero una sola vez y retiene solo los `window` mensajes más recientes; una
+    lectura que se sale de esa ventana vuelve a recorrer el fichero en streaming.
+    """
+
+    def __init__(self, path, sender=None, window=EXPORT_WINDOW_SIZE):
+        self.path = path
+        self.sender = sender
+        self.reader = TelegramExportReader(path)
+        self.recent = deque(maxlen=window)
+        self.entity = None
+        self.total = 0
+        self.skipped = 0
+        self.first_date = self.last_date = None
+
+    def _wanted(self, item):
+        """Mensaje del chat (o del participante elegido); None para acciones de servicio y otros remitentes"""
+        if item.get('type') != 'message':
+            return None
+        message = ExportedMessage.from_export(item)
+        return message if self.sender is None or message.matches_sender(self.sender) else None
+
+    def _messages(self):
+        """Mensajes en orden cronológico leídos de nuevo del fichero"""
+        for item in self.reader:
+            message = self._wanted(item)
+            if message is not None:
+                yield message
+
+    def _new_entity(self, message):
+        chat_id = self.reader.chat.get('id', 0)
+        if self.sender is None:
+            target = f"export:{chat_id}"
+            name = self.reader.chat.get('name') or str(chat_id)
+        else:
+            sender = message.sender_id or re.sub(r'[^\w-]', '_', str(self.sender).strip().lower())
+            target = f"export:{chat_id}:{sender}"
+            name = message.sender_name or str(self.sender)
+        # Los datos de una exportación se guardan bajo un id propio (negativo; los de Telegram
+        # son positivos): el id de un chat privado es el del otro usuario, y sus mensajes
+        # mezclados con los nuestros no deben pisar su índice ni su huella de estilo en línea
+        return ExportRef(id=-int(hashlib.sha1(target.encode()).hexdigest()[:12], 16), username=None,
+                         first_name=name, target=target)
+
+    def scan(self, on_batch=None, batch_size=EXPORT_INDEX_BATCH):
+        """Recorrer la exportación una vez: totales, ventana de recientes y lotes de registros para on_batch"""
+        progress = ProgressReporter(f"Exportación {os.path.basename(self.path)}")
+        batch = []
+        for item in self.reader:
+            progress.tick()
+            # Las acciones de servicio (altas, fijados, llamadas...) no son mensajes del objetivo
+            if item.get('type') != 'message':
+                self.skipped += 1
+                continue
+            message = self._wanted(item)
+            if message is None:
+                continue
+            if self.entity is None:
+                self.entity = self._new_entity(message)
+            date = message.date.isoformat()
+            self.total += 1
+            self.first_date = self.first_date or date
+            self.last_date = date
+            self.recent.append(message)
+            if message.text and on_batch:
+                batch.append({'id': message.id, 'date': date, 'text': message.text,
+                              'media_type': type(message.media).__name__ if message.media else 'text'})
+                if len(batch) >= batch_size:
+                    on_batch(self.entity, batch)
+                    batch = []
+        if batch:
+            on_batch(self.entity, batch)
+        progress.done()
+        return self.entity
+
+    def user_info(self):
+        """Ficha del objetivo con el formato de get_user_info"""
+        return {
+            'id': self.entity.id,
+            'username': 'N/A',
+            'first_name': self.entity.first_name,
+            'last_name': '',
+            'phone': 'N/A',
+            'verified': False,
+            'premium': False,
+            'bot': False,
+            'restricted': False,
+            'scam': False,
+            'fake': False,
+            'status': 'N/A',
+            'dc_id': 'N/A',
+            'lang_code': 'N/A',
+            'bio': 'N/A',
+            'last_seen': self.last_date,
+            'source': 'telegram_export'
+        }
+
+    def describe(self):
+        chat = self.reader.chat
+        return {
+            'path': os.path.abspath(self.path),
+            'chat_name': chat.get('name'),
+            'chat_type': chat.get('type'),
+            'chat_id': chat.get('id'),
+            'sender': self.sender,
+            'target': self.entity.target,
+            'total_messages': self.total,
+            'first_message_date': self.first_date,
+            'last_message_date': self.last_date,
+            'service_actions_skipped': self.skipped,
+            'window': len(self.recent)
+        }
+
+    async def get_entity(self, target):
+        return self.entity
+
+    async def get_messages(self, entity, limit=1, **kwargs):
+        return [message async for message in self.iter_messages(entity, limit=limit, **kwargs)]
+
+    async def iter_messages(self, entity, limit=None, offset_id=0, min_id=0, max_id=0, reverse=False, filter=None):
+        """Como TelegramClient.iter_messages: del más reciente al más antiguo, o al revés con reverse=True.
+
+        Los filtros de medios (InputMessagesFilter*) se aplican localmente con EXPORT_FILTER_MEDIA.
+        """
+        media_types = None
+        if filter is not None:
+            filter_name = filter.__name__ if isinstance(filter, type) else type(filter).__name__
+            if filter_name not in EXPORT_FILTER_MEDIA:
+                raise ValueError(f"Filtro {filter_name} no disponible en una exportación de Telegram Desktop; "
+                                 f"admitidos: {', '.join(EXPORT_FILTER_MEDIA)}")
+            media_types = EXPORT_FILTER_MEDIA[filter_name]
+        lower = max(min_id, offset_id if reverse else 0)
+        bounds = [bound for bound in (max_id, 0 if reverse else offset_id) if bound]
+        upper = min(bounds) if bounds else None
+
+        def in_range(message):
+            return (message.id > lower and (upper is None or message.id < upper)
+                    and (media_types is None or message.export_media_type in media_types))
+
+        # La ventana basta si guarda todo el historial o todo lo posterior a `lower`
+        covered = len(self.recent) == self.total or (self.recent and lower >= self.recent[0].id)
+        if reverse:
+            selected = (message for message in (self.recent if covered else self._messages()) if in_range(message))
+        else:
+            selected = [message for message in reversed(self.recent) if in_range(message)][:limit]
+            if not covered and (limit is None or len(selected) < limit):
+                selected = reversed(deque((message for message in self._messages() if in_range(message)), maxlen=limit))
+        for count, message in enumerate(selected):
+            if limit is not None and count >= limit:
+                break
+            yield message
+
+
+class SocialGraph:
+    """Grafo social disperso: nodos con índice entero y adyacencia CSR en arrays compactos"""
+
+    EDGE_WEIGHTS = {'membership': 1.0, 'reply': 2.0, 'forward': 1.0, 'mention': 1.5}
+
+    def __init__(self):
+        self.node_index = {}
+        self.node_keys = []
+        self.node_labels = []
+        self.edge_counts = Counter()
+        self._src = array('l')
+        self._dst = array('l')
+        self._weight = array('d')
+        self._membership = array('l')
+        self.indptr = None
+        self.indices = None
+        self.weights = None
+        self.user_groups = {}
+        self.group_members = {}
+
+    def add_node(self, key, label=None):
+        """Registrar un nodo (clave externa como ('user', id)) y devolver su índice"""
+        idx = self.node_index.get(key)
+        if idx is None:
+            idx = len(self.node_keys)
+            self.node_index[key] = idx
+            self.node_keys.append(key)
+            self.node_labels.append(label or f"{key[0]}:{key[1]}")
+            # Un nodo nuevo cambia el tamaño de indptr: la CSR se reconstruye en la próxima consulta
+            self.indptr = None
+        elif label:
+            self.node_labels[idx] = label
+        return idx
+
+    def add_edge(self, source, target, kind, weight=None):
+        """Añadir una arista (membership, reply, forward o mention) entre dos claves de nodo"""
+        u = self.add_node(source)
+        v = self.add_node(target)
+        if u == v:
+            return
+        self._src.append(u)
+        self._dst.append(v)
+        self._weight.append(self.EDGE_WEIGHTS.get(kind, 1.0) if weight is None else weight)
+        self.edge_counts[kind] += 1
+        if kind == 'membership':
+            self._membership.extend((u, v))
+        self.indptr = None
+
+    def freeze(self):
+        """Construir la adyacencia CSR no dirigida, fusionando aristas repetidas en un peso"""
+        if np is not None:
+            self._freeze_numpy()
+        else:
+            self._freeze_python()
+        self.user_groups = {}
+        self.group_members = {}
+        for i in range(0, len(self._membership), 2):
+            user, group = self._membership[i], self._membership[i + 1]
+            self.user_groups.setdefault(user, set()).add(group)
+            self.group_members.setdefault(group, set()).add(user)
+        return self
+
+    def _freeze_numpy(self):
+        """CSR en bloque: ordenar las aristas (en ambos sentidos) por (fila, columna) y sumar repetidas"""
+        n = len(self.node_keys)
+        index_dtype = np.dtype(f"i{self._src.itemsize}")
+        src = np.frombuffer(self._src, dtype=index_dtype).astype(np.int64)
+        dst = np.frombuffer(self._dst, dtype=index_dtype).astype(np.int64)
+        weight = np.frombuffer(self._weight, dtype=np.float64)
+        keys = np.concatenate((src * n + dst, dst * n + src))
+        weights = np.concatenate((weight, weight))
+        order = np.argsort(keys, kind='stable')
+        keys, weights = keys[order], weights[order]
+        if len(keys):
+            starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+            keys, weights = keys[starts], np.add.reduceat(weights, starts)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        if n:
+            np.cumsum(np.bincount(keys // n, minlength=n), out=indptr[1:])
+            keys = keys % n
+        self.indptr, self.indices, self.weights = array('l'), array('l'), array('d')
+        self.indptr.frombytes(indptr.astype(index_dtype).tobytes())
+        self.indices.frombytes(keys.astype(index_dtype).tobytes())
+        self.weights.frombytes(weights.astype(np.float64).tobytes())
+
+    def _freeze_python(self):
+        n = len(self.node_keys)
+        offsets = array('l', [0]) * (n + 1)
+        for u in self._src:
+            offsets[u + 1] += 1
+        for v in self._dst:
+            offsets[v + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+        raw_indices = array('l', [0]) * offsets[n]
+        raw_weights = array('d', [0.0]) * offsets[n]
+        fill = offsets[:n]
+        for u, v, w in zip(self._src, self._dst, self._weight):
+            raw_indices[fill[u]] = v
+            raw_weights[fill[u]] = w
+            fill[u] += 1
+            raw_indices[fill[v]] = u
+            raw_weights[fill[v]] = w
+            fill[v] += 1
+
+        indptr = array('l', [0]) * (n + 1)
+        indices = array('l')
+        weights = array('d')
+        for row in range(n):
+            merged = {}
+            for j in range(offsets[row], offsets[row + 1]):
+                col = raw_indices[j]
+                merged[col] = merged.get(col, 0.0) + raw_weights[j]
+            for col in sorted(merged):
+                indices.append(col)
+                weights.append(merged[col])
+            indptr[row + 1] = len(indices)
+        self.indptr, self.indices, self.weights = indptr, indices, weights
+
+    def _frozen(self):
+        if self.indptr is None:
+            self.freeze()
+
+    @property
+    def node_count(self):
+        return len(self.node_keys)
+
+    @property
+    def edge_count(self):
+        self._frozen()
+        return len(self.indices) // 2
+
+    def neighbors(self, key):
+        """Vecinos directos (índices) de un nodo"""
+        self._frozen()
+        idx = self.node_index[key]
+        return self.indices[self.indptr[idx]:self.indptr[idx + 1]]
+
+    def degree(self, key, weighted=False):
+        """Grado (o grado ponderado) de un nodo"""
+        self._frozen()
+        idx = self.node_index[key]
+        start, end = self.indptr[idx], self.indptr[idx + 1]
+        return sum(self.weights[start:end]) if weighted else end - start
+
+    def k_hop(self, key, k=2):
+        """Vecindario a k saltos: {clave: distancia}"""
+        self._frozen()
+        origin = self.node_index[key]
+        distances = {origin: 0}
+        queue = deque([origin])
+        while queue:
+            node = queue.popleft()
+            if distances[node] == k:
+                continue
+            for neighbor in self.indices[self.indptr[node]:self.indptr[node + 1]]:
+                if neighbor not in distances:
+                    distances[neighbor] = distances[node] + 1
+                    queue.append(neighbor)
+        return {self.node_keys[node]: distance for node, distance in distances.items() if node != origin}
+
+    def connected_components(self):
+        """Etiqueta de componente por nodo y tamaños de componentes (de mayor a menor)"""
+        self._frozen()
+        n = self.node_count
+        labels = array('l', [-1]) * n
+        sizes = []
+        for start in range(n):
+            if labels[start] != -1:
+                continue
+            component = len(sizes)
+            labels[start] = component
+            stack = [start]
+            size = 0
+            while stack:
+                node = stack.pop()
+                size += 1
+                for neighbor in self.indices[self.indptr[node]:self.indptr[node + 1]]:
+                    if labels[neighbor] == -1:
+                        labels[neighbor] = component
+                        stack.append(neighbor)
+            sizes.append(size)
+        return labels, sorted(sizes, reverse=True)
+
+    def pagerank(self, damping=0.85, iterations=30, tol=1e-6):
+        """Centralidad PageRank ponderada sobre la adyacencia CSR (vectorizada si hay numpy)"""
+        self._frozen()
+        n = self.node_count
+        if n == 0:
+            return []
+        if np is not None:
+            indptr = np.frombuffer(self.indptr, dtype=np.int64 if self.indptr.itemsize == 8 else np.int32)
+            indices = np.frombuffer(self.indices, dtype=indptr.dtype)
+            weights = np.frombuffer(self.weights, dtype=np.float64)
+            rows = np.repeat(np.arange(n), np.diff(indptr))
+            strength = np.bincount(rows, weights=weights, minlength=n)
+            dangling = strength == 0
+            rank = np.full(n, 1.0 / n)
+            for _ in range(iterations):
+                contrib = np.divide(rank, strength, out=np.zeros(n), where=~dangling)
+                new_rank = np.bincount(rows, weights=contrib[indices] * weights, minlength=n)
+                new_rank = (1 - damping) / n + damping * (new_rank + rank[dangling].sum() / n)
+                if np.abs(new_rank - rank).sum() < tol:
+                    rank = new_rank
+                    break
+                rank = new_rank
+            return rank.tolist()
+
+        strength = [sum(self.weights[self.indptr[i]:self.indptr[i + 1]]) for i in range(n)]
+        rank = [1.0 / n] * n
+        for _ in range(iterations):
+            contrib = [rank[i] / strength[i] if strength[i] else 0.0 for i in range(n)]
+            dangling = sum(rank[i] for i in range(n) if not strength[i])
+            base = (1 - damping) / n + damping * dangling / n
+            new_rank = [0.0] * n
+            for row in range(n):
+                total = 0.0
+                for j in range(self.indptr[row], self.indptr[row + 1]):
+                    total += contrib[self.indices[j]] * self.weights[j]
+                new_rank[row] = base + damping * total
+            delta = sum(abs(a - b) for a, b in zip(new_rank, rank))
+            rank = new_rank
+            if delta < tol:
+                break
+        return rank
+
+    def co_membership(self, key, top=20):
+        """Usuarios que comparten grupos con el nodo, ponderados por nº de grupos en común"""
+        self._frozen()
+        idx = self.node_index[key]
+        weights = Counter()
+        for group in self.user_groups.get(idx, ()):
+            for member in self.group_members.get(group, ()):
+                if member != idx:
+                    weights[member] += 1
+        return [(self.node_keys[node], self.node_labels[node], count) for node, count in weights.most_common(top)]
+
+    def summary(self, key=None, top=10):
+        """Resumen del grafo (tamaño, componentes, centralidad) para incluir en reportes"""
+        self._frozen()
+        _, sizes = self.connected_components()
+        rank = self.pagerank()
+        top_nodes = sorted(range(self.node_count), key=lambda i: rank[i], reverse=True)[:top]
+        summary = {
+            'nodes': self.node_count,
+            'edges': self.edge_count,
+            'edge_counts': dict(self.edge_counts),
+            'components': len(sizes),
+            'largest_component': sizes[0] if sizes else 0,
+            'top_central': [
+                {'node': f"{self.node_keys[i][0]}:{self.node_keys[i][1]}", 'label': self.node_labels[i], 'pagerank': rank[i]}
+                for i in top_nodes
+            ]
+        }
+        if key is not None and key in self.node_index:
+            summary['target_degree'] = self.degree(key)
+            summary['target_weighted_degree'] = self.degree(key, weighted=True)
+            summary['target_two_hop'] = len(self.k_hop(key, 2))
+        return summary
+
+    def _edges(self):
+        for row in range(self.node_count):
+            for j in range(self.indptr[row], self.indptr[row + 1]):
+                if self.indices[j] > row:
+                    yield row, self.indices[j], self.weights[j]
+
+    def export(self, path, fmt='graphml'):
+        """Exportar a GraphML o GEXF escribiendo directamente al fichero"""
+        self._frozen()
+        with open(path, 'w', encoding='utf-8') as f:
+            if fmt == 'gexf':
+                f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+                f.write('<gexf xmlns="http://gexf.net/1.3" version="1.3">\n')
+                f.write('<graph mode="static" defaultedgetype="undirected">\n')
+                f.write('<attributes class="node"><attribute id="type" title="type" type="string"/></attributes>\n<nodes>\n')
+                for i, key in enumerate(self.node_keys):
+                    f.write(f'<node id="{i}" label="{xml_escape(str(self.node_labels[i]), {chr(34): "&quot;"})}">'
+                            f'<attvalues><attvalue for="type" value="{key[0]}"/></attvalues></node>\n')
+                f.write('</nodes>\n<edges>\n')
+                for n, (u, v, w) in enumerate(self._edges()):
+                    f.write(f'<edge id="{n}" source="{u}" target="{v}" weight="{w}"/>\n')
+                f.write('</edges>\n</graph>\n</gexf>\n')
+            else:
+                f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+                f.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+                f.write('<key id="label" for="node" attr.name="label" attr.type="string"/>\n')
+                f.write('<key id="type" for="node" attr.name="type" attr.type="string"/>\n')
+                f.write('<key id="weight" for="edge" attr.name="weight" attr.type="double"/>\n')
+                f.write('<graph id="G" edgedefault="undirected">\n')
+                for i, key in enumerate(self.node_keys):
+                    f.write(f'<node id="n{i}"><data key="label">{xml_escape(str(self.node_labels[i]))}</data>'
+                            f'<data key="type">{key[0]}</data></node>\n')
+                for u, v, w in self._edges():
+                    f.write(f'<edge source="n{u}" target="n{v}"><data key="weight">{w}</data></edge>\n')
+                f.write('</graph>\n</graphml>\n')
+        return path
+
+
+class ReportRenderer:
+    """Escribe un reporte pieza a pieza en un stream siguiendo las plantillas de un formato"""
+
+    def __init__(self, stream, fmt='text'):
+        self.stream = stream
+        self.fmt = fmt
+        self.templates = REPORT_TEMPLATES[fmt]
+        self._in_list = False
+
+    def _value(self, value):
+        if self.fmt == 'html':
+            return html_escape(str(value))
+        if self.fmt == 'markdown':
+            return self._markdown(str(value))
+        return str(value)
+
+    def _markdown(self, text):
+        """Escapar un texto para Markdown; los saltos de línea siguen dentro del elemento de lista"""
+        lines = []
+        for line in text.splitlines() or ['']:
+            line = MARKDOWN_SPECIAL.sub(r'\\\1', line.strip())
+            lines.append(MARKDOWN_BLOCK_START.sub(lambda m: m.group(1)[:-1] + '\\' + m.group(1)[-1], line))
+        return ('  \n    ' if self._in_list else '  \n').join(lines)
+
+    def _write(self, template, in_list=False, **values):
+        if in_list != self._in_list:
+            self.stream.write(self.templates['list_start' if in_list else 'list_end'])
+            self._in_list = in_list
+        self.stream.write(self.templates[template].format(**{key: self._value(value) for key, value in values.items()}))
+
+    def start(self, title):
+        self._write('start', title=title)
+
+    def end(self):
+        self._write('end')
+
+    def heading(self, title):
+        self._write('heading', title=title, rule='-' * (len(title) + 1))
+
+    def field(self, label, value):
+        self._write('field', in_list=True, label=label, value=value)
+
+    def item(self, text):
+        self._write('item', in_list=True, text=text)
+
+    def entry(self, text):
+        self._write('entry', in_list=True, text=text)
+
+    def subitem(self, text):
+        self._write('subitem', in_list=True, text=text)
+
+    def separator(self):
+        self._write('separator', in_list=True)
+
+    def line(self, text):
+        self._write('line', text=text)
+
+
+class TelegramOSINT:
+    def __init__(self, api_id, api_hash, session_name='telegram_osint'):
+        self.api_id = int(api_id)
+        self.api_hash = api_hash
+        self.client = TelegramClient(session_name, api_id, api_hash)
+        self.results = {}
+        self._index_db = None
+        self.social_graphs = {}
+        self._common_chats_cache = {}
+        self._chat_entities = {}
+        self._dialog_snapshot = None
+        self._dialog_lock = asyncio.Lock()
+        self._dialog_updates_registered = False
+        self._me_id = None
+        self.rate_limiter = RateLimiter(HISTORY_REQUESTS_PER_SECOND)
+        self._user_cache = {}
+        self._sentiment_lexicon = None
+        self._gazetteer = None
+        self._style_matrix = None
+        self._latest_message_ids = {}
+
+    async def start_client(self):
+        """Iniciar el cliente de Telegram"""
+        await self.client.start()
+        logger.info("Cliente de Telegram iniciado")
+
+    def validate_telegram_input(self, input_str):
+        """Validar y formatear input para Telegram"""
+        input_str = input_str.strip()
+        if input_str.isdigit():
+            return {'type': 'phone', 'value': input_str}
+        if input_str.startswith('@'):
+            return {'type': 'username', 'value': input_str}
+        if ' ' in input_str:
+            possible_username = f"@{input_str.replace(' ', '').lower()}"
+            return {'type': 'name', 'value': input_str, 'suggested_username': possible_username}
+        return {'type': 'username', 'value': f"@{input_str}"}
+
+    async def get_user_info(self, username_or_phone):
+        """Obtener información completa de un usuario - VERSIÓN MEJORADA"""
+        try:
+            input_info = self.validate_telegram_input(username_or_phone)
+            cleaned_input = input_info['value']
+            logger.info(f"🔍 Buscando: {username_or_phone} -> {cleaned_input} ({input_info['type']})")
+
+            if input_info['type'] == 'name':
+                print(f"🔍 Buscando usuario por nombre: {username_or_phone}")
+                if 'suggested_username' in input_info:
+                    try:
+                        logger.info(f"🔍 Intentando con username sugerido: {input_info['suggested_username']}")
+                        entity = await self.client.get_entity(input_info['suggested_username'])
+                        logger.info(f"✅ Usuario encontrado con username sugerido")
+                    except Exception as e:
+                        logger.info(f"❌ No se encontró con username sugerido: {e}")
+                        users_found = await self.search_user_by_name(username_or_phone)
+                        if users_found:
+                            if len(users_found) == 1:
+                                user = users_found[0]
+                                if user['username'] != 'N/A':
+                                    logger.info(f"🔍 Usando usuario encontrado en grupos: @{user['username']}")
+                                    return await self.get_user_info(user['username'])
+                            raise ValueError(f"Se encontraron múltiples usuarios. Use username específico.")
+                        else:
+                            raise ValueError(f"No se pudo encontrar el usuario: {username_or_phone}")
+                else:
+                    entity = await self.client.get_entity(cleaned_input)
+            else:
+                entity = await self.client.get_entity(cleaned_input)
+
+            user_info = {
+                'id': entity.id,
+                'username': getattr(entity, 'username', 'N/A'),
+                'first_name': getattr(entity, 'first_name', 'N/A'),
+                'last_name': getattr(entity, 'last_name', 'N/A'),
+                'phone': getattr(entity, 'phone', 'N/A'),
+                'verified': getattr(entity, 'verified', False),
+                'premium': getattr(entity, 'premium', False),
+                'bot': getattr(entity, 'bot', False),
+                'restricted': getattr(entity, 'restricted', False),
+                'scam': getattr(entity, 'scam', False),
+                'fake': getattr(entity, 'fake', False),
+                'status': str(getattr(entity, 'status', 'N/A')),
+                'dc_id': getattr(entity, 'dc_id', 'N/A'),
+                'lang_code': getattr(entity, 'lang_code', 'N/A'),
+                'photo': None,
+                'photo_id': None,
+                'common_chats_count': 0,
+                'last_seen': None,
+                'bio': getattr(entity, 'about', 'N/A')
+            }
+
+            if entity.photo:
+                user_info['photo_id'] = entity.photo.photo_id
+                photo_path = await self.download_profile_photo(entity)
+                user_info['photo'] = photo_path
+
+            if hasattr(entity, 'status') and entity.status:
+                if hasattr(entity.status, 'was_online'):
+                    user_info['last_seen'] = entity.status.was_online.isoformat()
+
+            user_info['common_chats_count'] = len(await self.get_common_chats(entity))
+
+            return user_info
+
+        except Exception as e:
+            logger.error(f"Error obteniendo información del usuario '{username_or_phone}': {e}")
+            return None
+
+    async def get_common_chats(self, user, refresh=False, strict=False):
+        """Todos los chats que la cuenta comparte con el usuario (GetCommonChats paginado y cacheado).
+
+        Con strict=True un error se propaga en lugar de devolver [], que no se distingue de no tener chats.
+        """
+        try:
+            entity = user if hasattr(user, 'id') else await self.client.get_entity(user)
+            cached = self._common_chats_cache.get(entity.id)
+            if cached and not refresh and time.time() - cached['fetched_at'] < COMMON_CHATS_TTL:
+                return cached['chats']
+            chats = []
+            max_id = 0
+            while True:
+                result = await self.client(functions.messages.GetCommonChatsRequest(
+                    user_id=entity,
+                    max_id=max_id,
+                    limit=100
+                ))
+                for chat in result.chats:
+                    chat_id = utils.get_peer_id(chat)
+                    self._chat_entities[chat_id] = chat
+                    chats.append({
+                        'id': chat_id,
+                        'name': getattr(chat, 'title', 'N/A'),
+                        'type': 'channel' if getattr(chat, 'broadcast', False) else 'group',
+                        'username': getattr(chat, 'username', None) or 'N/A',
+                        'participants_count': getattr(chat, 'participants_count', None) or 'N/A',
+                        'creator': getattr(chat, 'creator', False),
+                        'admin': bool(getattr(chat, 'admin_rights', None)),
+                        'date': chat.date.isoformat() if getattr(chat, 'date', None) else None
+                    })
+                if len(result.chats) < 100:
+                    break
+                max_id = result.chats[-1].id
+            self._common_chats_cache[entity.id] = {'chats': chats, 'fetched_at': time.time()}
+            logger.info(f"🤝 {len(chats)} chats en común con {getattr(entity, 'username', None) or entity.id}")
+            return chats
+        except Exception as e:
+            logger.warning(f"No se pudieron obtener los chats en común: {e}")
+            if strict:
+                raise
+            return []
+
+    # --- Snapshot de diálogos ---
+    def _dialog_entry(self, entity, name=None):
+        """Metadatos de un diálogo que comparten todas las funciones que recorren chats"""
+        is_channel = isinstance(entity, Channel)
+        return {
+            'id': utils.get_peer_id(entity),
+            'name': name or getattr(entity, 'title', None) or utils.get_display_name(entity),
+            'entity': entity,
+            'is_user': isinstance(entity, User),
+            'is_group': isinstance(entity, Chat) or (is_channel and getattr(entity, 'megagroup', False)),
+            'is_channel': is_channel,
+            'participants_count': getattr(entity, 'participants_count', None),
+            'username': getattr(entity, 'username', None),
+            'creator': getattr(entity, 'creator', False),
+            'admin': bool(getattr(entity, 'admin_rights', None))
+        }
+
+    async def get_dialog_snapshot(self, refresh=False):
+        """Diálogos de la cuenta: se listan una vez y luego se mantienen con eventos de actualización"""
+        async with self._dialog_lock:
+            if self._dialog_snapshot is None or refresh:
+                snapshot = {}
+                async for dialog in self.client.iter_dialogs():
+                    entry = self._dialog_entry(dialog.entity, dialog.name)
+                    snapshot[entry['id']] = entry
+                self._dialog_snapshot = snapshot
+                if self._me_id is None:
+                    self._me_id = (await self.client.get_me()).id
+                self._register_dialog_updates()
+                logger.info(f"🗂️ Snapshot de diálogos: {len(snapshot)} chats")
+        return list(self._dialog_snapshot.values())
+
+    def _register_dialog_updates(self):
+        """Suscribir el snapshot a los eventos que cambian la lista de diálogos"""
+        if self._dialog_updates_registered:
+            return
+        self.client.add_event_handler(self._on_dialog_action, events.ChatAction())
+        self.client.add_event_handler(self._on_dialog_message, events.NewMessage())
+        self._dialog_updates_registered = True
+
+    async def _on_dialog_action(self, event):
+        """Altas, bajas y cambios de título que afectan al snapshot"""
+        if self._dialog_snapshot is None:
+            return
+        try:
+            affects_me = self._me_id in (event.user_ids or [])
+            if affects_me and (event.user_left or event.user_kicked):
+                self._dialog_snapshot.pop(event.chat_id, None)
+            elif (affects_me and (event.user_joined or event.user_added)) or event.created \
+                    or event.chat_id not in self._dialog_snapshot:
+                chat = await event.get_chat()
+                self._dialog_snapshot[event.chat_id] = self._dialog_entry(chat)
+            elif event.new_title:
+                self._dialog_snapshot[event.chat_id]['name'] = event.new_title
+        except Exception as e:
+            logger.debug(f"Error actualizando snapshot de diálogos: {e}")
+
+    async def _on_dialog_message(self, event):
+        """Un mensaje de un chat desconocido añade ese diálogo al snapshot"""
+        if self._dialog_snapshot is None or event.chat_id in self._dialog_snapshot:
+            return
+        try:
+            chat = await event.get_chat()
+            self._dialog_snapshot[event.chat_id] = self._dialog_entry(chat)
+        except Exception as e:
+            logger.debug(f"Error añadiendo diálogo al snapshot: {e}")
+
+    async def search_user_by_name(self, name):
+        """Buscar usuario por nombre en chats y grupos"""
+        try:
+            logger.info(f"🔍 Buscando usuario por nombre: {name}")
+            params = {'dialogs': 50}
+            state = self.load_checkpoint('name_search', name.lower(), params) or {'done_dialogs': [], 'found_users': []}
+            found_users = state['found_users']
+            done_dialogs = set(state['done_dialogs'])
+            dialogs = [dialog for dialog in await self.get_dialog_snapshot() if dialog['is_group'] or dialog['is_channel']]
+            for dialog in dialogs[:50]:
+                if dialog['id'] in done_dialogs:
+                    continue
+                try:
+                    participants = await self.client.get_participants(dialog['entity'], limit=100)
+                    matches = []
+                    for participant in participants:
+                        full_name = f"{getattr(participant, 'first_name', '')} {getattr(participant, 'last_name', '')}".strip()
+                        if name.lower() in full_name.lower():
+                            user_info = {
+                                'id': participant.id,
+                                'username': getattr(participant, 'username', 'N/A'),
+                                'first_name': getattr(participant, 'first_name', 'N/A'),
+                                'last_name': getattr(participant, 'last_name', 'N/A'),
+                                'found_in': dialog['name'],
+                                'chat_type': 'group' if dialog['is_group'] else 'channel'
+                            }
+                            matches.append(user_info)
+                            log_event('name_match', logging.INFO, "✅ Encontrado: {name} en {chat}",
+                                      name=full_name, chat=dialog['name'], user_id=participant.id)
+                    # Los resultados de un chat y su marca de hecho se guardan juntos tras cada chat
+                    found_users.extend(matches)
+                    state['done_dialogs'].append(dialog['id'])
+                    self.save_checkpoint('name_search', name.lower(), params, state)
+                except Exception:
+                    continue
+            self.clear_checkpoint('name_search', name.lower())
+            return found_users
+        except Exception as e:
+            logger.error(f"Error buscando por nombre: {e}")
+            return []
+
+    async def download_profile_photo(self, entity, download_folder='photos'):
+        """Descargar foto de perfil (una sola vez por photo_id)"""
+        try:
+            if not os.path.exists(download_folder):
+                os.makedirs(download_folder)
+            path = os.path.join(download_folder, f"{entity.id}_{entity.photo.photo_id}.jpg")
+            if os.path.exists(path):
+                return path
+            photo_path = await self.client.download_profile_photo(entity, file=path)
+            return photo_path
+        except Exception as e:
+            logger.error(f"Error descargando foto: {e}")
+            return None
+
+    # --- Índices locales ---
+    def get_index_db(self):
+        """Abrir (una sola vez) la base SQLite local donde viven los índices"""
+        if self._index_db is None:
+            os.makedirs(DATA_FOLDER, exist_ok=True)
+            self._index_db = sqlite3.connect(os.path.join(DATA_FOLDER, 'osint_index.db'))
+            self._index_db.execute('PRAGMA journal_mode=WAL')
+            self._index_db.execute('PRAGMA synchronous=NORMAL')
+            # Un INSERT OR REPLACE borra la fila anterior: así también dispara el trigger de borrado del FTS
+            self._index_db.execute('PRAGMA recursive_triggers=ON')
+            for schema in INDEX_SCHEMAS:
+                self._index_db.executescript(schema)
+        return self._index_db
+
+    def close_index_db(self):
+        """Cerrar la base de índices local"""
+        if self._index_db is not None:
+            self._index_db.close()
+            self._index_db = None
+
+    def normalize_target(self, target):
+        """Forma canónica de un objetivo para los índices (sin @, minúsculas)"""
+        return str(target or '').strip().lstrip('@').lower()
+
+    def index_messages(self, target_id, target, records):
+        """Añadir mensajes al índice de texto completo (los ya indexados solo se actualizan si se editaron)"""
+        rows = [
+            (target_id, self.normalize_target(target), record['id'], record['date'],
+             record.get('media_type', 'text'), record['text'])
+            for record in records if record.get('text')
+        ]
+        if not rows:
+            return 0
+        try:
+            db = self.get_index_db()
+            with db:
+                added = db.executemany(
+                    "INSERT INTO indexed_messages (target_id, target, message_id, date, media_type, text) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (target_id, message_id) DO UPDATE SET "
+                    "text = excluded.text, media_type = excluded.media_type WHERE text != excluded.text",
+                    rows
+                ).rowcount
+            logger.debug(f"🗂️ Indexados {added} mensajes nuevos o editados de {target}")
+            return added
+        except sqlite3.Error as e:
+            logger.error(f"Error indexando mensajes: {e}")
+            return 0
+
+    def search_messages(self, query, target=None, date_from=None, date_to=None, media_type=None, limit=50):
+        """Buscar en el índice local (frases "...", prefijos pala*, AND/OR/NOT)"""
+        sql = (
+            "SELECT m.target, m.target_id, m.message_id, m.date, m.media_type, "
+            "snippet(messages_fts, 0, '[', ']', '…', 16) "
+            "FROM messages_fts JOIN indexed_messages m ON m.id = messages_fts.rowid "
+            "WHERE messages_fts MATCH ?"
+        )
+        params = [query]
+        if target:
+            if str(target).lstrip('-').isdigit():
+                sql += " AND m.target_id = ?"
+                params.append(int(target))
+            else:
+                sql += " AND m.target = ?"
+                params.append(self.normalize_target(target))
+        try:
+            # Las fechas llegan tal cual de la línea de comandos: se validan antes de compararlas como texto
+            if date_from:
+                date_from = date_from.strip()
+                datetime.fromisoformat(date_from)
+                sql += " AND m.date >= ?"
+                params.append(date_from)
+            if date_to:
+                date_to = date_to.strip()
+                if len(date_to) == 10:
+                    date_to = (datetime.fromisoformat(date_to) + timedelta(days=1)).strftime('%Y-%m-%d')
+                    sql += " AND m.date < ?"
+                else:
+                    datetime.fromisoformat(date_to)
+                    sql += " AND m.date <= ?"
+                params.append(date_to)
+            if media_type:
+                sql += " AND m.media_type = ?"
+                params.append(MEDIA_TYPE_ALIASES.get(media_type.lower(), media_type))
+            sql += " ORDER BY rank LIMIT ?"
+            params.append(limit)
+            rows = self.get_index_db().execute(sql, params).fetchall()
+        except (sqlite3.Error, ValueError) as e:
+            logger.error(f"Error buscando en el índice: {e}")
+            return []
+        return [
+            {
+                'target': row[0],
+                'target_id': row[1],
+                'message_id': row[2],
+                'date': row[3],
+                'media_type': row[4],
+                'snippet': row[5]
+            }
+            for row in rows
+        ]
+
+    def normalize_identifier(self, value, kind=None):
+        """Devolver (tipo, valor normalizado) de un identificador; detecta el tipo si no se indica.
+
+        Si el tipo no se indica y el valor no parece ninguno de los conocidos devuelve None.
+        """
+        value = value.strip()
+        if kind is None:
+            if IDENTIFIER_PATTERNS['email'].fullmatch(value):
+                kind = 'email'
+            elif IDENTIFIER_PATTERNS['mention'].fullmatch(value):
+                kind = 'mention'
+            elif IDENTIFIER_PATTERNS['wallet'].fullmatch(value):
+                kind = 'wallet'
+            elif re.fullmatch(r'[+\d\s().-]+', value) and len(re.sub(r'\D', '', value)) >= 7:
+                kind = 'phone'
+            elif IDENTIFIER_DOMAIN_REGEX.fullmatch(value):
+                kind = 'domain'
+            else:
+                return None
+        if kind == 'email':
+            return kind, value.lower()
+        if kind == 'phone':
+            digits = re.sub(r'\D', '', value)
+            return kind, f"+{digits}" if value.startswith('+') else digits
+        if kind == 'domain':
+            domain = re.sub(r'^https?://', '', value, flags=re.IGNORECASE).split('/')[0].split(':')[0].lower()
+            return kind, domain[4:] if domain.startswith('www.') else domain
+        if kind == 'mention':
+            return kind, value.lstrip('@').lower()
+        if kind == 'wallet' and (value.startswith('0x') or value.startswith('bc1')):
+            return kind, value.lower()
+        return kind, value
+
+    def extract_identifiers(self, text):
+        """Extraer identificadores normalizados (email, teléfono, dominio, mención, wallet) de un texto"""
+        found = set()
+        if not text:
+            return found
+        for kind, pattern in IDENTIFIER_PATTERNS.items():
+            if kind == 'phone':
+                continue
+            for match in pattern.finditer(text):
+                raw = match.group(1) if pattern.groups else match.group(0)
+                found.add(self.normalize_identifier(raw, kind))
+        # Los teléfonos se buscan sin URLs, emails ni wallets para no confundir sus dígitos
+        residual = re.sub(r'https?://\S+', ' ', text)
+        residual = IDENTIFIER_PATTERNS['email'].sub(' ', residual)
+        residual = IDENTIFIER_PATTERNS['wallet'].sub(' ', residual)
+        for match in IDENTIFIER_PATTERNS['phone'].finditer(residual):
+            kind_value = self.normalize_identifier(match.group(0), 'phone')
+            if len(kind_value[1].lstrip('+')) >= 7:
+                found.add(kind_value)
+        return found
+
+    def index_identifiers(self, target_id, target, records):
+        """Actualizar el índice invertido con los identificadores de nuevos mensajes"""
+        target = self.normalize_target(target)
+        rows = [
+            (kind, value, target_id, target, record['id'], record.get('date'))
+            for record in records
+            for kind, value in self.extract_identifiers(record.get('text'))
+        ]
+        if not rows:
+            return 0
+        try:
+            db = self.get_index_db()
+            with db:
+                return db.executemany(
+                    "INSERT OR IGNORE INTO identifiers (kind, value, target_id, target, message_id, date) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                ).rowcount
+        except sqlite3.Error as e:
+            logger.error(f"Error indexando identificadores: {e}")
+            return 0
+
+    def find_identifier(self, value, kind=None):
+        """Qué objetivos han mencionado un identificador (email, teléfono, dominio, @mención, wallet)"""
+        normalized = self.normalize_identifier(value, kind)
+        if normalized is None:
+            logger.error(f"Identificador no reconocido: {value}")
+            return {'kind': None, 'value': value.strip(), 'targets': []}
+        kind, value = normalized
+        try:
+            rows = self.get_index_db().execute(
+                "SELECT target_id, target, COUNT(*), MIN(date), MAX(date), GROUP_CONCAT(message_id) "
+                "FROM identifiers WHERE kind = ? AND value = ? GROUP BY target_id",
+                (kind, value)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error consultando identificador: {e}")
+            rows = []
+        return {
+            'kind': kind,
+            'value': value,
+            'targets': [
+                {
+                    'target_id': row[0],
+                    'target': row[1],
+                    'occurrences': row[2],
+                    'first_seen': row[3],
+                    'last_seen': row[4],
+                    'message_ids': [int(message_id) for message_id in row[5].split(',')]
+                }
+                for row in rows
+            ]
+        }
+
+    def count_identifiers(self, target_id):
+        """Identificadores distintos indexados de un objetivo, por tipo"""
+        try:
+            rows = self.get_index_db().execute(
+                "SELECT kind, COUNT(DISTINCT value) FROM identifiers WHERE target_id = ? GROUP BY kind", (target_id,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error contando identificadores: {e}")
+            return {}
+        return dict(rows)
+
+    def correlate_target(self, target):
+        """Identificadores de un objetivo que también aparecen en otros objetivos"""
+        if str(target).lstrip('-').isdigit():
+            condition, param = "a.target_id = ?", int(target)
+        else:
+            condition, param = "a.target = ?", self.normalize_target(target)
+        try:
+            rows = self.get_index_db().execute(
+                "SELECT DISTINCT a.kind, a.value, b.target_id, b.target "
+                "FROM identifiers a JOIN identifiers b "
+                "ON b.kind = a.kind AND b.value = a.value AND b.target_id != a.target_id "
+                f"WHERE {condition} ORDER BY a.kind, a.value",
+                (param,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error correlacionando objetivo: {e}")
+            return []
+        shared = {}
+        for kind, value, other_id, other in rows:
+            entry = shared.setdefault((kind, value), {'kind': kind, 'value': value, 'shared_with': []})
+            entry['shared_with'].append({'target_id': other_id, 'target': other})
+        return list(shared.values())
+
+    # --- Rollups de actividad ---
+    def _flush_rollups(self, chat_id, chat, buckets, low_id, high_id):
+        """Sumar un lote de agregados y ampliar el rango del cursor en la misma transacción"""
+        rows = [(chat_id, day, sender_id, *totals) for (day, sender_id), totals in buckets.items()]
+        db = self.get_index_db()
+        with db:
+            db.executemany(
+                "INSERT INTO daily_rollups (chat_id, day, sender_id, messages, media, views, forwards) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (chat_id, day, sender_id) DO UPDATE SET "
+                "messages = messages + excluded.messages, media = media + excluded.media, "
+                "views = views + excluded.views, forwards = forwards + excluded.forwards",
+                rows
+            )
+            db.execute(
+                "INSERT INTO rollup_cursors (chat_id, chat, min_message_id, max_message_id, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (chat_id) DO UPDATE SET "
+                "min_message_id = MIN(min_message_id, excluded.min_message_id), "
+                "max_message_id = MAX(max_message_id, excluded.max_message_id), updated_at = excluded.updated_at",
+                (chat_id, chat, low_id, high_id, datetime.now().isoformat())
+            )
+        buckets.clear()
+
+    async def _ingest_rollups(self, chat_id, chat, messages):
+        """Agregar mensajes por (día, remitente) y escribirlos en lotes contiguos de ids"""
+        buckets = {}
+        low_id = high_id = None
+        count = 0
+        async for message in messages:
+            if not message.date:
+                continue
+            key = (message.date.strftime('%Y-%m-%d'), message.sender_id or 0)
+            totals = buckets.setdefault(key, [0, 0, 0, 0])
+            totals[0] += 1
+            totals[1] += 1 if message.media else 0
+            totals[2] += getattr(message, 'views', None) or 0
+            totals[3] += getattr(message, 'forwards', None) or 0
+            low_id = message.id if low_id is None else min(low_id, message.id)
+            high_id = message.id if high_id is None else max(high_id, message.id)
+            count += 1
+            if count % ROLLUP_FLUSH_EVERY == 0:
+                self._flush_rollups(chat_id, chat, buckets, low_id, high_id)
+        if buckets:
+            self._flush_rollups(chat_id, chat, buckets, low_id, high_id)
+        return count
+
+    async def update_rollups(self, chat, limit=None, backfill=0):
+        """Actualizar los rollups diarios de un grupo/canal leyendo solo mensajes nuevos.
+
+        La primera vez se agregan los `limit` mensajes más recientes; `backfill` amplía
+        el histórico con mensajes anteriores a los ya agregados. Los mensajes anteriores a
+        ese primer lote no se agregan nunca por sí solos: las actualizaciones siguientes
+        solo leen mensajes nuevos, así que la historia antigua queda fuera de las curvas
+        hasta que se pida con `backfill` (o la primera vez con limit=None).
+        """
+        try:
+            entity = await self.client.get_entity(chat)
+            chat_id = utils.get_peer_id(entity)
+            name = getattr(entity, 'username', None) or getattr(entity, 'title', None) or str(chat_id)
+            cursor = self.get_index_db().execute(
+                "SELECT min_message_id, max_message_id FROM rollup_cursors WHERE chat_id = ?", (chat_id,)
+            ).fetchone()
+            if cursor is None:
+                added = await self._ingest_rollups(chat_id, name, self.iter_history_paced(entity, limit))
+                if limit is not None and added >= limit:
+                    logger.info(f"📈 Rollups de {name}: solo los {limit} mensajes más recientes; "
+                                "el histórico anterior se añade con backfill")
+            else:
+                added = await self._ingest_rollups(
+                    chat_id, name, self.iter_history_paced(entity, None, cursor[1], reverse=True)
+                )
+                if backfill:
+                    added += await self._ingest_rollups(chat_id, name, self.iter_history_paced(entity, backfill, cursor[0]))
+            logger.info(f"📈 Rollups de {name}: {added} mensajes nuevos agregados")
+            return {'chat_id': chat_id, 'chat': name, 'added': added}
+        except Exception as e:
+            logger.error(f"Error actualizando rollups: {e}")
+            return None
+
+    def activity_curve(self, chat_id, granularity='day', date_from=None, date_to=None):
+        """Curva de actividad de un chat desde los rollups (día, semana, mes o año)"""
+        try:
+            rows = self.get_index_db().execute(
+                f"SELECT {ROLLUP_PERIODS[granularity]} AS period, SUM(messages), SUM(media), SUM(views), "
+                "SUM(forwards), COUNT(DISTINCT sender_id) FROM daily_rollups "
+                "WHERE chat_id = ? AND day >= ? AND day <= ? GROUP BY period ORDER BY period",
+                (chat_id, date_from or '0000-00-00', date_to or '9999-12-31')
+            ).fetchall()
+        except (sqlite3.Error, KeyError) as e:
+            logger.error(f"Error consultando rollups: {e}")
+            return []
+        return [
+            {'period': row[0], 'messages': row[1], 'media': row[2], 'views': row[3], 'forwards': row[4], 'senders': row[5]}
+            for row in rows
+        ]
+
+    def top_posters_by_period(self, chat_id, date_from=None, date_to=None, limit=10):
+        """Remitentes con más mensajes de un chat en un periodo, desde los rollups"""
+        try:
+            rows = self.get_index_db().execute(
+                "SELECT sender_id, SUM(messages) AS total, SUM(media), COUNT(*), MIN(day), MAX(day) "
+                "FROM daily_rollups WHERE chat_id = ? AND day >= ? AND day <= ? "
+                "GROUP BY sender_id ORDER BY total DESC LIMIT ?",
+                (chat_id, date_from or '0000-00-00', date_to or '9999-12-31', -1 if limit is None else limit)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error consultando rollups: {e}")
+            return []
+        return [
+            {'sender_id': row[0], 'messages': row[1], 'media': row[2], 'active_days': row[3],
+             'first_day': row[4], 'last_day': row[5]}
+            for row in rows
+        ]
+
+    async def iter_history_paced(self, entity, limit=None, offset_id=0, reverse=False, filter=None):
+        """Recorrer el historial página a página, pidiendo un token al limitador antes de cada petición"""
+        remaining = limit
+        while remaining is None or remaining > 0:
+            page_size = HISTORY_PAGE_SIZE if remaining is None else min(HISTORY_PAGE_SIZE, remaining)
+            await self.rate_limiter.acquire()
+            try:
+                page = await self.client.get_messages(entity, limit=page_size, offset_id=offset_id, reverse=reverse,
+                                                      filter=filter)
+            except errors.FloodWaitError as e:
+                logger.warning(f"⏳ FloodWait de {e.seconds}s: pausando todas las lecturas de historial")
+                self.rate_limiter.pause(e.seconds)
+                continue
+            for message in page:
+                # Los remitentes vienen incluidos en la respuesta: se guardan sin coste extra
+                if isinstance(getattr(message, 'sender', None), User):
+                    self.remember_user(message.sender)
+                yield message
+            if len(page) < page_size:
+                return
+            offset_id = page[-1].id
+            if remaining is not None:
+                remaining -= len(page)
+
+    def remember_user(self, user):
+        """Guardar en caché el resumen de un usuario ya recibido en cualquier respuesta"""
+        summary = {
+            'user_id': user.id,
+            'username': getattr(user, 'username', None) or 'N/A',
+            'first_name': getattr(user, 'first_name', None) or 'N/A',
+            'last_name': getattr(user, 'last_name', None) or 'N/A',
+            'bot': getattr(user, 'bot', False),
+            'deleted': getattr(user, 'deleted', False)
+        }
+        self._user_cache[user.id] = summary
+        return summary
+
+    async def resolve_users(self, user_ids, batch_size=USER_BATCH_SIZE):
+        """Resolver muchos usuarios con una petición users.GetUsers por cada `batch_size` ids.
+
+        Los ya vistos salen de la caché; los que no se pueden resolver quedan con 'N/A'.
+        """
+        missing = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in self._user_cache]
+        inputs = []
+        for user_id in missing:
+            try:
+                # Sale de la caché de sesión de Telethon, sin petición de red
+                inputs.append(await self.client.get_input_entity(user_id))
+            except Exception:
+                continue
+        resolved = requests_made = 0
+        start = 0
+        while start < len(inputs):
+            await self.rate_limiter.acquire()
+            requests_made += 1
+            try:
+                users = await self.client(functions.users.GetUsersRequest(id=inputs[start:start + batch_size]))
+            except errors.FloodWaitError as e:
+                # Igual que en el historial: se pausan todas las lecturas y se repite el bloque
+                logger.warning(f"⏳ FloodWait de {e.seconds}s resolviendo usuarios: pausando todas las lecturas")
+                self.rate_limiter.pause(e.seconds)
+                continue
+            except Exception as e:
+                logger.error(f"Error resolviendo usuarios en bloque: {e}")
+                users = []
+            for user in users:
+                if isinstance(user, User):
+                    self.remember_user(user)
+                    resolved += 1
+            start += batch_size
+        if missing:
+            logger.info(f"👥 {resolved} de {len(missing)} usuarios resueltos en {requests_made} peticiones")
+        unknown = {'username': 'N/A', 'first_name': 'N/A', 'last_name': 'N/A', 'bot': False, 'deleted': False}
+        return {user_id: self._user_cache.get(user_id) or {'user_id': user_id, **unknown} for user_id in user_ids}
+
+    # --- Checkpoints de escaneos largos ---
+    def _checkpoint_path(self, scan, key):
+        folder = os.path.join(DATA_FOLDER, 'checkpoints')
+        os.makedirs(folder, exist_ok=True)
+        safe_key = re.sub(r'[^\w.-]', '_', str(key))
+        return os.path.join(folder, f"{scan}_{safe_key}.json")
+
+    def load_checkpoint(self, scan, key, params):
+        """Estado guardado de un escaneo interrumpido (solo si se lanzó con los mismos parámetros)"""
+        path = self._checkpoint_path(scan, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Checkpoint ilegible {path}: {e}")
+            return None
+        if checkpoint.get('params') != params:
+            return None
+        logger.info(f"♻️ Reanudando {scan} de {key} desde el checkpoint del {checkpoint['saved_at']} "
+                    f"({checkpoint['state'].get('processed', 0)} procesados)")
+        return checkpoint['state']
+
+    def save_checkpoint(self, scan, key, params, state):
+        """Guardar de forma atómica el progreso y los agregados parciales de un escaneo"""
+        path = self._checkpoint_path(scan, key)
+        try:
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'params': params, 'saved_at': datetime.now().isoformat(), 'state': state}, f, ensure_ascii=False)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            logger.error(f"Error guardando checkpoint {path}: {e}")
+
+    def clear_checkpoint(self, scan, key):
+        """Borrar el checkpoint de un escaneo que ha terminado"""
+        path = self._checkpoint_path(scan, key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    async def iter_messages_checkpointed(self, scan, key, entity, limit, params, state, every=200, on_checkpoint=None):
+        """Recorrer mensajes desde el último checkpoint, guardando el estado cada `every` mensajes.
+
+        El estado solo avanza cuando el consumidor pide el siguiente mensaje, así que un
+        checkpoint nunca incluye un mensaje a medio procesar.
+        """
+        state.setdefault('processed', 0)
+        remaining = None if limit is None else limit - state['processed']
+        if remaining is not None and remaining <= 0:
+            return
+        async for message in self.iter_history_paced(entity, remaining, state.get('last_message_id', 0)):
+            yield message
+            state['last_message_id'] = message.id
+            state['processed'] += 1
+            if state['processed'] % every == 0:
+                if on_checkpoint:
+                    on_checkpoint()
+                self.save_checkpoint(scan, key, params, state)
+
+    # --- Métodos de fotos ---
+    def _smallest_thumb(self, photo):
+        """Miniatura más pequeña descargable de una foto (las 'stripped' vienen incrustadas y se descartan)"""
+        sizes = [size for size in getattr(photo, 'sizes', []) if isinstance(size, types.PhotoSize)]
+        return min(sizes, key=lambda size: size.size) if sizes else 0
+
+    async def get_profile_photo_history(self, username, size='thumb', limit=None):
+        """Historial de fotos de perfil escrito directamente a disco.
+
+        size='thumb' descarga la miniatura más pequeña (triaje) y size='full' la foto completa.
+        Las fotos ya descargadas en ese tamaño no se vuelven a pedir; cada foto queda registrada
+        con su id y fecha para detectar altas y bajas entre ejecuciones.
+        """
+        try:
+            entity = await self.client.get_entity(username)
+            db = self.get_index_db()
+            known = {
+                row[0]: (row[1], row[2])
+                for row in db.execute(
+                    "SELECT photo_id, path, last_seen FROM profile_photos WHERE user_id = ? AND size = ?", (entity.id, size)
+                )
+            }
+            last_run = max((last_seen for _, last_seen in known.values()), default=None)
+            folder = os.path.join(PROFILE_PHOTO_FOLDER, str(entity.id))
+            os.makedirs(folder, exist_ok=True)
+            now = datetime.now().isoformat()
+            history = {'user_id': entity.id, 'size': size, 'photos': [], 'new': 0, 'removed': []}
+            seen = set()
+            async for photo in self.client.iter_profile_photos(entity, limit=limit):
+                seen.add(photo.id)
+                path = known.get(photo.id, (None, None))[0]
+                is_new = not path or not os.path.exists(path)
+                if is_new:
+                    path = os.path.join(folder, f"{photo.id}_{size}.jpg")
+                    thumb = self._smallest_thumb(photo) if size == 'thumb' else None
+                    path = await self.client.download_media(photo, file=path, thumb=thumb)
+                    history['new'] += 1
+                with db:
+                    db.execute(
+                        "INSERT INTO profile_photos (user_id, photo_id, size, date, path, first_seen, last_seen) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, photo_id, size) DO UPDATE SET "
+                        "path = excluded.path, last_seen = excluded.last_seen",
+                        (entity.id, photo.id, size, photo.date.isoformat() if photo.date else None, path, now, now)
+                    )
+                history['photos'].append({
+                    'photo_id': photo.id,
+                    'date': photo.date.isoformat() if photo.date else None,
+                    'path': path,
+                    'new': is_new
+                })
+            # Fotos vistas en la ejecución anterior que ya no están (solo si se ha recorrido el historial completo)
+            if limit is None or len(seen) < limit:
+                history['removed'] = [
+                    photo_id for photo_id, (_, last_seen) in known.items() if photo_id not in seen and last_seen == last_run
+                ]
+            logger.info(f"🖼️ Fotos de perfil de {username}: {len(history['photos'])} ({history['new']} nuevas, "
+                        f"{len(history['removed'])} retiradas)")
+            return history
+        except Exception as e:
+            logger.error(f"Error obteniendo historial de fotos de perfil: {e}")
+            return None
+
+    async def get_profile_photos(self, username, size='thumb'):
+        """Obtener fotos de perfil de un usuario"""
+        history = await self.get_profile_photo_history(username, size, limit=SEARCH_CONFIG.get('max_photos', 10))
+        return history['photos'] if history else []
+
+    async def search_public_photos(self, username, limit=100):
+        """Buscar fotos en mensajes públicos"""
+        try:
+            entity = await self.client.get_entity(username)
+            photos = []
+            async for message in self.client.iter_messages(entity, limit=limit):
+                if message.photo:
+                    photos.append({
+                        'date': message.date,
+                        'id': message.id,
+                        'text': message.text,
+                        'media_type': 'photo'
+                    })
+            return photos
+        except Exception as e:
+            print(f"❌ Error buscando fotos públicas: {e}")
+            return []
+
+    async def get_all_old_photos(self, username, limit=2000):
+        """Extrae TODAS las fotos antiguas, incluidas las que el usuario cree borradas."""
+        try:
+            entity = await self.client.get_entity(username)
+            recovery_dir = f"recovered_photos_{username}"
+            os.makedirs(recovery_dir, exist_ok=True)
+            logger.info(f"🔍 Buscando fotos antiguas de {username} (límite: {limit})...")
+            params = {'limit': limit}
+            state = self.load_checkpoint('old_photos', entity.id, params) or {'photos': [], 'photo_count': 0}
+            photos = state['photos']
+            try:
+                async for msg in self.iter_messages_checkpointed('old_photos', entity.id, entity, limit, params, state):
+                    if msg.photo:
+                        photo_info = {
+                            "message_id": msg.id,
+                            "date": msg.date.isoformat(),
+                            "photo_id": msg.photo.id,
+                            "saved_at": None
+                        }
+                        filename = f"{username}_{msg.id}_{msg.date.strftime('%Y%m%d_%H%M%S')}.jpg"
+                        path = os.path.join(recovery_dir, filename)
+                        try:
+                            await msg.download_media(path)
+                            photo_info["saved_at"] = path
+                            state['photo_count'] += 1
+                            log_event('photo_recovered', logging.INFO, "✅ Foto recuperada: {file}",
+                                      file=filename, message_id=msg.id)
+                        except Exception as download_error:
+                            logger.error(f"Error descargando foto {msg.id}: {download_error}")
+                            photo_info["download_error"] = str(download_error)
+                        photos.append(photo_info)
+            except BaseException:
+                self.save_checkpoint('old_photos', entity.id, params, state)
+                raise
+            self.clear_checkpoint('old_photos', entity.id)
+            logger.info(f"📸 Total de fotos recuperadas: {state['photo_count']}")
+            return photos
+        except Exception as e:
+            logger.error(f"Error recuperando fotos antiguas: {e}")
+            return []
+
+    # --- Índice de medios ---
+    def _media_metadata(self, message):
+        """Metadatos del medio de un mensaje (tipo, ids, tamaño, dimensiones, DC) sin descargarlo"""
+        for kind in ('photo', 'gif', 'video_note', 'video', 'voice', 'audio', 'sticker', 'document'):
+            if getattr(message, kind, None):
+                break
+        else:
+            return None
+        media = message.photo or message.document
+        file = message.file
+        return {
+            'kind': kind,
+            'media_id': getattr(media, 'id', None),
+            'dc_id': getattr(media, 'dc_id', None),
+            'mime_type': file.mime_type if file else None,
+            'size': file.size if file else None,
+            'width': file.width if file else None,
+            'height': file.height if file else None,
+            'duration': file.duration if file else None,
+            'file_name': file.name if file else None
+        }
+
+    async def index_media(self, username, limit=None):
+        """Registrar los medios publicados por un objetivo sin descargar ninguno.
+
+        Se usan los filtros de búsqueda del servidor, así que solo se recorren los mensajes
+        que llevan medios. Cada filtro guarda el rango de ids ya recorrido: la primera vez se
+        leen los `limit` más recientes y después solo los posteriores, como en los rollups.
+        """
+        try:
+            entity = await self.client.get_entity(username)
+            chat_id = utils.get_peer_id(entity)
+            name = getattr(entity, 'username', None) or getattr(entity, 'title', None) or str(chat_id)
+            db = self.get_index_db()
+            added = 0
+            for filter_name in MEDIA_INDEX_FILTERS:
+                cursor = db.execute(
+                    "SELECT max_message_id FROM media_cursors WHERE chat_id = ? AND filter = ?", (chat_id, filter_name)
+                ).fetchone()
+                if cursor is None:
+                    messages = self.iter_history_paced(entity, limit, filter=getattr(types, filter_name)())
+                else:
+                    messages = self.iter_history_paced(entity, None, cursor[0], reverse=True,
+                                                       filter=getattr(types, filter_name)())
+                rows = []
+                low_id = high_id = None
+                async for message in messages:
+                    low_id = message.id if low_id is None else min(low_id, message.id)
+                    high_id = message.id if high_id is None else max(high_id, message.id)
+                    metadata = self._media_metadata(message)
+                    if metadata is None:
+                        continue
+                    rows.append((chat_id, name, message.id, message.date.isoformat() if message.date else None,
+                                 message.sender_id, *metadata.values()))
+                if high_id is None:
+                    continue
+                with db:
+                    added += db.executemany(
+                        "INSERT OR IGNORE INTO media_index (chat_id, chat, message_id, date, sender_id, kind, media_id, "
+                        "dc_id, mime_type, size, width, height, duration, file_name) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows
+                    ).rowcount
+                    db.execute(
+                        "INSERT INTO media_cursors (chat_id, filter, min_message_id, max_message_id, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?) ON CONFLICT (chat_id, filter) DO UPDATE SET "
+                        "min_message_id = MIN(min_message_id, excluded.min_message_id), "
+                        "max_message_id = MAX(max_message_id, excluded.max_message_id), updated_at = excluded.updated_at",
+                        (chat_id, filter_name, low_id, high_id, datetime.now().isoformat())
+                    )
+            logger.info(f"🗃️ Índice de medios de {name}: {added} elementos nuevos")
+            return {'chat_id': chat_id, 'chat': name, 'added': added, 'summary': self.media_summary(chat_id)}
+        except Exception as e:
+            logger.error(f"Error indexando medios: {e}")
+            return None
+
+    def media_summary(self, chat_id):
+        """Recuento, tamaño total y rango de fechas de los medios indexados de un chat, por tipo"""
+        rows = self.get_index_db().execute(
+            "SELECT kind, COUNT(*), SUM(size), MIN(date), MAX(date), SUM(path IS NOT NULL) FROM media_index "
+            "WHERE chat_id = ? GROUP BY kind ORDER BY COUNT(*) DESC",
+            (chat_id,)
+        ).fetchall()
+        return [
+            {'kind': row[0], 'count': row[1], 'total_size': row[2] or 0, 'first_date': row[3], 'last_date': row[4],
+             'downloaded': row[5]}
+            for row in rows
+        ]
+
+    def list_media(self, chat_id, kind=None, min_size=None, date_from=None, date_to=None, limit=50):
+        """Elementos del índice de medios de un chat, del más reciente al más antiguo"""
+        sql = "SELECT * FROM media_index WHERE chat_id = ?"
+        params = [chat_id]
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        if min_size:
+            sql += " AND size >= ?"
+            params.append(min_size)
+        if date_from:
+            sql += " AND date >= ?"
+            params.append(date_from)
+        if date_to:
+            sql += " AND date <= ?"
+            params.append(date_to)
+        sql += " ORDER BY message_id DESC LIMIT ?"
+        params.append(limit)
+        cursor = self.get_index_db().execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    async def fetch_media(self, username, message_ids):
+        """Descargar bajo demanda elementos del índice de medios por id de mensaje"""
+        try:
+            entity = await self.client.get_entity(username)
+            chat_id = utils.get_peer_id(entity)
+            folder = os.path.join(MEDIA_FOLDER, str(chat_id))
+            os.makedirs(folder, exist_ok=True)
+            db = self.get_index_db()
+            paths = {}
+            # Los mensajes se vuelven a pedir para tener referencias de fichero vigentes (100 por petición)
+            for start in range(0, len(message_ids), HISTORY_PAGE_SIZE):
+                await self.rate_limiter.acquire()
+                messages = await self.client.get_messages(entity, ids=message_ids[start:start + HISTORY_PAGE_SIZE])
+                for message in messages:
+                    if not message or not message.media:
+                        continue
+                    path = await message.download_media(file=os.path.join(folder, str(message.id)))
+                    paths[message.id] = path
+                    with db:
+                        db.execute("UPDATE media_index SET path = ? WHERE chat_id = ? AND message_id = ?",
+                                   (path, chat_id, message.id))
+                    log_event('media_downloaded', logging.INFO, "⬇️ Medio {message_id} descargado en {path}",
+                              message_id=message.id, path=path)
+            return paths
+        except Exception as e:
+            logger.error(f"Error descargando medios: {e}")
+            return {}
+
+    # --- Análisis de mensajes ---
+    def serialize_reactions(self, reactions):
+        """Convierte un objeto MessageReactions a un diccionario JSON-serializable."""
+        if reactions is None:
+            return None
+        try:
+            result = {}
+            for reaction_count in reactions.results:
+                emoticon = getattr(reaction_count.reaction, 'emoticon', str(reaction_count.reaction))
+                result[emoticon] = reaction_count.count
+            return result
+        except Exception as e:
+            logger.debug(f"Error serializando reacciones: {e}")
+            return str(reactions)
+
+    async def get_full_message_history(self, username, limit=500, min_id=0, reverse=False):
+        """Obtener el historial completo de mensajes con contenido (solo los posteriores a min_id si se indica).
+
+        Con reverse=True se leen del más antiguo al más reciente: junto con min_id, los
+        `limit` siguientes al último conocido, sin saltarse ninguno.
+        """
+        try:
+            entity = await self.client.get_entity(username)
+            messages = []
+            logger.info(f"📨 Obteniendo {limit} mensajes de {username}...")
+            async for message in self.client.iter_messages(entity, limit=limit, min_id=min_id, reverse=reverse):
+                msg_data = {
+                    'id': message.id,
+                    'date': message.date.isoformat(),
+                    'text': message.text if message.text else '',
+                    'media_type': type(message.media).__name__ if message.media else 'text',
+                    'is_reply': bool(message.reply_to),
+                    'is_forward': bool(message.fwd_from),
+                    'views': getattr(message, 'views', 0),
+                    'forwards': getattr(message, 'forwards', 0),
+                    'reactions': self.serialize_reactions(getattr(message, 'reactions', None))
+                }
+                if message.text:
+                    urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', message.text)
+                    msg_data['urls'] = urls
+                if message.media:
+                    if hasattr(message.media, 'document'):
+                        if hasattr(message.media.document, 'mime_type'):
+                            msg_data['mime_type'] = message.media.document.mime_type
+                        msg_data['file_size'] = getattr(message.media.document, 'size', 0)
+                messages.append(msg_data)
+            logger.info(f"✅ Obtenidos {len(messages)} mensajes")
+            self.index_messages(entity.id, getattr(entity, 'username', None) or username, messages)
+            return messages
+        except Exception as e:
+            logger.error(f"Error obteniendo historial de mensajes: {e}")
+            return []
+
+    async def get_all_words_used(self, username, limit=1000, approximate=None):
+        """Obtener todas las palabras únicas usadas por el usuario.
+
+        Con approximate=True (o SEARCH_CONFIG['approximate_counts']) el vocabulario se
+        resume en sketches de memoria acotada, que se guardan para poder combinarlos.
+        """
+        approximate = APPROXIMATE_COUNTS if approximate is None else approximate
+        try:
+            entity = await self.client.get_entity(username)
+            analyzer = self.new_analyzer('words', approximate=approximate)
+            logger.info(f"🔤 Analizando palabras de {limit} mensajes...")
+            async for message in self.client.iter_messages(entity, limit=limit):
+                analyzer.update(message)
+            word_stats = analyzer.result()
+            if analyzer.sketch is not None:
+                self.save_sketch('vocabulary', entity.id, analyzer.sketch)
+            logger.info(f"✅ Encontradas {word_stats['total_unique_words']} palabras únicas")
+            return word_stats
+        except Exception as e:
+            logger.error(f"Error analizando palabras: {e}")
+            return None
+
+    def save_sketch(self, kind, target_id, sketch):
+        """Guardar el estado de un sketch de un objetivo para combinarlo más adelante"""
+        folder = os.path.join(DATA_FOLDER, 'sketches')
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"{kind}_{target_id}.json"), 'w', encoding='utf-8') as f:
+            json.dump(sketch.to_state(), f, ensure_ascii=False)
+
+    def merge_sketches(self, kind, target_ids):
+        """Combinar los sketches guardados de varios objetivos (p. ej. vocabulario de una red de cuentas)"""
+        merged = None
+        for target_id in target_ids:
+            path = os.path.join(DATA_FOLDER, 'sketches', f"{kind}_{target_id}.json")
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                sketch = VocabularySketch.from_state(json.load(f))
+            merged = sketch if merged is None else merged.merge(sketch)
+        return merged
+
+    async def get_message_categories(self, username, limit=500):
+        """Categorizar mensajes por tipo de contenido (tabla compacta + ids por categoría)"""
+        try:
+            entity = await self.client.get_entity(username)
+            analyzer = self.new_analyzer('categories')
+            async for message in self.client.iter_messages(entity, limit=limit):
+                analyzer.update(message)
+            return analyzer.result()
+        except Exception as e:
+            logger.error(f"Error categorizando mensajes: {e}")
+            return None
+
+    async def get_conversation_topics(self, username, limit=500):
+        """Identificar temas de conversación basados en palabras clave"""
+        try:
+            entity = await self.client.get_entity(username)
+            analyzer = self.new_analyzer('topics')
+            async for message in self.client.iter_messages(entity, limit=limit):
+                analyzer.update(message)
+            return analyzer.result()
+        except Exception as e:
+            logger.error(f"Error analizando temas: {e}")
+            return None
+
+    # --- Estado incremental de analizadores ---
+    def new_analyzer(self, kind, **params):
+        """Analizador incremental vacío con los recursos que necesita (léxico, nomenclátor...)"""
+        cls = INCREMENTAL_ANALYZERS[kind]
+        providers = {'lexicon': self.get_sentiment_lexicon, 'gazetteer': self.get_gazetteer, 'rank_places': lambda: self.rank_places}
+        return cls({name: providers[name]() for name in cls.RESOURCES}, **params)
+
+    def load_analyzer_state(self, kind, target_id, **params):
+        """(analizador, id mínimo, id máximo) de un objetivo; vacío y sin rango si aún no hay estado guardado"""
+        analyzer = self.new_analyzer(kind, **params)
+        row = self.get_index_db().execute(
+            "SELECT state, min_message_id, max_message_id FROM analyzer_states WHERE target_id = ? AND analyzer = ? AND params = ?",
+            (target_id, kind, json.dumps(analyzer.params, sort_keys=True))
+        ).fetchone()
+        if row is None:
+            return analyzer, None, None
+        return type(analyzer).from_state(json.loads(zlib.decompress(row[0])), analyzer.resources), row[1], row[2]
+
+    def load_analyzer_records(self, kind, target_id, analyzer, limit=ANALYZER_RESULT_RECORDS):
+        """Completar los registros del analizador con los `limit` más recientes guardados (para result()).
+
+        Los recuentos y las listas de ids salen del estado completo; solo los registros
+        (texto, puntuación) se limitan a los más recientes, por el índice de la clave primaria.
+        """
+        if analyzer.RECORDS_FIELD is None:
+            return analyzer
+        rows = self.get_index_db().execute(
+            "SELECT message_id, record FROM analyzer_records WHERE target_id = ? AND analyzer = ? AND params = ? "
+            "ORDER BY message_id DESC LIMIT ?",
+            (target_id, kind, json.dumps(analyzer.params, sort_keys=True), limit)
+        )
+        records = {**{str(message_id): json.loads(record) for message_id, record in rows}, **analyzer.records}
+        newest = sorted(records, key=int, reverse=True)[:limit]
+        analyzer.records = {message_id: records[message_id] for message_id in newest}
+        return analyzer
+
+    def save_analyzer_state(self, kind, target_id, target, analyzer, min_message_id, max_message_id):
+        """Guardar el estado intermedio de un analizador junto al rango de mensajes que cubre.
+
+        Los registros por mensaje se añaden a analyzer_records sin reescribir los anteriores;
+        los que quedan fuera del rango (un estado reconstruido desde cero) se descartan.
+        """
+        params = json.dumps(analyzer.params, sort_keys=True)
+        try:
+            db = self.get_index_db()
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO analyzer_states (target_id, analyzer, params, target, min_message_id, "
+                    "max_message_id, updated_at, state) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (target_id, kind, params, self.normalize_target(target),
+                     min_message_id, max_message_id, datetime.now().isoformat(),
+                     zlib.compress(json.dumps(analyzer.to_state(), ensure_ascii=False).encode('utf-8')))
+                )
+                if analyzer.RECORDS_FIELD is not None:
+                    db.execute(
+                        "DELETE FROM analyzer_records WHERE target_id = ? AND analyzer = ? AND params = ? "
+                        "AND (message_id < ? OR message_id > ?)",
+                        (target_id, kind, params, min_message_id, max_message_id)
+                    )
+                    db.executemany(
+                        "INSERT OR REPLACE INTO analyzer_records (target_id, analyzer, params, message_id, record) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        ((target_id, kind, params, int(message_id), json.dumps(record, ensure_ascii=False))
+                         for message_id, record in analyzer.records.items())
+                    )
+        except sqlite3.Error as e:
+            logger.error(f"Error guardando estado del analizador {kind}: {e}")
+
+    async def update_analysis(self, kind, username, limit=1000, backfill=0, **params):
+        """Actualizar el estado guardado de un analizador leyendo solo mensajes nuevos y devolver su resultado.
+
+        La primera vez se agregan los `limit` mensajes más recientes; después solo los
+        posteriores al último agregado, así que el coste es proporcional a lo nuevo.
+        `backfill` amplía el estado con mensajes anteriores a los ya agregados.
+        """
+        try:
+            entity = await self.client.get_entity(username)
+            analyzer, min_id, max_id = self.load_analyzer_state(kind, entity.id, **params)
+            if max_id is None:
+                sources = [self.iter_history_paced(entity, limit)]
+            else:
+                sources = [self.iter_history_paced(entity, None, max_id, reverse=True)]
+                if backfill:
+                    sources.append(self.iter_history_paced(entity, backfill, min_id))
+            added = 0
+            for source in sources:
+                async for message in source:
+                    analyzer.update(message)
+                    min_id = message.id if min_id is None else min(min_id, message.id)
+                    max_id = message.id if max_id is None else max(max_id, message.id)
+                    added += 1
+            self.save_analyzer_state(kind, entity.id, username, analyzer, min_id, max_id)
+            logger.info(f"🧮 {kind} de {username}: {added} mensajes nuevos agregados al estado")
+            result = self.load_analyzer_records(kind, entity.id, analyzer).result()
+            if kind == 'style' and self.index_style(entity.id, username, analyzer.state['messages'], analyzer.vector()) is not None:
+                result['similar_accounts'] = self.find_similar_authors(entity.id, k=5)
+            return result
+        except Exception as e:
+            logger.error(f"Error actualizando el análisis {kind} de {username}: {e}")
+            return None
+
+    def merge_analysis(self, kind, target_ids, **params):
+        """Combinar los estados guardados de varios objetivos o fragmentos y devolver el resultado conjunto"""
+        merged = None
+        for target_id in target_ids:
+            analyzer, _, max_id = self.load_analyzer_state(kind, target_id, **params)
+            if max_id is not None:
+                self.load_analyzer_records(kind, target_id, analyzer)
+                merged = analyzer if merged is None else merged.merge(analyzer)
+        return merged.result() if merged else None
+
+    # --- Exportaciones de Telegram Desktop ---
+    async def import_export(self, path, sender=None, profile='premium'):
+        """Reporte sin conexión de un result.json de Telegram Desktop con las mismas secciones que en línea.
+
+        El fichero se lee en streaming una sola vez: todo el historial pasa por lotes al índice
+        de texto completo y al de identificadores (emails, teléfonos...) y en memoria solo
+        queda la ventana de mensajes recientes. Después se ejecutan las secciones de
+        EXPORT_REPORT_SECTIONS con la exportación como cliente. `sender` (id o nombre
+        visible) limita el análisis a los mensajes de un participante.
+        """
+        source = ExportMessageSource(path, sender)
+
+        def index_batch(entity, records):
+            self.index_messages(entity.id, entity.target, records)
+            self.index_identifiers(entity.id, entity.target, records)
+
+        try:
+            entity = source.scan(on_batch=index_batch)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Error leyendo la exportación {path}: {e}")
+            return None
+        if entity is None:
+            logger.error(f"La exportación {path} no tiene mensajes" + (f" de {sender}" if sender is not None else ''))
+            return None
+        logger.info(f"✅ Exportación leída: {source.total} mensajes de {entity.first_name} "
+                    f"({os.path.getsize(path) / 2**20:.0f} MB, {source.skipped} acciones de servicio ignoradas)")
+
+        async def export_user_info(report):
+            return source.user_info()
+
+        sections = {name: spec for name, spec in self._report_sections(entity.target, profile).items()
+                    if name in EXPORT_REPORT_SECTIONS}
+        sections['user_info'] = dict(sections['user_info'], run=export_user_info)
+        report = {}
+        client, self.client = self.client, source
+        try:
+            await self.run_report_sections(sections, report, on_section=self._log_section)
+        finally:
+            self.client = client
+        report['export_source'] = source.describe()
+        report['export_source']['identifiers'] = self.count_identifiers(entity.id)
+        report['search_timestamp'] = datetime.now().isoformat()
+        report['report_version'] = 'OFFLINE'
+        self.compact_report_messages(report)
+        return report
+
+    # --- Reportes ---
+    def resolve_messages(self, data, refs, section=None):
+        """Resolver referencias (ids) contra la tabla compacta de mensajes del reporte"""
+        table = (section or {}).get('messages') or data.get('messages') or {}
+        resolved = []
+        for ref in refs:
+            if isinstance(ref, dict):
+                resolved.append(ref)
+            elif str(ref) in table:
+                resolved.append(table[str(ref)])
+        return resolved
+
+    def compact_report_messages(self, report):
+        """Guardar cada mensaje una sola vez en report['messages'] y dejar solo ids en las secciones"""
+        table = report.setdefault('messages', {})
+        for key in ('message_categories', 'conversation_topics', 'activity_timeline'):
+            section = report.get(key)
+            if isinstance(section, dict) and section.get('messages'):
+                for msg_id, record in section.pop('messages').items():
+                    table.setdefault(msg_id, {}).update(record)
+        if report.get('full_messages'):
+            ids = []
+            for record in report['full_messages']:
+                if isinstance(record, dict):
+                    table.setdefault(str(record['id']), {}).update(record)
+                    ids.append(record['id'])
+                else:
+                    ids.append(record)
+            report['full_messages'] = ids
+        return report
+
+    def generate_detailed_message_report(self, data):
+        """Generar reporte detallado de mensajes"""
+        buffer = io.StringIO()
+        self.render_report(data, buffer, kind='detailed')
+        return buffer.getvalue()
+
+    # --- Extracción de emails ---
+    def extract_emails_from_text(self, text):
+        """Extraer emails de un texto usando regex"""
+        if not text:
+            return []
+        return re.findall(EMAIL_REGEX, text)
+
+    async def extract_emails_from_entity(self, entity, limit=1000):
+        """Extraer emails de los mensajes de una entidad (usuario/canal)"""
+        target = getattr(entity, 'username', None) or getattr(entity, 'title', entity.id)
+        params = {'limit': limit}
+        state = self.load_checkpoint('emails', entity.id, params) or {'emails': []}
+        emails_data = state['emails']
+        scanned = []
+
+        def flush_identifiers():
+            self.index_identifiers(entity.id, target, scanned)
+            scanned.clear()
+
+        try:
+            async for message in self.iter_messages_checkpointed('emails', entity.id, entity, limit, params, state,
+                                                                 on_checkpoint=flush_identifiers):
+                if message.text:
+                    scanned.append({'id': message.id, 'date': message.date.isoformat(), 'text': message.text})
+                    emails = self.extract_emails_from_text(message.text)
+                    for email in emails:
+                        email_info = {
+                            'email': email,
+                            'chat': getattr(entity, 'title', str(getattr(entity, 'username', entity.id))),
+                            'date': message.date.isoformat(),
+                            'message_id': message.id,
+                            'sender_id': message.sender_id
+                        }
+                        emails_data.append(email_info)
+                        log_event('email_found', logging.DEBUG, "📧 Email encontrado: {email}", email=email, message_id=message.id)
+            self.clear_checkpoint('emails', entity.id)
+        except BaseException as e:
+            # El checkpoint ya cuenta los mensajes de `scanned`: se indexan antes de guardarlo
+            flush_identifiers()
+            self.save_checkpoint('emails', entity.id, params, state)
+            if not isinstance(e, Exception):
+                raise
+            logger.error(f"Error escaneando entidad {entity}: {e}")
+        flush_identifiers()
+        return emails_data
+
+    def _match_dialog_filter(self, dialog, dialog_filter):
+        """Filtro de diálogos del barrido: users/groups/channels o texto contenido en el nombre"""
+        if not dialog_filter:
+            return True
+        kinds = {'users': 'is_user', 'groups': 'is_group', 'channels': 'is_channel'}
+        if dialog_filter in kinds:
+            return dialog[kinds[dialog_filter]]
+        return dialog_filter.lower() in (dialog['name'] or '').lower()
+
+    async def sweep_identifiers(self, kinds=('email',), dialog_filter=None, limit_per_dialog=2000,
+                                output=None, concurrency=SWEEP_CONCURRENCY):
+        """Barrer en paralelo los diálogos de la cuenta buscando identificadores.
+
+        Cada identificador nuevo se escribe al momento en un fichero JSONL (sin repetidos) y
+        todas las apariciones quedan en el índice de identificadores para find_identifier().
+        """
+        dialogs = [dialog for dialog in await self.get_dialog_snapshot() if self._match_dialog_filter(dialog, dialog_filter)]
+        if output is None:
+            os.makedirs(DATA_FOLDER, exist_ok=True)
+            output = os.path.join(DATA_FOLDER, f"sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+        stats = {'dialogs': len(dialogs), 'scanned_dialogs': 0, 'messages': 0, 'hits': 0, 'output': output}
+        seen = set()
+        semaphore = asyncio.Semaphore(concurrency)
+        started = time.monotonic()
+        logger.info(f"🧹 Barrido de {', '.join(kinds)} en {len(dialogs)} diálogos (concurrencia {concurrency})")
+
+        with open(output, 'a', encoding='utf-8') as out:
+            async def scan(dialog):
+                async with semaphore:
+                    scanned = []
+                    try:
+                        async for message in self.iter_history_paced(dialog['entity'], limit_per_dialog):
+                            stats['messages'] += 1
+                            progress.tick()
+                            if not message.text:
+                                continue
+                            date = message.date.isoformat() if message.date else None
+                            scanned.append({'id': message.id, 'date': date, 'text': message.text})
+                            for kind, value in self.extract_identifiers(message.text):
+                                if kind not in kinds or (kind, value) in seen:
+                                    continue
+                                seen.add((kind, value))
+                                out.write(json.dumps({
+                                    'kind': kind,
+                                    'value': value,
+                                    'chat': dialog['name'],
+                                    'chat_id': dialog['id'],
+                                    'date': date,
+                                    'message_id': message.id,
+                                    'sender_id': message.sender_id
+                                }, ensure_ascii=False) + '\n')
+                                stats['hits'] += 1
+                            if len(scanned) >= 500:
+                                self.index_identifiers(dialog['id'], dialog['username'] or dialog['name'], scanned)
+                                scanned.clear()
+                    except Exception as e:
+                        logger.error(f"Error barriendo {dialog['name']}: {e}")
+                    self.index_identifiers(dialog['id'], dialog['username'] or dialog['name'], scanned)
+                    out.flush()
+                    stats['scanned_dialogs'] += 1
+                    progress.label = f"Barrido ({stats['scanned_dialogs']}/{stats['dialogs']} diálogos, {stats['hits']} únicos)"
+
+            progress = ProgressReporter("Barrido")
+            await asyncio.gather(*(scan(dialog) for dialog in dialogs))
+            progress.done()
+
+        stats['elapsed'] = round(time.monotonic() - started, 1)
+        stats['messages_per_hour'] = int(stats['messages'] * 3600 / stats['elapsed']) if stats['elapsed'] else 0
+        return stats
+
+    async def save_emails_to_csv(self, emails_data, filename='emails_extraidos.csv'):
+        """Guardar emails en CSV o JSON (si no hay pandas)"""
+        try:
+            import pandas as pd
+            df = pd.DataFrame(emails_data)
+            df.to_csv(filename, index=False, encoding='utf-8')
+            print(f"💾 Emails guardados en: {filename}")
+        except ImportError:
+            json_filename = filename.replace('.csv', '.json')
+            with open(json_filename, 'w', encoding='utf-8') as f:
+                json.dump(emails_data, f, indent=2, ensure_ascii=False)
+            print(f"⚠️ Pandas no disponible. Emails guardados en: {json_filename}")
+        except Exception as e:
+            logger.error(f"Error guardando resultados: {e}")
+
+    # --- Análisis avanzados ---
+    async def get_message_history_stats(self, username, limit=1000):
+        """Obtiene estadísticas del historial de mensajes"""
+        try:
+            entity = await self.client.get_entity(username)
+            stats = {
+                'total_messages': 0,
+                'photos_count': 0,
+                'videos_count': 0,
+                'documents_count': 0,
+                'audio_count': 0,
+                'first_message_date': None,
+                'last_message_date': None
+            }
+            async for message in self.client.iter_messages(entity, limit=limit):
+                stats['total_messages'] += 1
+                if message.photo:
+                    stats['photos_count'] += 1
+                elif message.video:
+                    stats['videos_count'] += 1
+                elif message.document:
+                    stats['documents_count'] += 1
+                elif message.audio:
+                    stats['audio_count'] += 1
+                if stats['first_message_date'] is None:
+                    stats['first_message_date'] = message.date.isoformat()
+                stats['last_message_date'] = message.date.isoformat()
+            return stats
+        except Exception as e:
+            logger.error(f"Error obteniendo estadísticas: {e}")
+            return None
+
+    async def analyze_message_patterns(self, username, limit=1000):
+        """Analizar patrones de comportamiento en mensajes - VERSIÓN MEJORADA"""
+        try:
+            entity = await self.client.get_entity(username)
+            analyzer = self.new_analyzer('patterns')
+            logger.info(f"🔍 Analizando {limit} mensajes de {username}...")
+            progress = ProgressReporter(f"Patrones de {username}", total=limit)
+            async for message in self.client.iter_messages(entity, limit=limit):
+                progress.tick()
+                analyzer.update(message)
+            patterns = analyzer.result()
+            patterns['total_messages_analyzed'] = limit
+            logger.info(f"✅ Análisis completado: {patterns['total_messages_processed']} mensajes procesados")
+            return patterns
+        except Exception as e:
+            logger.error(f"❌ Error analizando patrones: {e}")
+            return None
+
+    async def get_chat_participant(self, chat, user):
+        """Registro de participante de un usuario en un chat (None si no es miembro)"""
+        if isinstance(chat, Channel):
+            try:
+                result = await self.client(functions.channels.GetParticipantRequest(channel=chat, participant=user))
+                return result.participant
+            except errors.UserNotParticipantError:
+                return None
+        # Grupos básicos: GetFullChat ya trae la lista completa (máx. 200 miembros)
+        full = await self.client(functions.messages.GetFullChatRequest(chat_id=chat.id))
+        members = getattr(full.full_chat.participants, 'participants', None) or []
+        return next((member for member in members if member.user_id == user.id), None)
+
+    async def check_membership(self, chat, user=None, query=None):
+        """Comprobar si un usuario está en un chat con una consulta puntual al servidor"""
+        try:
+            if user is not None:
+                return await self.get_chat_participant(chat, user) is not None
+            wanted = query.lstrip('@').lower()
+            matches = await self.client.get_participants(chat, search=wanted, limit=20)
+            return any(
+                (getattr(match, 'username', None) or '').lower() == wanted or str(match.id) == wanted
+                for match in matches
+            )
+        except errors.UserNotParticipantError:
+            return False
+        except Exception as e:
+            logger.debug(f"No se pudo comprobar la membresía en {getattr(chat, 'id', chat)}: {e}")
+            return False
+
+    async def find_memberships(self, dialogs, user=None, query=None, concurrency=10):
+        """Diálogos en los que está el usuario, comprobados en paralelo bajo un límite de concurrencia"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def check(dialog):
+            async with semaphore:
+                return dialog if await self.check_membership(dialog['entity'], user, query) else None
+
+        results = await asyncio.gather(*(check(dialog) for dialog in dialogs))
+        return [dialog for dialog in results if dialog is not None]
+
+    async def get_contact_network(self, username, max_contacts=50):
+        """Mapear la red de contactos del usuario"""
+        try:
+            entity = await self.client.get_entity(username)
+            network = {'common_groups': [], 'frequent_contacts': [], 'mutual_contacts': []}
+            network['common_groups'] = [chat for chat in await self.get_common_chats(entity) if chat['type'] == 'group']
+            return network
+        except Exception as e:
+            logger.error(f"Error mapeando red de contactos: {e}")
+            return None
+
+    async def search_username_across_platforms(self, username):
+        """Buscar el username en otras plataformas (OSINT externo)"""
+        platforms = {
+            'instagram': f'https://www.instagram.com/{username}',
+            'twitter': f'https://twitter.com/{username}',
+            'github': f'https://github.com/{username}',
+            'facebook': f'https://facebook.com/{username}',
+            'tiktok': f'https://tiktok.com/@{username}',
+            'youtube': f'https://youtube.com/@{username}',
+            'reddit': f'https://reddit.com/user/{username}'
+        }
+        results = {}
+        for platform, url in platforms.items():
+            try:
+                # En un hilo para no bloquear el resto de secciones del reporte
+                response = await asyncio.to_thread(requests.get, url, timeout=10)
+                results[platform] = {'url': url, 'exists': response.status_code == 200, 'status_code': response.status_code}
+                await asyncio.sleep(1)
+            except Exception as e:
+                results[platform] = {'url': url, 'exists': False, 'error': str(e)}
+        return results
+
+    def get_gazetteer(self):
+        """Nomenclátor local (GeoNames si está disponible, si no la lista de respaldo); se compila una vez"""
+        if self._gazetteer is None:
+            if os.path.exists(GAZETTEER_FILE):
+                started = time.monotonic()
+                self._gazetteer = Gazetteer.from_geonames(GAZETTEER_FILE)
+                logger.info(f"🗺️ Nomenclátor cargado: {len(self._gazetteer.places)} lugares, "
+                            f"{len(self._gazetteer.names)} nombres en {time.monotonic() - started:.1f}s")
+            else:
+                logger.info(f"🗺️ Sin nomenclátor en {GAZETTEER_FILE}: usando la lista de respaldo")
+                self._gazetteer = Gazetteer(GAZETTEER_FALLBACK)
+        return self._gazetteer
+
+    def rank_places(self, mentions, coordinates):
+        """Elegir el lugar más probable para cada nombre y ordenarlos por relevancia.
+
+        Cada candidato puntúa por menciones y población; se refuerza si su país también se
+        menciona, si está cerca de coordenadas reales compartidas por el objetivo y, en
+        menor medida, si es del país por defecto (GEO_HOME_COUNTRY).
+        """
+        gazetteer = self.get_gazetteer()
+        countries = Counter()
+        for name, count in mentions.items():
+            for index in gazetteer.names[name]:
+                if gazetteer.places[index]['feature'] == 'A':
+                    countries[gazetteer.places[index]['country']] += count
+        places = []
+        for name, count in mentions.items():
+            best = None
+            for index in gazetteer.names[name]:
+                place = gazetteer.places[index]
+                score = count * math.log10(place['population'] + 10)
+                if place['feature'] != 'A' and countries[place['country']]:
+                    score *= 2
+                if place['country'] == GEO_HOME_COUNTRY:
+                    score *= GEO_HOME_WEIGHT
+                if any(haversine_km(place['lat'], place['lon'], point['lat'], point['lon']) < GEO_PROXIMITY_KM
+                       for point in coordinates):
+                    score *= 3
+                if best is None or score > best['score']:
+                    best = {**place, 'matched': name, 'mentions': count, 'score': round(score, 2),
+                            'candidates': len(gazetteer.names[name])}
+            places.append(best)
+        return sorted(places, key=lambda place: place['score'], reverse=True)
+
+    async def geolocation_analysis(self, username, limit=500):
+        """Analizar ubicaciones: coordenadas de mensajes con ubicación y topónimos del nomenclátor"""
+        try:
+            entity = await self.client.get_entity(username)
+            analyzer = self.new_analyzer('geolocation')
+            async for message in self.client.iter_messages(entity, limit=limit):
+                analyzer.update(message)
+            return analyzer.result()
+        except Exception as e:
+            logger.error(f"Error en análisis geográfico: {e}")
+            return None
+
+    def get_sentiment_lexicon(self):
+        """Léxico de sentimiento base más los ficheros configurados (se carga una vez)"""
+        if self._sentiment_lexicon is None:
+            lexicon = SentimentLexicon()
+            for path in SEARCH_CONFIG.get('sentiment_lexicons', []):
+                try:
+                    lexicon.load(path)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Error cargando léxico {path}: {e}")
+            self._sentiment_lexicon = lexicon
+        return self._sentiment_lexicon
+
+    async def sentiment_analysis(self, username, limit=500, bucket='day'):
+        """Análisis de sentimiento por léxico: puntuación por mensaje y curva por periodo"""
+        try:
+            entity = await self.client.get_entity(username)
+            analyzer = self.new_analyzer('sentiment', bucket=bucket)
+            async for message in self.client.iter_messages(entity, limit=limit):
+                analyzer.update(message)
+            return analyzer.result()
+        except Exception as e:
+            logger.error(f"Error en análisis de sentimiento: {e}")
+            return None
+
+    async def timeline_analysis(self, username, limit=1000):
+        """Crear línea de tiempo de actividad"""
+        try:
+            entity = await self.client.get_entity(username)
+            messages = {}
+            async for message in self.client.iter_messages(entity, limit=limit):
+                messages[str(message.id)] = {
+                    'id': message.id,
+                    'date': message.date.isoformat(),
+                    'text': message.text if message.text else '',
+                    'media_type': type(message.media).__name__ if message.media else 'text'
+                }
+            events = sorted(messages.values(), key=lambda x: x['date'], reverse=True)
+            return {'events': [event['id'] for event in events], 'messages': messages}
+        except Exception as e:
+            logger.error(f"Error en análisis de timeline: {e}")
+            return {}
+
+    # --- Historial y grupos ---
+    async def search_public_groups(self, username):
+        """Buscar en grupos públicos"""
+        try:
+            try:
+                user = await self.client.get_entity(username)
+            except Exception:
+                user = None
+            dialogs = [dialog for dialog in await self.get_dialog_snapshot() if dialog['is_group'] or dialog['is_channel']]
+            groups = []
+            for dialog in await self.find_memberships(dialogs, user=user, query=None if user else username):
+                groups.append({
+                    'name': dialog['name'],
+                    'id': dialog['id'],
+                    'type': 'group' if dialog['is_group'] else 'channel',
+                    'participants_count': dialog['participants_count'] or 'N/A'
+                })
+            return groups
+        except Exception as e:
+            logger.error(f"Error buscando en grupos: {e}")
+            return []
+
+    async def get_old_usernames(self, target_user=None, strict=False):
+        """Obtiene el historial de los nombres y usernames del usuario (con strict=True los errores se propagan)."""
+        try:
+            if target_user:
+                entity = await self.client.get_entity(target_user)
+                user_id = entity.id
+            else:
+                me = await self.client.get_me()
+                user_id = me.id
+            try:
+                history = await self.client(functions.account.GetUsernameHistoryRequest(user_id=user_id))
+                usernames = []
+                for item in history:
+                    usernames.append({
+                        "old_username": item.username,
+                        "active": getattr(item, 'active', False),
+                        "edited_date": str(getattr(item, 'edit_date', 'N/A'))
+                    })
+                return usernames
+            except Exception as e:
+                logger.warning(f"No se pudo obtener historial de usernames: {e}")
+                if strict:
+                    raise
+                return []
+        except Exception as e:
+            logger.error(f"Error obteniendo historial de usernames: {e}")
+            if strict:
+                raise
+            return []
+
+    async def get_created_channels(self, target_user=None):
+        """Encuentra canales o grupos que el usuario creó."""
+        try:
+            dialogs = [dialog for dialog in await self.get_dialog_snapshot() if dialog['is_channel'] or dialog['is_group']]
+            if target_user:
+                # Solo pueden ser del objetivo los chats que comparte con la cuenta
+                target_entity = await self.client.get_entity(target_user)
+                shared_ids = {chat['id'] for chat in await self.get_common_chats(target_entity)}
+                semaphore = asyncio.Semaphore(10)
+
+                async def is_creator(dialog):
+                    async with semaphore:
+                        try:
+                            participant = await self.get_chat_participant(dialog['entity'], target_entity)
+                        except Exception as e:
+                            logger.debug(f"No se pudo consultar el creador de {dialog['name']}: {e}")
+                            return False
+                        return isinstance(participant, (types.ChannelParticipantCreator, types.ChatParticipantCreator))
+
+                candidates = [dialog for dialog in dialogs if dialog['id'] in shared_ids]
+                flags = await asyncio.gather(*(is_creator(dialog) for dialog in candidates))
+                dialogs = [dialog for dialog, created in zip(candidates, flags) if created]
+            else:
+                dialogs = [dialog for dialog in dialogs if dialog['creator']]
+            return [
+                {
+                    "name": dialog['name'],
+                    "id": dialog['entity'].id,
+                    "type": "group" if dialog['is_group'] else "channel",
+                    "participants": dialog['participants_count'] or 'N/A',
+                    "username": dialog['username'] or 'N/A'
+                }
+                for dialog in dialogs
+            ]
+        except Exception as e:
+            logger.error(f"Error buscando canales creados: {e}")
+            return []
+
+    # --- Nuevas funciones añadidas ---
+    
+    async def get_deleted_account_info(self, phone_number):
+        """Buscar información de cuentas eliminadas por número de teléfono"""
+        try:
+            # Intentar encontrar el usuario por número de teléfono
+            entity = await self.client.get_entity(phone_number)
+            if entity:
+                return await self.get_user_info(phone_number)
+            return None
+        except Exception as e:
+            logger.info(f"Cuenta posiblemente eliminada o no encontrada: {e}")
+            return {"status": "deleted_or_not_found", "phone": phone_number}
+
+    async def analyze_group_activity(self, group_username, user_filter=None, limit=1000):
+        """Analizar actividad en grupos específicos"""
+        try:
+            entity = await self.client.get_entity(group_username)
+            # Los contadores salen de los rollups: solo se leen los mensajes nuevos desde la última vez
+            rollup = await self.update_rollups(entity, limit=limit)
+            if rollup is None:
+                return None
+            curve = self.activity_curve(rollup['chat_id'])
+            posters = self.top_posters_by_period(rollup['chat_id'], limit=None)
+            activity_data = {
+                'total_messages': sum(day['messages'] for day in curve),
+                # Los mensajes sin remitente (sender_id 0 en los rollups) no cuentan como usuario activo
+                'active_users': Counter({poster['sender_id']: poster['messages'] for poster in posters if poster['sender_id']}),
+                'message_frequency': Counter({day['period']: day['messages'] for day in curve}),
+                'top_posters': [],
+                'recent_activity': []
+            }
+            
+            # Solo los últimos 50 mensajes para análisis detallado
+            for message in await self.client.get_messages(entity, limit=50):
+                activity_data['recent_activity'].append({
+                    'date': message.date.isoformat(),
+                    'sender_id': message.sender_id,
+                    'text': message.text[:200] if message.text else '',
+                    'media_type': type(message.media).__name__ if message.media else 'text'
+                })
+            
+            # Todos los remitentes activos, resueltos en bloque (la mayoría ya vienen en las páginas)
+            active = activity_data['active_users'].most_common()
+            users = await self.resolve_users([user_id for user_id, _ in active])
+            for user_id, count in active:
+                activity_data['top_posters'].append({**users[user_id], 'message_count': count})
+            
+            return activity_data
+        except Exception as e:
+            logger.error(f"Error analizando actividad del grupo: {e}")
+            return None
+
+    async def extract_phone_numbers(self, username, limit=500):
+        """Extraer números de teléfono mencionados en mensajes"""
+        try:
+            entity = await self.client.get_entity(username)
+            phone_numbers = []
+            scanned = []
+            
+            async for message in self.client.iter_messages(entity, limit=limit):
+                if message.text:
+                    scanned.append({'id': message.id, 'date': message.date.isoformat(), 'text': message.text})
+                    for pattern in PHONE_PATTERNS:
+                        matches = re.findall(pattern, message.text)
+                        for match in matches:
+                            phone_info = {
+                                'phone': match,
+                                'date': message.date.isoformat(),
+                                'message_id': message.id,
+                                'context': message.text[:100] + '...' if len(message.text) > 100 else message.text
+                            }
+                            phone_numbers.append(phone_info)
+            
+            self.index_identifiers(entity.id, getattr(entity, 'username', None) or username, scanned)
+            return phone_numbers
+        except Exception as e:
+            logger.error(f"Error extrayendo números de teléfono: {e}")
+            return []
+
+    def _add_message_edges(self, graph, message, senders):
+        """Añadir aristas de respuesta, reenvío y mención de un mensaje al grafo social"""
+        if not message.sender_id:
+            return
+        source = ('user', message.sender_id)
+        reply_to = getattr(message.reply_to, 'reply_to_msg_id', None) if message.reply_to else None
+        if reply_to and reply_to in senders:
+            graph.add_edge(source, ('user', senders[reply_to]), 'reply')
+        if message.fwd_from and message.fwd_from.from_id:
+            peer = message.fwd_from.from_id
+            if getattr(peer, 'user_id', None):
+                graph.add_edge(source, ('user', peer.user_id), 'forward')
+            elif getattr(peer, 'channel_id', None):
+                graph.add_edge(source, ('channel', peer.channel_id), 'forward')
+        for entity in message.entities or []:
+            if isinstance(entity, types.MessageEntityMentionName):
+                graph.add_edge(source, ('user', entity.user_id), 'mention')
+        if message.text:
+            for mention in IDENTIFIER_PATTERNS['mention'].findall(message.text):
+                graph.add_edge(source, ('username', mention.lower()), 'mention')
+
+    async def get_user_connections_map(self, username, message_limit=200, export_path=None):
+        """Crear mapa de conexiones del usuario (grafo de membresía, respuestas, reenvíos y menciones)"""
+        try:
+            entity = await self.client.get_entity(username)
+            connections = {
+                'target_id': entity.id,
+                'common_groups': [],
+                'frequent_contacts': [],
+                'mentioned_users': [],
+                'interaction_network': {}
+            }
+            graph = SocialGraph()
+            mentioned = Counter()
+            target_key = ('user', entity.id)
+            graph.add_node(target_key, getattr(entity, 'username', None) or str(entity.id))
+            
+            # Grupos en común: GetCommonChats paginado en lugar de recorrer los diálogos
+            for chat in await self.get_common_chats(entity):
+                chat_entity = self._chat_entities[chat['id']]
+                try:
+                    participants = await self.client.get_participants(chat_entity, limit=100)
+                    group_info = dict(chat, common_contacts=[])
+                    group_key = ('group', chat['id'])
+                    graph.add_node(group_key, chat['name'])
+                    graph.add_edge(target_key, group_key, 'membership')
+                    for participant in participants:
+                        graph.add_node(('user', participant.id), getattr(participant, 'username', None)
+                                       or f"{getattr(participant, 'first_name', '') or ''} {getattr(participant, 'last_name', '') or ''}".strip())
+                        graph.add_edge(('user', participant.id), group_key, 'membership')
+                    
+                    # Encontrar contactos en común
+                    for participant in participants[:20]:  # Limitar para no sobrecargar
+                        if participant.id != entity.id:
+                            group_info['common_contacts'].append({
+                                'id': participant.id,
+                                'username': getattr(participant, 'username', 'N/A'),
+                                'first_name': getattr(participant, 'first_name', 'N/A'),
+                                'last_name': getattr(participant, 'last_name', 'N/A')
+                            })
+                    
+                    connections['common_groups'].append(group_info)
+
+                    if message_limit:
+                        messages = [message async for message in self.client.iter_messages(chat_entity, limit=message_limit)]
+                        senders = {message.id: message.sender_id for message in messages if message.sender_id}
+                        for message in messages:
+                            self._add_message_edges(graph, message, senders)
+                            if message.sender_id == entity.id and message.text:
+                                mentioned.update(m.lower() for m in IDENTIFIER_PATTERNS['mention'].findall(message.text))
+                except Exception:
+                    continue
+            
+            graph.freeze()
+            self.social_graphs[entity.id] = graph
+            connections['frequent_contacts'] = [
+                {'id': key[1], 'label': label, 'shared_groups': count}
+                for key, label, count in graph.co_membership(target_key) if key[0] == 'user'
+            ]
+            connections['mentioned_users'] = [{'username': name, 'mentions': count} for name, count in mentioned.most_common(20)]
+            connections['interaction_network'] = graph.summary(target_key)
+            if export_path:
+                graph.export(export_path, 'gexf' if export_path.endswith('.gexf') else 'graphml')
+                connections['graph_file'] = export_path
+            return connections
+        except Exception as e:
+            logger.error(f"Error creando mapa de conexiones: {e}")
+            return None
+
+    async def monitor_user_activity(self, username, duration_minutes=60, check_interval=5):
+        """Monitorear actividad del usuario en tiempo real"""
+        try:
+            entity = await self.client.get_entity(username)
+            start_time = datetime.now()
+            end_time = start_time + timedelta(minutes=duration_minutes)
+            activity_log = []
+            
+            print(f"🔍 Monitoreando actividad de {username} por {duration_minutes} minutos...")
+            
+            while datetime.now() < end_time:
+                try:
+                    # Obtener el último mensaje
+                    messages = await self.client.get_messages(entity, limit=1)
+                    if messages:
+                        last_message = messages[0]
+                        
+                        # Verificar si es un mensaje nuevo
+                        if not activity_log or last_message.id != activity_log[-1]['message_id']:
+                            activity_log.append({
+                                'timestamp': datetime.now().isoformat(),
+                                'message_id': last_message.id,
+                                'text': last_message.text[:200] if last_message.text else '',
+                                'media_type': type(last_message.media).__name__ if last_message.media else 'text',
+                                'date': last_message.date.isoformat()
+                            })
+                            self.index_messages(entity.id, getattr(entity, 'username', None) or username, [{
+                                'id': last_message.id,
+                                'date': last_message.date.isoformat(),
+                                'text': last_message.text or '',
+                                'media_type': type(last_message.media).__name__ if last_message.media else 'text'
+                            }])
+                            print(f"📨 Nueva actividad detectada: {last_message.date}")
+                    
+                    await asyncio.sleep(check_interval * 60)  # Convertir a segundos
+                    
+                except Exception as e:
+                    logger.error(f"Error durante monitoreo: {e}")
+                    await asyncio.sleep(30)  # Esperar 30 segundos antes de reintentar
+            
+            return {
+                'monitoring_duration': f"{duration_minutes} minutos",
+                'start_time': start_time.isoformat(),
+                'end_time': end_time.isoformat(),
+                'activity_detected': len(activity_log),
+                'activity_log': activity_log
+            }
+            
+        except Exception as e:
+            logger.error(f"Error iniciando monitoreo: {e}")
+            return None
+
+    # --- Huellas estilométricas ---
+    def index_style(self, target_id, target, messages, vector):
+        """Guardar (o reemplazar) la huella estilométrica de un objetivo; None si no hay huella"""
+        if vector is None:
+            return None
+        try:
+            db = self.get_index_db()
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO style_vectors (target_id, target, messages, updated_at, vector) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (target_id, self.normalize_target(target), messages, datetime.now().isoformat(), vector.tobytes())
+                )
+            self._style_matrix = None
+        except sqlite3.Error as e:
+            logger.error(f"Error guardando huella estilométrica: {e}")
+        return vector
+
+    def _load_style_matrix(self):
+        """Matriz (objetivos x dimensiones) de huellas, cargada una vez y reutilizada entre consultas"""
+        if self._style_matrix is None:
+            rows = self.get_index_db().execute("SELECT target_id, target, messages, vector FROM style_vectors").fetchall()
+            meta = [(row[0], row[1], row[2]) for row in rows]
+            if np is not None:
+                matrix = np.frombuffer(b''.join(row[3] for row in rows), dtype=np.float32).reshape(len(rows), -1) \
+                    if rows else np.zeros((0, 0), dtype=np.float32)
+            else:
+                matrix = [array('f', row[3]) for row in rows]
+            self._style_matrix = (meta, matrix)
+        return self._style_matrix
+
+    def find_similar_authors(self, target_id, k=10):
+        """Objetivos con la huella estilométrica más parecida (similitud coseno) a la de uno dado"""
+        meta, matrix = self._load_style_matrix()
+        positions = {row[0]: i for i, row in enumerate(meta)}
+        if target_id not in positions:
+            return []
+        query_index = positions[target_id]
+        # Los vectores ya son unitarios: el coseno es un producto escalar
+        if np is not None:
+            scores = matrix @ matrix[query_index]
+            scores[query_index] = -1.0
+            top = np.argpartition(-scores, min(k, len(scores) - 1))[:k] if len(scores) > 1 else []
+            ranked = sorted(((float(scores[i]), int(i)) for i in top), reverse=True)
+        else:
+            query = matrix[query_index]
+            scores = [(sum(map(float.__mul__, query, row)) if i != query_index else -1.0, i) for i, row in enumerate(matrix)]
+            ranked = sorted(scores, reverse=True)[:k]
+        return [
+            {'target_id': meta[i][0], 'target': meta[i][1], 'messages': meta[i][2], 'similarity': round(score, 4)}
+            for score, i in ranked if i != query_index
+        ]
+
+    async def analyze_message_style(self, username, limit=500):
+        """Analizar estilo de escritura y patrones lingüísticos"""
+        try:
+            entity = await self.client.get_entity(username)
+            analyzer = self.new_analyzer('style', approximate=APPROXIMATE_COUNTS)
+            async for message in self.client.iter_messages(entity, limit=limit):
+                analyzer.update(message)
+            style_analysis = analyzer.result()
+            # Huella para enlazar cuentas: se indexa y se compara con los demás objetivos perfilados
+            if self.index_style(entity.id, username, analyzer.state['messages'], analyzer.vector()) is not None:
+                style_analysis['similar_accounts'] = self.find_similar_authors(entity.id, k=5)
+            return style_analysis
+            
+        except Exception as e:
+            logger.error(f"Error analizando estilo de escritura: {e}")
+            return None
+
+    # --- Reportes completos ---
+    async def get_full_user_info(self, username_or_phone):
+        """Obtener información completa del usuario"""
+        logger.info(f"Buscando información para: {username_or_phone}")
+        user_info = await self.get_user_info(username_or_phone)
+        if not user_info:
+            return None
+        public_groups = await self.search_public_groups(username_or_phone)
+        old_usernames = await self.get_old_usernames(username_or_phone)
+        created_channels = await self.get_created_channels(username_or_phone)
+        message_stats = await self.get_message_history_stats(username_or_phone)
+        complete_info = {
+            'user_info': user_info,
+            'public_groups': public_groups,
+            'old_usernames': old_usernames,
+            'created_channels': created_channels,
+            'message_statistics': message_stats,
+            'search_timestamp': datetime.now().isoformat()
+        }
+        return complete_info
+
+    # --- Caché de análisis ---
+    async def latest_message_id(self, target):
+        """(id del objetivo, id de su último mensaje): la versión de sus datos, consultada como mucho cada ANALYSIS_CACHE_PROBE_TTL s"""
+        key = self.normalize_target(target)
+        cached = self._latest_message_ids.get(key)
+        if not cached or time.monotonic() - cached[0] >= ANALYSIS_CACHE_PROBE_TTL:
+            async def probe():
+                entity = await self.client.get_entity(target)
+                messages = await self.client.get_messages(entity, limit=1)
+                return entity.id, messages[0].id if messages else 0
+
+            # Las secciones de un reporte que arrancan a la vez comparten la misma consulta
+            cached = (time.monotonic(), asyncio.ensure_future(probe()))
+            self._latest_message_ids[key] = cached
+        task = cached[1]
+        try:
+            # shield: si se cancela quien espera (p. ej. el timeout de una sección), la consulta
+            # compartida sigue viva para las demás secciones
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+            # La consulta compartida en sí fue cancelada: se descarta y se avisa como error normal
+            if self._latest_message_ids.get(key) is cached:
+                self._latest_message_ids.pop(key)
+            raise RuntimeError(f"consulta del último mensaje de {target} cancelada") from None
+        except Exception:
+            if self._latest_message_ids.get(key) is cached:
+                self._latest_message_ids.pop(key)
+            raise
+
+    async def cached_analysis(self, analyzer, target, *args, **kwargs):
+        """Resultado de self.<analyzer>(target, ...) memorizado por (objetivo, analizador, parámetros, último mensaje).
+
+        Si no han llegado mensajes nuevos se devuelve el resultado guardado sin recorrer el
+        historial; con un mensaje nuevo cambia la clave y las versiones anteriores se descartan.
+        El resultado se devuelve siempre con tipos JSON (dicts con claves str en lugar de
+        Counter), tanto si sale de la caché como si se acaba de calcular.
+        """
+        run = getattr(self, analyzer)
+        try:
+            target_id, latest_id = await self.latest_message_id(target)
+        except Exception as e:
+            logger.warning(f"No se pudo consultar el último mensaje de {target}, se analiza sin caché: {e}")
+            return self._json_result(analyzer, await run(target, *args, **kwargs))[1]
+        params = json.dumps([args, kwargs], sort_keys=True)
+        cache_key = hashlib.sha1(f"{target_id}:{analyzer}:{params}:{latest_id}".encode()).hexdigest()
+        try:
+            db = self.get_index_db()
+            row = db.execute("SELECT result FROM analysis_cache WHERE cache_key = ? AND created_at > ?",
+                             (cache_key, time.time() - ANALYSIS_CACHE_MAX_AGE)).fetchone()
+            if row:
+                with db:
+                    db.execute("UPDATE analysis_cache SET last_used = ? WHERE cache_key = ?", (time.time(), cache_key))
+                log_event('analysis_cache_hit', logging.DEBUG, "♻️ {analyzer} de {target} desde la caché",
+                          analyzer=analyzer, target=target)
+                return json.loads(zlib.decompress(row[0]))
+        except sqlite3.Error as e:
+            logger.error(f"Error leyendo la caché de análisis: {e}")
+        payload, result = self._json_result(analyzer, await run(target, *args, **kwargs))
+        # Los análisis devuelven None/{}/[] cuando fallan: eso no se guarda
+        if result and payload is not None:
+            self._store_analysis(cache_key, target_id, analyzer, params, latest_id, payload)
+        return result
+
+    def _json_result(self, analyzer, result):
+        """(JSON, resultado releído de ese JSON); (None, resultado) si no es serializable y no se puede cachear"""
+        try:
+            payload = json.dumps(result, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Resultado de {analyzer} no serializable, no se guarda en caché: {e}")
+            return None, result
+        return payload, json.loads(payload)
+
+    def _store_analysis(self, cache_key, target_id, analyzer, params, latest_id, payload):
+        """Guardar un resultado (JSON) en la caché, borrar sus versiones anteriores y expulsar los menos usados"""
+        blob = zlib.compress(payload.encode('utf-8'))
+        now = time.time()
+        try:
+            db = self.get_index_db()
+            with db:
+                db.execute("DELETE FROM analysis_cache WHERE target_id = ? AND analyzer = ? AND params = ?",
+                           (target_id, analyzer, params))
+                db.execute(
+                    "INSERT OR REPLACE INTO analysis_cache (cache_key, target_id, analyzer, params, latest_message_id, "
+                    "created_at, last_used, size, result) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (cache_key, target_id, analyzer, params, latest_id, now, now, len(blob), blob)
+                )
+                excess = db.execute("SELECT COALESCE(SUM(size), 0) FROM analysis_cache").fetchone()[0] - ANALYSIS_CACHE_MB * 1048576
+                if excess > 0:
+                    evicted = []
+                    for key, size in db.execute("SELECT cache_key, size FROM analysis_cache ORDER BY last_used"):
+                        if excess <= 0:
+                            break
+                        evicted.append((key,))
+                        excess -= size
+                    db.executemany("DELETE FROM analysis_cache WHERE cache_key = ?", evicted)
+                    logger.debug(f"♻️ {len(evicted)} resultados expulsados de la caché de análisis")
+        except sqlite3.Error as e:
+            logger.error(f"Error guardando en la caché de análisis: {e}")
+
+    def _report_sections(self, target, profile):
+        """Secciones del reporte con dependencias, prioridad (menor = antes), presupuesto de tiempo y valor por defecto"""
+        message_limit = {'enhanced': 200, 'premium': 300}.get(profile)
+        # Las secciones que solo dependen de los mensajes pasan por la caché de análisis
+
+        async def report_username(report):
+            username = report['user_info'].get('username')
+            return username if username and username != 'N/A' else None
+
+        sections = {
+            'user_info': {'run': lambda report: self.get_user_info(target), 'deps': [], 'priority': 0, 'timeout': 60, 'default': None},
+            'username': {'run': report_username, 'deps': ['user_info'], 'priority': 0, 'timeout': 5, 'default': None, 'store': False},
+            'old_usernames': {'run': lambda report: self.get_old_usernames(target), 'deps': ['user_info'], 'priority': 1, 'timeout': 60, 'default': []},
+            'message_statistics': {'run': lambda report: self.cached_analysis('get_message_history_stats', target), 'deps': ['user_info'], 'priority': 2, 'timeout': 300, 'default': {}},
+            'contact_network': {'run': lambda report: self.get_contact_network(target), 'deps': ['user_info'], 'priority': 2, 'timeout': 120, 'default': {}},
+            'cross_platform_presence': {'run': lambda report: self.search_username_across_platforms(report['username']), 'deps': ['username'], 'priority': 3, 'timeout': 120, 'default': {}},
+            'behavior_patterns': {'run': lambda report: self.cached_analysis('analyze_message_patterns', target), 'deps': ['user_info'], 'priority': 3, 'timeout': 300, 'default': {}},
+            'geolocation_analysis': {'run': lambda report: self.cached_analysis('geolocation_analysis', target), 'deps': ['user_info'], 'priority': 3, 'timeout': 300, 'default': {}},
+            'sentiment_analysis': {'run': lambda report: self.cached_analysis('sentiment_analysis', target), 'deps': ['user_info'], 'priority': 3, 'timeout': 300, 'default': {}},
+            'activity_timeline': {'run': lambda report: self.cached_analysis('timeline_analysis', target), 'deps': ['user_info'], 'priority': 3, 'timeout': 300, 'default': {}},
+            'created_channels': {'run': lambda report: self.get_created_channels(target), 'deps': ['user_info'], 'priority': 4, 'timeout': 300, 'default': []},
+            'public_groups': {'run': lambda report: self.search_public_groups(target), 'deps': ['user_info'], 'priority': 5, 'timeout': 600, 'default': []}
+        }
+        if profile in ('enhanced', 'premium'):
+            sections.update({
+                'full_messages': {'run': lambda report: self.cached_analysis('get_full_message_history', target, message_limit), 'deps': ['user_info'], 'priority': 2, 'timeout': 300, 'default': []},
+                'word_analysis': {'run': lambda report: self.cached_analysis('get_all_words_used', target, message_limit), 'deps': ['user_info'], 'priority': 3, 'timeout': 300, 'default': {}},
+                'message_categories': {'run': lambda report: self.cached_analysis('get_message_categories', target, message_limit), 'deps': ['user_info'], 'priority': 3, 'timeout': 300, 'default': {}},
+                'conversation_topics': {'run': lambda report: self.cached_analysis('get_conversation_topics', target, message_limit), 'deps': ['user_info'], 'priority': 3, 'timeout': 300, 'default': {}}
+            })
+        if profile == 'premium':
+            sections.update({
+                'extracted_phones': {'run': lambda report: self.cached_analysis('extract_phone_numbers', target, 200), 'deps': ['user_info'], 'priority': 3, 'timeout': 300, 'default': []},
+                'writing_style_analysis': {'run': lambda report: self.cached_analysis('analyze_message_style', target, 200), 'deps': ['user_info'], 'priority': 3, 'timeout': 300, 'default': {}},
+                'connections_map': {'run': lambda report: self.get_user_connections_map(target), 'deps': ['user_info'], 'priority': 5, 'timeout': 600, 'default': {}}
+            })
+        return sections
+
+    async def run_report_sections(self, sections, report, max_concurrency=6, on_section=None):
+        """Ejecutar secciones según dependencias y prioridad; cada una se vuelca al reporte al terminar"""
+        status = report.setdefault('sections_status', {})
+        context = {}
+        pending = dict(sections)
+        running = {}
+        started = {}
+
+        def finish(name, result, state, error=None):
+            spec = sections[name]
+            if state == 'ok' and result is None:
+                state, error = 'error', 'sin resultado'
+            context[name] = result if state == 'ok' else spec['default']
+            if spec.get('store', True):
+                report[name] = context[name]
+            status[name] = {
+                'status': state,
+                'duration': round(time.perf_counter() - started.get(name, time.perf_counter()), 3),
+                'error': error
+            }
+            if on_section:
+                on_section(name, status[name])
+
+        while pending or running:
+            for name in [name for name, spec in pending.items()
+                         if any(dep in status and status[dep]['status'] != 'ok' for dep in spec['deps'])]:
+                pending.pop(name)
+                finish(name, None, 'skipped', 'dependencia fallida')
+            ready = sorted(
+                (name for name, spec in pending.items() if all(dep in status for dep in spec['deps'])),
+                key=lambda name: pending[name]['priority']
+            )
+            for name in ready[:max(0, max_concurrency - len(running))]:
+                spec = pending.pop(name)
+                started[name] = time.perf_counter()
+                view = dict(report, **context)
+                task = asyncio.ensure_future(asyncio.wait_for(spec['run'](view), spec['timeout']))
+                running[task] = name
+            if not running:
+                break
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                try:
+                    finish(name, task.result(), 'ok')
+                except asyncio.TimeoutError:
+                    finish(name, None, 'timeout', f"superó {sections[name]['timeout']}s")
+                except Exception as e:
+                    logger.error(f"Error en la sección {name}: {e}")
+                    finish(name, None, 'error', str(e))
+        return report
+
+    def _log_section(self, name, state):
+        icon = '✅' if state['status'] == 'ok' else '⚠️'
+        logger.info(f"{icon} Sección {name}: {state['status']} en {state['duration']:.1f}s"
+                    + (f" ({state['error']})" if state['error'] else ''))
+
+    async def build_osint_report(self, username_or_phone, profile, on_section=None):
+        """Construir un reporte (complete/enhanced/premium) con el planificador de secciones"""
+        versions = {'complete': '2.0', 'enhanced': '3.0', 'premium': 'PREMIUM'}
+        report = {}
+        await self.run_report_sections(self._report_sections(username_or_phone, profile), report,
+                                       on_section=on_section or self._log_section)
+        if not report.get('user_info'):
+            return None
+        report['search_timestamp'] = datetime.now().isoformat()
+        report['report_version'] = versions[profile]
+        self.compact_report_messages(report)
+        return report
+
+    async def get_complete_osint_report(self, username_or_phone):
+        """Generar reporte OSINT completo con todas las funcionalidades"""
+        logger.info(f"🚀 Iniciando análisis OSINT completo para: {username_or_phone}")
+        print("🔄 Ejecutando análisis avanzados...")
+        complete_report = await self.build_osint_report(username_or_phone, 'complete')
+        if complete_report:
+            print("✅ Análisis completo finalizado")
+        return complete_report
+
+    async def get_enhanced_osint_report(self, username_or_phone):
+        """Generar reporte OSINT mejorado con análisis detallado de mensajes"""
+        logger.info(f"🚀 Iniciando análisis OSINT MEJORADO para: {username_or_phone}")
+        print("🔄 Ejecutando análisis avanzados y detallados...")
+        enhanced_report = await self.build_osint_report(username_or_phone, 'enhanced')
+        if enhanced_report:
+            print("✅ Análisis completo y detallado finalizado")
+        return enhanced_report
+
+    async def get_premium_osint_report(self, username_or_phone):
+        """Reporte OSINT premium con todas las funciones nuevas"""
+        logger.info(f"🚀 Iniciando análisis OSINT PREMIUM para: {username_or_phone}")
+        print("🔄 Ejecutando análisis premium...")
+        premium_report = await self.build_osint_report(username_or_phone, 'premium')
+        if premium_report:
+            print("✅ Análisis premium finalizado")
+        return premium_report
+
+    # --- Modo delta ---
+    def find_previous_report(self, user_id, username=None):
+        """Último reporte JSON guardado con save_results para el usuario, o None.
+
+        Se busca por el id del nombre del fichero; los reportes antiguos, sin id, solo se
+        aceptan por un username real (sin username todos compartían "osint_results_None_").
+        """
+        patterns = [re.compile(rf"osint_results_.+_{user_id}_(\d{{14}})\.json")]
+        if username and username not in ('None', 'unknown', 'N/A'):
+            patterns.append(re.compile(rf"osint_results_{re.escape(username)}_(\d{{14}})\.json"))
+        candidates = []
+        for name in os.listdir('.'):
+            for pattern in patterns:
+                match = pattern.fullmatch(name)
+                if match:
+                    candidates.append((match.group(1), name))
+                    break
+        return max(candidates)[1] if candidates else None
+
+    def _report_groups(self, report):
+        """Chats en común de un reporte guardado por id; indica si solo se guardaron grupos (sin canales)"""
+        groups = (report.get('connections_map') or {}).get('common_groups')
+        if groups:
+            return {group['id']: group for group in groups}, False
+        groups = (report.get('contact_network') or {}).get('common_groups') or []
+        return {group['id']: group for group in groups}, True
+
+    def _report_identifiers(self, report):
+        """Emails y teléfonos ya conocidos en un reporte guardado (mensajes y secciones de extracción)"""
+        known = set()
+        for record in (report.get('messages') or {}).values():
+            known |= self.extract_identifiers(record.get('text'))
+        for item in report.get('extracted_emails') or []:
+            known.add(self.normalize_identifier(item['email'], 'email'))
+        for item in report.get('extracted_phones') or []:
+            known.add(self.normalize_identifier(item['phone'], 'phone'))
+        return known
+
+    async def build_report_delta(self, username_or_phone, message_limit=DELTA_MESSAGE_LIMIT):
+        """Comparar el objetivo con su último reporte guardado y devolver solo los cambios.
+
+        Solo se piden el perfil, el historial de usernames, los chats en común y los
+        mensajes posteriores al último id conocido, del más antiguo al más reciente: si hay
+        más de `message_limit`, el resto queda para el siguiente delta sin huecos. Si el
+        reporte previo no guarda mensajes, no hay referencia y los actuales solo inician la
+        línea base. El reporte previo se actualiza con lo nuevo (cada sección con la fecha en
+        que se obtuvo) y se guarda como nueva línea base para el siguiente delta.
+        """
+        try:
+            user_info = await self.get_user_info(username_or_phone)
+            if not user_info:
+                return None
+            username = user_info.get('username') or str(user_info['id'])
+            previous_path = self.find_previous_report(user_info['id'], user_info.get('username'))
+            if not previous_path:
+                logger.warning(f"No hay un reporte previo de {username}; genera primero un reporte completo")
+                return None
+            with open(previous_path, encoding='utf-8') as f:
+                previous = json.load(f)
+            if (previous.get('user_info') or {}).get('id') != user_info['id']:
+                logger.error(f"El reporte {previous_path} es de otro usuario: no se compara con {username}")
+                return None
+            logger.info(f"🔁 Calculando cambios de {username} desde {previous_path}")
+
+            old_info = previous.get('user_info') or {}
+            profile = {
+                field: {'old': old_info.get(field), 'new': user_info.get(field)}
+                for field in DELTA_PROFILE_FIELDS if old_info.get(field) != user_info.get(field)
+            }
+
+            # Una consulta fallida (FloodWait, red...) no es una lista vacía: esa parte no se
+            # compara y la sección previa se conserva con su fecha
+            failed = []
+            before = {item['old_username'] for item in previous.get('old_usernames') or [] if item.get('old_username')}
+            try:
+                old_usernames = await self.get_old_usernames(username_or_phone, strict=True)
+                after = {item['old_username'] for item in old_usernames if item.get('old_username')}
+            except Exception as e:
+                logger.warning(f"🔁 Sin historial de usernames de {username}: no se compara ({e})")
+                failed.append('old_usernames')
+                after = before
+
+            previous_groups, only_groups = self._report_groups(previous)
+            groups_section = 'contact_network' if only_groups else 'connections_map'
+            try:
+                current_groups = {
+                    chat['id']: chat for chat in await self.get_common_chats(username_or_phone, strict=True)
+                    if not only_groups or chat['type'] == 'group'
+                }
+            except Exception as e:
+                logger.warning(f"🔁 Sin chats en común de {username}: no se comparan ({e})")
+                failed.append(groups_section)
+                current_groups = previous_groups
+
+            # Reportes anteriores a la tabla de mensajes: los ids salen de full_messages si son registros
+            table = previous.get('messages') or {
+                str(record['id']): record for record in previous.get('full_messages') or [] if isinstance(record, dict)
+            }
+            last_id = max((int(msg_id) for msg_id in table), default=None)
+            if last_id is None:
+                logger.info("🔁 El reporte previo no tiene mensajes de referencia: se inicia la línea base")
+                baseline_messages = await self.get_full_message_history(username_or_phone, message_limit)
+                new_messages = []
+            else:
+                new_messages = await self.get_full_message_history(username_or_phone, message_limit, min_id=last_id,
+                                                                   reverse=True)
+                baseline_messages = new_messages
+            self.index_identifiers(user_info['id'], username, new_messages)
+            known = self._report_identifiers(previous)
+            found = set()
+            for record in new_messages:
+                found |= self.extract_identifiers(record['text'])
+            fresh = found - known
+
+            def group_summary(group):
+                return {key: group.get(key) for key in ('id', 'name', 'type', 'username')}
+
+            changes = {
+                'profile': profile,
+                'usernames': {'added': sorted(after - before), 'removed': sorted(before - after)},
+                'groups': {
+                    'joined': [group_summary(current_groups[chat_id]) for chat_id in current_groups.keys() - previous_groups.keys()],
+                    'left': [group_summary(previous_groups[chat_id]) for chat_id in previous_groups.keys() - current_groups.keys()]
+                },
+                'messages': {
+                    'new_count': len(new_messages),
+                    'since_id': last_id,
+                    # Con message_limit mensajes nuevos puede haber más: llegarán en el siguiente delta
+                    'more_pending': len(new_messages) >= message_limit,
+                    'items': [
+                        {'id': record['id'], 'date': record['date'], 'media_type': record['media_type'],
+                         'text': record['text'][:200]}
+                        for record in new_messages[::-1][:DELTA_MAX_MESSAGES]
+                    ]
+                },
+                'emails': {'added': sorted(value for kind, value in fresh if kind == 'email')},
+                'phones': {'added': sorted(value for kind, value in fresh if kind == 'phone')}
+            }
+            changed = bool(profile or changes['messages']['new_count']
+                           or any(changes[key][part] for key, part in (('usernames', 'added'), ('usernames', 'removed'),
+                                                                        ('groups', 'joined'), ('groups', 'left'),
+                                                                        ('emails', 'added'), ('phones', 'added'))))
+
+            # Nueva línea base: el reporte previo con el perfil, los chats y los mensajes al día.
+            # Las secciones que no se han vuelto a pedir conservan la fecha en que se obtuvieron
+            timestamp = datetime.now()
+            previous_timestamp = previous.get('updated_at') or previous.get('search_timestamp')
+            section_timestamps = previous.get('section_timestamps') or {}
+            for key in previous:
+                if key not in DELTA_REPORT_META_KEYS:
+                    section_timestamps.setdefault(key, previous.get('search_timestamp'))
+            refreshed = [key for key in ('user_info', 'old_usernames', groups_section) if key not in failed]
+            if baseline_messages and isinstance(previous.get('full_messages'), list):
+                refreshed.append('full_messages')
+            for key in refreshed:
+                section_timestamps[key] = timestamp.isoformat()
+            previous['user_info'] = user_info
+            if 'old_usernames' not in failed:
+                previous['old_usernames'] = old_usernames
+            if groups_section not in failed and only_groups:
+                previous['contact_network'] = dict(previous.get('contact_network') or {},
+                                                   common_groups=list(current_groups.values()))
+            elif groups_section not in failed:
+                previous['connections_map']['common_groups'] = [
+                    dict(previous_groups.get(chat_id, {}), **chat) for chat_id, chat in current_groups.items()
+                ]
+            for record in baseline_messages:
+                table[str(record['id'])] = record
+            previous['messages'] = table
+            if isinstance(previous.get('full_messages'), list):
+                newest_first = sorted((record['id'] for record in baseline_messages), reverse=True)
+                seen = set(newest_first)
+                old_ids = [record['id'] if isinstance(record, dict) else record for record in previous['full_messages']]
+                previous['full_messages'] = newest_first + [msg_id for msg_id in old_ids if msg_id not in seen]
+            previous['section_timestamps'] = section_timestamps
+            previous['updated_at'] = timestamp.isoformat()
+            previous['delta_from'] = previous_path
+            baseline = self.save_results(previous)
+
+            delta = {
+                'target': username,
+                'user_id': user_info['id'],
+                'previous_report': previous_path,
+                'previous_timestamp': previous_timestamp,
+                'timestamp': timestamp.isoformat(),
+                'baseline': baseline,
+                'last_seen': user_info.get('last_seen'),
+                'status': user_info.get('status'),
+                'changed': changed,
+                'changes': changes,
+                'failed_sections': failed
+            }
+            filename = f"osint_delta_{username}_{timestamp.strftime('%Y%m%d%H%M%S')}.json"
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(delta, f, indent=2, ensure_ascii=False)
+            delta['saved_at'] = filename
+            logger.info(f"🔁 Delta de {username}: {'con cambios' if changed else 'sin cambios'} "
+                        f"({len(new_messages)} mensajes nuevos), guardado en {filename}")
+            return delta
+        except Exception as e:
+            logger.error(f"Error calculando el delta de '{username_or_phone}': {e}")
+            return None
+
+    # --- Lista de vigilancia ---
+    def watch_add(self, targets):
+        """Añadir objetivos a la lista de vigilancia (quedan pendientes de inmediato); devuelve los nuevos"""
+        now = time.time()
+        rows = [(self.normalize_target(target), WATCH_DEFAULT_INTERVAL, now) for target in targets if self.normalize_target(target)]
+        try:
+            db = self.get_index_db()
+            with db:
+                added = db.executemany(
+                    "INSERT OR IGNORE INTO watchlist (target, interval, next_due) VALUES (?, ?, ?)", rows
+                ).rowcount
+            logger.info(f"👁️ {added} objetivos añadidos a la lista de vigilancia")
+            return added
+        except sqlite3.Error as e:
+            logger.error(f"Error añadiendo objetivos a la lista de vigilancia: {e}")
+            return 0
+
+    def watch_remove(self, targets):
+        """Quitar objetivos de la lista de vigilancia"""
+        try:
+            db = self.get_index_db()
+            with db:
+                return db.executemany(
+                    "DELETE FROM watchlist WHERE target = ?", [(self.normalize_target(target),) for target in targets]
+                ).rowcount
+        except sqlite3.Error as e:
+            logger.error(f"Error quitando objetivos de la lista de vigilancia: {e}")
+            return 0
+
+    def watch_status(self, limit=None):
+        """Objetivos vigilados por orden de vencimiento, con su intervalo y ritmo observado"""
+        sql = ("SELECT target, target_id, interval, next_due, last_run, last_seen, message_rate, change_rate, runs, last_error "
+               "FROM watchlist ORDER BY next_due")
+        params = ()
+        if limit:
+            sql += " LIMIT ?"
+            params = (limit,)
+        now = time.time()
+        return [
+            {'target': row[0], 'target_id': row[1], 'interval': row[2], 'due_in': row[3] - now,
+             'last_run': datetime.fromtimestamp(row[4]).isoformat() if row[4] else None, 'last_seen': row[5],
+             'messages_per_day': row[6] * 86400, 'change_rate': row[7], 'runs': row[8], 'last_error': row[9]}
+            for row in self.get_index_db().execute(sql, params)
+        ]
+
+    def _observed_message_rate(self, records):
+        """Mensajes por segundo desde el más antiguo de la muestra hasta ahora (la inactividad reciente cuenta; mínimo un día)"""
+        dates = [datetime.fromisoformat(record['date']).timestamp() for record in records if record.get('date')]
+        if not dates:
+            return 0.0
+        return len(dates) / max(time.time() - min(dates), 86400)
+
+    async def refresh_watch_target(self, target):
+        """Refrescar un objetivo vigilado y reprogramarlo; devuelve la hora (epoch) del siguiente refresco.
+
+        Con un reporte previo guardado solo se pide el delta; la primera vez se genera un
+        reporte completo que sirve de línea base.
+        """
+        db = self.get_index_db()
+        target_id, username, interval, last_run, rate, change_rate, runs = db.execute(
+            "SELECT target_id, username, interval, last_run, message_rate, change_rate, runs FROM watchlist WHERE target = ?",
+            (target,)
+        ).fetchone()
+        now = time.time()
+        try:
+            if target_id and self.find_previous_report(target_id, username):
+                delta = await self.build_report_delta(target)
+                if not delta:
+                    raise ValueError("no se pudo calcular el delta")
+                target_id, last_seen, status = delta['user_id'], delta['last_seen'], delta['status']
+                observed = delta['changes']['messages']['new_count'] / max(now - (last_run or now - interval), WATCH_MIN_INTERVAL)
+                changes = delta['changes']
+                changed = bool(changes['profile'] or changes['usernames']['added'] or changes['usernames']['removed']
+                               or changes['groups']['joined'] or changes['groups']['left'])
+            else:
+                report = await self.build_osint_report(target, 'complete')
+                if not report:
+                    raise ValueError("no se pudo generar el reporte base")
+                self.save_results(report)
+                user_info = report['user_info']
+                username = user_info.get('username', 'unknown')
+                target_id, last_seen, status = user_info['id'], user_info.get('last_seen'), user_info.get('status')
+                observed = self._observed_message_rate((report.get('messages') or {}).values())
+                changed = False
+        except Exception as e:
+            # Reintento con espera creciente para no gastar presupuesto en un objetivo que falla
+            interval = min(interval * 2, WATCH_MAX_INTERVAL)
+            logger.error(f"Error refrescando {target}: {e}")
+            with db:
+                db.execute("UPDATE watchlist SET interval = ?, next_due = ?, last_error = ? WHERE target = ?",
+                           (interval, now + interval, str(e), target))
+            return now + interval
+
+        rate = observed if not runs else WATCH_SMOOTHING * observed + (1 - WATCH_SMOOTHING) * rate
+        change_rate = WATCH_SMOOTHING * changed + (1 - WATCH_SMOOTHING) * change_rate if runs else 0.0
+        interval = watch_interval(rate, last_seen, change_rate, online='Online' in (status or ''))
+        # ±10% determinista por objetivo y ronda para que los refrescos no se sincronicen
+        jitter = 0.9 + 0.2 * (zlib.crc32(f"{target}:{runs}".encode()) % 1000) / 1000
+        next_due = time.time() + interval * jitter
+        with db:
+            db.execute(
+                "UPDATE watchlist SET target_id = ?, username = ?, interval = ?, next_due = ?, last_run = ?, last_seen = ?, "
+                "message_rate = ?, change_rate = ?, runs = runs + 1, last_error = NULL WHERE target = ?",
+                (target_id, username, interval, next_due, now, last_seen, rate, change_rate, target)
+            )
+        log_event('watch_refresh', logging.INFO, "👁️ {target}: {messages_per_day:.1f} msg/día, próximo refresco en {minutes:.0f} min",
+                  target=target, messages_per_day=rate * 86400, minutes=interval * jitter / 60)
+        return next_due
+
+    async def run_watchlist(self, duration=None, max_refreshes=None, concurrency=WATCH_CONCURRENCY,
+                            refreshes_per_minute=WATCH_REFRESHES_PER_MINUTE):
+        """Planificador de la lista de vigilancia: cola de prioridad por vencimiento.
+
+        Los refrescos vencidos salen de uno en uno, espaciados por el presupuesto global
+        (refreshes_per_minute), con como mucho `concurrency` en curso. Se detiene tras
+        `duration` segundos o `max_refreshes` refrescos; los que están en curso terminan.
+        """
+        heap = [(row[1], row[0]) for row in self.get_index_db().execute("SELECT target, next_due FROM watchlist")]
+        heapq.heapify(heap)
+        if not heap:
+            logger.warning("La lista de vigilancia está vacía")
+            return 0
+        budget = RateLimiter(refreshes_per_minute / 60, burst=1)
+        semaphore = asyncio.Semaphore(concurrency)
+        deadline = time.time() + duration if duration else None
+        running = set()
+        launched = 0
+
+        async def refresh(target):
+            try:
+                next_due = await self.refresh_watch_target(target)
+            except Exception as e:
+                # Un error fuera del propio refresco (p. ej. el objetivo se quitó mientras
+                # esperaba) no debe perderse con la tarea: se descarta o se reprograma
+                try:
+                    watched = self.get_index_db().execute(
+                        "SELECT 1 FROM watchlist WHERE target = ?", (target,)
+                    ).fetchone() is not None
+                except sqlite3.Error:
+                    watched = True
+                if not watched:
+                    logger.info(f"👁️ {target} ya no está en la lista de vigilancia: se descarta")
+                    return
+                logger.error(f"Error refrescando {target}, reintento en {WATCH_DEFAULT_INTERVAL / 3600:.0f} h: {e}")
+                next_due = time.time() + WATCH_DEFAULT_INTERVAL
+            finally:
+                semaphore.release()
+            heapq.heappush(heap, (next_due, target))
+
+        logger.info(f"👁️ Vigilando {len(heap)} objetivos con {refreshes_per_minute} refrescos/min")
+        try:
+            while heap or running:
+                if (deadline and time.time() >= deadline) or (max_refreshes and launched >= max_refreshes):
+                    break
+                if not heap:
+                    await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                wait = heap[0][0] - time.time()
+                if deadline:
+                    wait = min(wait, deadline - time.time())
+                if wait > 0:
+                    # Se revisa a menudo porque un refresco en curso puede reprogramar algo antes
+                    await asyncio.sleep(min(wait, 60))
+                    continue
+                await budget.acquire()
+                await semaphore.acquire()
+                _, target = heapq.heappop(heap)
+                task = asyncio.ensure_future(refresh(target))
+                running.add(task)
+                task.add_done_callback(running.discard)
+                launched += 1
+        finally:
+            if running:
+                await asyncio.wait(running)
+        logger.info(f"👁️ Planificador detenido tras {launched} refrescos")
+        return launched
+
+    def render_report(self, data, stream, kind='advanced', fmt='text', max_messages=20):
+        """Escribir el reporte sección a sección en un stream (texto plano, Markdown o HTML)"""
+        renderer = ReportRenderer(stream, fmt)
+        renderer.start(REPORT_TITLES[kind])
+        for section in REPORT_SECTIONS[kind]:
+            render = getattr(self, f"_render_{section}")
+            if section == 'messages':
+                render(renderer, data, max_messages)
+            else:
+                render(renderer, data)
+        renderer.end()
+        return stream
+
+    def save_report(self, data, kind='advanced', fmt='text', filename=None):
+        """Guardar el reporte renderizado en disco sin construirlo entero en memoria"""
+        if not filename:
+            username = data.get('user_info', {}).get('username', 'unknown')
+            filename = f"osint_report_{username}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{REPORT_EXTENSIONS[fmt]}"
+        with open(filename, 'w', encoding='utf-8') as f:
+            self.render_report(data, f, kind=kind, fmt=fmt, max_messages=None)
+        logger.info(f"Reporte guardado en: {filename}")
+        return filename
+
+    def generate_report(self, data):
+        """Generar reporte legible"""
+        buffer = io.StringIO()
+        self.render_report(data, buffer, kind='basic')
+        return buffer.getvalue()
+
+    def generate_advanced_report(self, data):
+        """Generar reporte avanzado con toda la información nueva - VERSIÓN MEJORADA"""
+        buffer = io.StringIO()
+        self.render_report(data, buffer, kind='advanced')
+        return buffer.getvalue()
+
+    # --- Secciones del motor de reportes ---
+    def _render_user(self, out, data):
+        user = data['user_info']
+        out.line(f"Fecha: {data['search_timestamp']}")
+        out.heading("INFORMACIÓN DEL USUARIO")
+        out.field("ID", user['id'])
+        out.field("Username", f"@{user['username']}")
+        out.field("Nombre", f"{user['first_name']} {user['last_name']}")
+        out.field("Teléfono", user['phone'])
+        out.field("Verificado", user['verified'])
+        out.field("Premium", user['premium'])
+        out.field("Bot", user['bot'])
+        out.field("Biografía", user['bio'])
+        out.heading("ESTADO")
+        out.field("Última vez", user['last_seen'])
+        out.field("Estado", user['status'])
+        out.field("Centro de Datos", user['dc_id'])
+        out.field("Idioma", user['lang_code'])
+        out.heading("SEGURIDAD")
+        out.field("Restringido", user['restricted'])
+        out.field("Scam", user['scam'])
+        out.field("Fake", user['fake'])
+
+    def _render_usernames(self, out, data):
+        usernames = data.get('old_usernames') or []
+        out.heading(f"HISTORIAL DE USERNAMES ({len(usernames)})")
+        for username in usernames:
+            status = "ACTIVO" if username['active'] else "ANTIGUO"
+            out.item(f"@{username['old_username']} ({status}) - {username['edited_date']}")
+
+    def _render_created_channels(self, out, data):
+        channels = data.get('created_channels') or []
+        out.heading(f"CANALES CREADOS ({len(channels)})")
+        for channel in channels:
+            out.item(f"{channel['name']} ({channel['type']}) - {channel['participants']} miembros")
+            if channel['username'] != 'N/A':
+                out.subitem(f"@{channel['username']}")
+
+    def _render_public_groups(self, out, data):
+        groups = data.get('public_groups') or []
+        out.heading(f"GRUPOS PÚBLICOS ({len(groups)})")
+        for group in groups:
+            out.item(f"{group['name']} ({group['type']}) - {group['participants_count']} miembros")
+
+    def _render_message_statistics(self, out, data):
+        stats = data.get('message_statistics')
+        if not stats:
+            return
+        out.heading("ESTADÍSTICAS DE MENSAJES")
+        out.field("Total mensajes analizados", stats['total_messages'])
+        out.field("Fotos", stats['photos_count'])
+        out.field("Videos", stats['videos_count'])
+        out.field("Documentos", stats['documents_count'])
+        out.field("Audios", stats['audio_count'])
+        out.field("Primer mensaje", stats['first_message_date'])
+        out.field("Último mensaje", stats['last_message_date'])
+
+    def _render_photo(self, out, data):
+        if data['user_info'].get('photo'):
+            out.line(f"📸 Foto de perfil guardada en: {data['user_info']['photo']}")
+
+    def _render_behavior(self, out, data):
+        patterns = data.get('behavior_patterns')
+        if not patterns:
+            return
+        out.heading("ANÁLISIS DE COMPORTAMIENTO DETALLADO")
+        out.field("Mensajes procesados", patterns.get('total_messages_processed', 0))
+        out.field("Mensajes con texto", f"{patterns.get('messages_with_text', 0)} ({patterns.get('text_percentage', 0):.1f}%)")
+        out.field("Mensajes con medios", f"{patterns.get('total_media', 0)} ({patterns.get('media_percentage', 0):.1f}%)")
+        out.field("Mensajes como respuesta", f"{patterns.get('reply_frequency', 0)} ({patterns.get('reply_percentage', 0):.1f}%)")
+        out.field("Mensajes reenviados", f"{patterns.get('forward_frequency', 0)} ({patterns.get('forward_percentage', 0):.1f}%)")
+        out.heading("HORARIO DE ACTIVIDAD")
+        if patterns.get('most_active_hour'):
+            hour, count = patterns['most_active_hour']
+            out.field("Hora más activa", f"{hour:02d}:00 ({count} mensajes)")
+        else:
+            out.field("Hora más activa", "No disponible")
+        if patterns.get('most_active_day'):
+            day, count = patterns['most_active_day']
+            out.field("Día más activo", f"{day} ({count} mensajes)")
+        if patterns.get('most_active_month'):
+            month, count = patterns['most_active_month']
+            out.field("Mes más activo", f"{month} ({count} mensajes)")
+        out.heading("ESTADÍSTICAS DE TEXTO")
+        out.field("Longitud promedio", f"{patterns.get('avg_message_length', 0):.1f} caracteres")
+        out.field("Longitud máxima", f"{patterns.get('max_message_length', 0)} caracteres")
+        out.field("Longitud mínima", f"{patterns.get('min_message_length', 0)} caracteres")
+        out.heading("TIPOS DE MEDIOS ENCONTRADOS")
+        for media_type, count in patterns.get('media_frequency', {}).items():
+            out.item(f"{media_type}: {count}")
+        out.heading("PALABRAS MÁS USADAS (Top 10)")
+        for word, count in patterns.get('most_common_words', [])[:10]:
+            out.item(f"'{word}': {count} veces")
+
+    def _render_cross_platform(self, out, data):
+        platforms = data.get('cross_platform_presence')
+        if not platforms:
+            return
+        out.heading("PRESENCIA EN OTRAS PLATAFORMAS")
+        found_count = 0
+        for platform, info in platforms.items():
+            if info.get('exists'):
+                found_count += 1
+                out.item(f"{platform.capitalize()}: ✅ ENCONTRADO ({info['url']})")
+            else:
+                out.item(f"{platform.capitalize()}: ❌ NO ENCONTRADO")
+        out.field("Total plataformas encontradas", f"{found_count}/{len(platforms)}")
+
+    def _render_sentiment(self, out, data):
+        sentiment = data.get('sentiment_analysis')
+        if not sentiment:
+            return
+        out.heading("ANÁLISIS DE SENTIMIENTO")
+        out.field("Positivo", f"{sentiment.get('positive_percentage', 0):.1f}% ({sentiment.get('positive_count', 0)} mensajes)")
+        out.field("Negativo", f"{sentiment.get('negative_percentage', 0):.1f}% ({sentiment.get('negative_count', 0)} mensajes)")
+        out.field("Neutral", f"{sentiment.get('neutral_percentage', 0):.1f}% ({sentiment.get('neutral_count', 0)} mensajes)")
+        out.field("Total mensajes analizados", sentiment.get('total_messages', 0))
+        if 'average_score' in sentiment:
+            out.field("Puntuación media (-1 a 1)", sentiment['average_score'])
+        for point in sentiment.get('curve', [])[-10:]:
+            out.item(f"{point['period']}: {point['average']:+.2f} ({point['messages']} mensajes)")
+
+    def _render_geolocation(self, out, data):
+        geo = data.get('geolocation_analysis')
+        out.heading("ANÁLISIS GEOGRÁFICO")
+        if geo and geo.get('mentioned_locations'):
+            out.field("Ubicaciones mencionadas", ', '.join(geo['mentioned_locations'][:10]))
+            out.field("Total menciones", geo['total_mentions'])
+            out.field("Ubicaciones únicas", geo['unique_locations'])
+            for place in geo.get('places', [])[:5]:
+                out.item(f"{place['name']} ({place['country']}) {place['lat']:.4f}, {place['lon']:.4f} - "
+                         f"{place['mentions']} menciones")
+        if geo and geo.get('coordinates'):
+            out.field("Mensajes con ubicación", len(geo['coordinates']))
+            for point in geo['coordinates'][:5]:
+                out.item(f"{point['date']}: {point['lat']:.5f}, {point['lon']:.5f}" + (f" - {point['venue']}" if point['venue'] else ''))
+        if geo and geo.get('estimated_location'):
+            location = geo['estimated_location']
+            out.field("Ubicación estimada", f"{location['lat']}, {location['lon']} ({location['source']})")
+        if not geo or not (geo.get('mentioned_locations') or geo.get('coordinates')):
+            out.line("No se encontraron menciones de ubicaciones en los mensajes analizados.")
+
+    def _render_timeline(self, out, data):
+        timeline = data.get('activity_timeline')
+        if not timeline or not timeline.get('events'):
+            return
+        out.heading("LÍNEA DE TIEMPO RECIENTE (Últimos 10 eventos)")
+        for event in self.resolve_messages(data, timeline['events'][:10], timeline):
+            text = f"{event['date']}: message"
+            if event.get('text'):
+                text += f" - {event['text'][:100] + '...' if len(event['text']) > 100 else event['text']}"
+            out.item(text)
+
+    def _render_contact_network(self, out, data):
+        network = data.get('contact_network')
+        if not network or not network.get('common_groups'):
+            return
+        out.heading("RED DE CONTACTOS")
+        out.field("Grupos en común", len(network['common_groups']))
+        for group in network['common_groups'][:5]:
+            out.item(f"{group['name']} ({group['type']}) - {group['participants_count']} miembros")
+
+    def _render_phones(self, out, data):
+        phones = data.get('extracted_phones')
+        if not phones:
+            return
+        out.heading(f"NÚMEROS DE TELÉFONO ENCONTRADOS ({len(phones)})")
+        for phone in phones[:5]:
+            out.item(f"{phone['phone']} (Contexto: {phone['context']})")
+        if len(phones) > 5:
+            out.line(f"... y {len(phones) - 5} más")
+
+    def _render_writing_style(self, out, data):
+        style = data.get('writing_style_analysis')
+        if not style:
+            return
+        punctuation = style.get('punctuation_usage', {})
+        out.heading("ANÁLISIS DE ESTILO DE ESCRITURA")
+        out.field("Longitud promedio de mensajes", f"{style.get('avg_message_length', 0):.1f} caracteres")
+        out.field("Mensajes analizados", style.get('writing_style_metrics', {}).get('total_messages_analyzed', 0))
+        out.field("Puntos", punctuation.get('periods', 0))
+        out.field("Comas", punctuation.get('commas', 0))
+        out.field("Exclamaciones", punctuation.get('exclamations', 0))
+        out.field("Preguntas", punctuation.get('questions', 0))
+        for account in style.get('similar_accounts', []):
+            out.item(f"Estilo similar: @{account['target']} ({account['target_id']}) - "
+                     f"similitud {account['similarity']:.3f}, {account['messages']} mensajes")
+
+    def _render_sections_status(self, out, data):
+        issues = {name: state for name, state in (data.get('sections_status') or {}).items() if state['status'] != 'ok'}
+        if not issues:
+            return
+        out.heading("SECCIONES INCOMPLETAS")
+        for name, state in issues.items():
+            out.item(f"{name}: {state['status']} ({state['error']}) en {state['duration']:.1f}s")
+
+    def _render_messages(self, out, data, max_messages=20):
+        if not data.get('full_messages'):
+            return
+        refs = data['full_messages']
+        out.heading("DETALLE COMPLETO DE MENSAJES")
+        out.field("Total de mensajes analizados", len(refs))
+        out.heading(f"ÚLTIMOS {max_messages} MENSAJES" if max_messages else "TODOS LOS MENSAJES")
+        for i, msg in enumerate(self.resolve_messages(data, refs[:max_messages] if max_messages else refs), 1):
+            out.entry(f"{i}. 📅 {msg['date']}")
+            if msg.get('text'):
+                out.subitem(f"💬 {msg['text'][:150] + '...' if len(msg['text']) > 150 else msg['text']}")
+            if msg.get('media_type', 'text') != 'text':
+                out.subitem(f"📎 {msg['media_type']}")
+            if msg.get('urls'):
+                out.subitem(f"🔗 {len(msg['urls'])} enlace(s)")
+            out.separator()
+
+    def _render_vocabulary(self, out, data):
+        word_data = data.get('word_analysis')
+        if not word_data:
+            return
+        out.heading("ANÁLISIS DE VOCABULARIO")
+        out.field("Palabras únicas utilizadas", word_data.get('total_unique_words', 0))
+        out.heading("PALABRAS MÁS FRECUENTES (Top 25)")
+        for word, count in word_data.get('most_common_words', [])[:25]:
+            out.item(f"'{word}': {count} veces")
+
+    def _render_categories(self, out, data):
+        categories = data.get('message_categories')
+        if not categories:
+            return
+        stats = categories.get('stats', {})
+        out.heading("CATEGORÍAS DE MENSAJES")
+        out.field("📝 Solo texto", stats.get('text_only_count', 0))
+        out.field("🔗 Con enlaces", stats.get('with_links_count', 0))
+        out.field("📎 Con medios", stats.get('with_media_count', 0))
+        out.field("❓ Preguntas", stats.get('questions_count', 0))
+        out.field("❗ Exclamaciones", stats.get('exclamations_count', 0))
+        out.field("📏 Mensajes largos (>200 chars)", stats.get('long_messages_count', 0))
+        out.field("🔤 Mensajes cortos (<50 chars)", stats.get('short_messages_count', 0))
+
+    def _render_topics(self, out, data):
+        topics = data.get('conversation_topics')
+        if not topics:
+            return
+        out.heading("TEMAS DE CONVERSACIÓN")
+        out.field("Temas principales identificados", ', '.join(topics.get('most_common_topics', [])))
+        out.heading("FRECUENCIA DE TEMAS")
+        for topic, count in topics.get('topic_counts', {}).items():
+            if count > 0:
+                out.item(f"{topic}: {count} mensajes")
+
+    def save_results(self, data, filename=None):
+        """Guardar resultados en JSON"""
+        if not filename:
+            username = data['user_info'].get('username', 'unknown')
+            user_id = data['user_info'].get('id', 'unknown')
+            filename = f"osint_results_{username}_{user_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        logger.info(f"Resultados guardados en: {filename}")
+        return filename
+
+    async def safe_search(self, username, max_retries=3):
+        """Búsqueda con manejo de errores y reintentos"""
+        for attempt in range(max_retries):
+            try:
+                return await self.get_user_info(username)
+            except Exception as e:
+                logger.warning(f"Intento {attempt + 1} fallido: {e}")
+                if attempt < max_retries - 1:
+                    await asyncio.sleep(2 ** attempt)
+        return None
+
+    async def recover_specific_photos(self, username, photo_limit=100):
+        """Función específica para recuperar fotos antiguas"""
+        print(f"🕵️ Iniciando recuperación de fotos para: {username}")
+        print("⚠️ Esto puede tomar tiempo dependiendo de la cantidad de mensajes...")
+        photos = await self.get_all_old_photos(username, limit=photo_limit)
+        if photos:
+            print(f"✅ Se recuperaron {len(photos)} fotos")
+            for photo in photos[:5]:
+                print(f"   📅 {photo['date']} - Guardada en: {photo['saved_at']}")
+            if len(photos) > 5:
+                print(f"   ... y {len(photos) - 5} más")
+        else:
+            print("❌ No se encontraron fotos para recuperar")
+        return photos
+
+    def cleanup_temp_files(self):
+        """Limpiar archivos temporales"""
+        import glob
+        temp_files = glob.glob("temp_analysis_*") + glob.glob("deleted_photos/*") + glob.glob("recovered_photos_*/*")
+        for file in temp_files:
+            try:
+                os.remove(file)
+            except:
+                pass
+
+
+# --- Función principal ---
+def ask_report_export(osint_tool, data, kind):
+    """Ofrecer exportar el reporte renderizado a txt/md/html"""
+    formats = {'txt': 'text', 'md': 'markdown', 'html': 'html'}
+    choice = input("\n¿Exportar reporte? (txt/md/html, Enter para omitir): ").strip().lower()
+    if choice in formats:
+        filename = osint_tool.save_report(data, kind=kind, fmt=formats[choice])
+        print(f"📄 Reporte exportado en: {filename}")
+
+
+async def report_from_export(osint_tool, path, sender=None):
+    """Reporte sin conexión de una exportación de Telegram Desktop: importar, guardar y mostrar"""
+    if not os.path.isfile(path):
+        print("❌ No existe el fichero indicado")
+        return
+    print(f"📦 Leyendo {path} sin conexión...")
+    offline_report = await osint_tool.import_export(path, sender=sender)
+    if not offline_report:
+        print("❌ No se pudo importar la exportación")
+        return
+    source = offline_report['export_source']
+    # El objetivo (export:chat:participante) lleva ":" y, con un nombre visible, lo que ponga el usuario
+    name = re.sub(r'[^\w-]', '_', source['target'])
+    filename = osint_tool.save_results(offline_report, f"osint_{name}_{datetime.now().strftime('%Y%m%d%H%M%S')}.json")
+    print(osint_tool.generate_advanced_report(offline_report))
+    print(f"\n✅ Reporte sin conexión de {source['chat_name']} guardado en: {filename}")
+    print(f"• Mensajes en la exportación: {source['total_messages']} (analizados los {source['window']} más recientes)")
+    print(f"• Teléfonos encontrados: {len(offline_report.get('extracted_phones') or [])}")
+    for kind, count in source['identifiers'].items():
+        print(f"• Identificadores indexados ({kind}): {count}")
+    ask_report_export(osint_tool, offline_report, 'advanced')
+
+
+async def main(export_path=None, export_sender=None):
+    API_ID = API_CONFIG["api_id"]
+    API_HASH = API_CONFIG["api_hash"]
+    credentials = API_ID != "TU_API_ID" and API_HASH != "TU_API_HASH"
+
+    if not credentials and not export_path:
+        print("❌ ERROR: Debes configurar tus credenciales de API en config.py")
+        print("📍 Obtén tus credenciales en: https://my.telegram.org/")
+        return
+
+    # Sin conexión el cliente nunca llega a conectarse: no hacen falta credenciales ni sesión
+    osint_tool = TelegramOSINT(API_ID if credentials else 0, API_HASH)
+    try:
+        if export_path:
+            await report_from_export(osint_tool, export_path, export_sender)
+            return
+        await osint_tool.start_client()
+        print("""
+  __  __  ___ _   _ _     _____ ____                      _     
+ |  \/  | | | | |   | ____/ ___|  ___  __ _ _ __ ___| |__  
+ | |\/| | | | | |   |  _| \___ \ / _ \/ _` | '__/ __| '_ \ 
+ | |  | | |_| | |___| |___ ___) |  __/ (_| | | | (__| | | |
+ |_|  |_|\___/|_____|_____|____/ \___|\__,_|_|  \___|_| |_|
+🚀 MULESEARCH - TELEGRAM OSINT TOOL AVANZADO v3.0
+""")
+        print("=" * 70)
+        print("💡 FORMATOS VÁLIDOS: @usuario, +34123456789, nombre apellido")
+        print("=" * 70)
+        target = input("Ingresa el username, número de teléfono o nombre: ").strip()
+        print("\n🎯 SELECCIONA EL TIPO DE ANÁLISIS:")
+        print("1. 🔍 Búsqueda rápida (información básica)")
+        print("2. 📊 Búsqueda completa (con historial y estadísticas)")
+        print("3. 🕵️ Recuperación de fotos antiguas")
+        print("4. 🚀 ANÁLISIS OSINT COMPLETO (NUEVO)")
+        print("5. 📈 Análisis de patrones de comportamiento")
+        print("6. 🌐 Búsqueda cross-platform")
+        print("7. 📍 Análisis geográfico")
+        print("8. 😊 Análisis de sentimiento")
+        print("9. 👥 Buscar por nombre en grupos")
+        print("10. 💬 ANÁLISIS DETALLADO DE MENSAJES (NUEVO)")
+        print("11. 🔤 VOCABULARIO Y PALABRAS (NUEVO)")
+        print("12. 🎯 TEMAS DE CONVERSACIÓN (NUEVO)")
+        print("13. 📧 EXTRAER EMAILS DEL USUARIO (NUEVO)")
+        print("14. 📞 EXTRAER TELÉFONOS (NUEVO)")
+        print("15. 🕸️ MAPA DE CONEXIONES (NUEVO)")
+        print("16. ✍️ ANÁLISIS DE ESCRITURA (NUEVO)")
+        print("17. 🚀 REPORTE OSINT PREMIUM (NUEVO)")
+        print("18. 🔎 BUSCAR EN MENSAJES INDEXADOS (NUEVO)")
+        print("19. 🔗 CORRELACIÓN DE IDENTIFICADORES (NUEVO)")
+        print("20. 🧹 BARRIDO DE EMAILS/IDENTIFICADORES EN TODOS LOS CHATS (NUEVO)")
+        print("21. 📈 TENDENCIAS DE ACTIVIDAD DE GRUPO/CANAL (NUEVO)")
+        print("22. 🗃️ ÍNDICE DE MEDIOS SIN DESCARGAS (NUEVO)")
+        print("23. 🔁 CAMBIOS DESDE EL ÚLTIMO REPORTE (NUEVO)")
+        print("24. 👁️ LISTA DE VIGILANCIA CON REFRESCO ADAPTATIVO (NUEVO)")
+        print("25. 🧮 ANÁLISIS INCREMENTAL SOLO CON MENSAJES NUEVOS (NUEVO)")
+        print("26. 📦 REPORTE SIN CONEXIÓN DESDE EXPORTACIÓN DE TELEGRAM DESKTOP (NUEVO; sin sesión: --export result.json)")
+        option = input("\nOpción (1-26): ").strip()
+
+        if option == "1":
+            print("🔍 Buscando información básica...")
+            results = await osint_tool.get_user_info(target)
+            if results:
+                print(f"✅ Usuario encontrado: {results['first_name']} {results['last_name']}")
+                print(f"📱 Teléfono: {results['phone']}")
+                print(f"🌐 Username: @{results['username']}")
+                print(f"🆔 ID: {results['id']}")
+                print(f"📝 Biografía: {results['bio']}")
+            else:
+                print("❌ No se pudo obtener información del usuario")
+                print("\n💡 SUGERENCIAS:")
+                print("   - Usa el formato @usuario (ej: @usuario)")
+                print("   - Para números, incluye código de país (ej: +34123456789)")
+                print("   - Verifica que el usuario existe y no es privado")
+
+        elif option == "2":
+            print("🔍 Realizando búsqueda completa...")
+            results = await osint_tool.get_full_user_info(target)
+            if results:
+                filename = osint_tool.save_results(results)
+                report = osint_tool.generate_report(results)
+                print(report)
+                print(f"\n✅ Información completa guardada en: {filename}")
+            else:
+                print("❌ No se pudo obtener información del usuario")
+
+        elif option == "3":
+            print("🕵️ Iniciando recuperación de fotos...")
+            try:
+                size = input("Tamaño de las fotos de perfil (thumb = miniaturas para triaje, full = completas; Enter = thumb): ").strip()
+                history = await osint_tool.get_profile_photo_history(target, size='full' if size == 'full' else 'thumb')
+                if history:
+                    print(f"   Fotos de perfil: {len(history['photos'])} ({history['new']} nuevas)")
+                    for photo in history['photos'][:5]:
+                        print(f"   📅 {photo['date']} - {photo['photo_id']} - {photo['path']}")
+                    if history['removed']:
+                        print(f"   🗑️ Fotos retiradas desde el último análisis: {', '.join(map(str, history['removed']))}")
+                else:
+                    print("   Fotos de perfil: 0")
+                public_photos = await osint_tool.search_public_photos(target)
+                print(f"   Fotos públicas: {len(public_photos) if public_photos else 0}")
+            except Exception as e:
+                print(f"❌ Error en depuración: {e}")
+
+        elif option == "4":
+            print("🚀 Iniciando análisis OSINT completo...")
+            results = await osint_tool.get_complete_osint_report(target)
+            if not results and ' ' in target and not target.startswith('@'):
+                print("🔍 Intentando con formato @username...")
+                suggested_username = f"@{target.replace(' ', '').lower()}"
+                results = await osint_tool.get_complete_osint_report(suggested_username)
+            if results:
+                filename = osint_tool.save_results(results)
+                report = osint_tool.generate_advanced_report(results)
+                print(report)
+                print(f"\n✅ Reporte completo guardado en: {filename}")
+                ask_report_export(osint_tool, results, 'advanced')
+            else:
+                print("❌ No se pudo obtener información del usuario")
+                print("\n💡 SUGERENCIAS:")
+                print("   - Asegúrate de que el usuario existe en Telegram")
+                print("   - Usa el formato @usuario (ej: @marysan)")
+                print("   - Si es un número, incluye el código de país")
+                print("   - Verifica que el usuario no sea privado")
+                print("   - Prueba la opción 9 para buscar por nombre en grupos")
+
+        elif option == "5":
+            print("📈 Analizando patrones de comportamiento...")
+            patterns = await osint_tool.analyze_message_patterns(target)
+            if patterns:
+                print(f"📊 Mensajes procesados: {patterns.get('total_messages_processed', 0)}")
+                print(f"📝 Mensajes con texto: {patterns.get('messages_with_text', 0)}")
+                if patterns.get('most_active_hour'):
+                    hour, count = patterns['most_active_hour']
+                    print(f"🕒 Hora más activa: {hour:02d}:00 ({count} mensajes)")
+                else:
+                    print(f"🕒 Hora más activa: No disponible")
+                print(f"📏 Longitud promedio: {patterns.get('avg_message_length', 0):.1f} caracteres")
+                print(f"🖼️ Total de medios: {patterns.get('total_media', 0)}")
+                print(f"↩️ Respuestas: {patterns.get('reply_frequency', 0)}")
+                print(f"🔄 Forwards: {patterns.get('forward_frequency', 0)}")
+                print("🔤 Palabras más usadas:")
+                for word, count in patterns.get('most_common_words', [])[:5]:
+                    print(f"   - '{word}' ({count} veces)")
+            else:
+                print("❌ No se pudieron analizar los patrones")
+
+        elif option == "6":
+            print("🌐 Buscando en otras plataformas...")
+            user_info = await osint_tool.get_user_info(target)
+            username = user_info['username'] if user_info and user_info.get('username') != 'N/A' else (target if not target.isdigit() and ' ' not in target else None)
+            if username:
+                platforms = await osint_tool.search_username_across_platforms(username)
+                print("\n📊 RESULTADOS:")
+                print("-" * 50)
+                found_count = 0
+                for platform, data in platforms.items():
+                    status = "✅ ENCONTRADO" if data.get('exists') else "❌ NO ENCONTRADO"
+                    if data.get('exists'):
+                        found_count += 1
+                    print(f"   {platform.upper():<12} {status}")
+                    if data.get('exists'):
+                        print(f"   📎 URL: {data['url']}")
+                    print()
+                print(f"📈 Total encontrados: {found_count}/{len(platforms)} plataformas")
+            else:
+                print("❌ No se pudo obtener un username válido")
+
+        elif option == "7":
+            print("📍 Analizando menciones geográficas...")
+            locations = await osint_tool.geolocation_analysis(target)
+            if locations and (locations['mentioned_locations'] or locations['coordinates']):
+                print(f"📍 Ubicaciones mencionadas: {', '.join(locations['mentioned_locations'][:10])}")
+                print(f"📊 Total de menciones: {locations['total_mentions']}")
+                print(f"🏙️ Ubicaciones únicas: {locations['unique_locations']}")
+                for place in locations['places'][:5]:
+                    print(f"   • {place['name']} ({place['country']}): {place['lat']:.4f}, {place['lon']:.4f} "
+                          f"- {place['mentions']} menciones")
+                if locations['coordinates']:
+                    print(f"🛰️ Mensajes con coordenadas: {len(locations['coordinates'])}")
+                if locations['estimated_location']:
+                    estimated = locations['estimated_location']
+                    print(f"🎯 Ubicación estimada: {estimated['lat']}, {estimated['lon']} ({estimated['source']})")
+            else:
+                print("❌ No se encontraron menciones geográficas")
+
+        elif option == "8":
+            print("😊 Analizando sentimiento...")
+            sentiment = await osint_tool.sentiment_analysis(target)
+            if sentiment:
+                print(f"😊 Positivo: {sentiment.get('positive_percentage', 0):.1f}%")
+                print(f"😞 Negativo: {sentiment.get('negative_percentage', 0):.1f}%")
+                print(f"😐 Neutral: {sentiment.get('neutral_percentage', 0):.1f}%")
+                print(f"📊 Total mensajes analizados: {sentiment.get('total_messages', 0)}")
+                if 'average_score' in sentiment:
+                    print(f"⚖️ Puntuación media: {sentiment['average_score']:+.2f}")
+                    print("\n📈 EVOLUCIÓN (últimos 10 días con mensajes):")
+                    for point in sentiment['curve'][-10:]:
+                        print(f"   {point['period']}: {point['average']:+.2f} ({point['messages']} mensajes)")
+            else:
+                print("❌ No se pudo realizar el análisis de sentimiento")
+
+        elif option == "9":
+            print("👥 Buscando por nombre en grupos...")
+            if ' ' in target:
+                users_found = await osint_tool.search_user_by_name(target)
+                if users_found:
+                    print(f"\n✅ Se encontraron {len(users_found)} usuarios:")
+                    for i, user in enumerate(users_found, 1):
+                        print(f"\n{i}. 👤 {user['first_name']} {user['last_name']}")
+                        print(f"   🌐 Username: @{user['username']}")
+                        print(f"   🆔 ID: {user['id']}")
+                        print(f"   📍 Encontrado en: {user['found_in']} ({user['chat_type']})")
+                    choice = input("\n🔢 ¿Quieres analizar alguno? Ingresa el número (o Enter para salir): ").strip()
+                    if choice and choice.isdigit() and 1 <= int(choice) <= len(users_found):
+                        user = users_found[int(choice) - 1]
+                        if user['username'] != 'N/A':
+                            print(f"\n🚀 Analizando @{user['username']}...")
+                            results = await osint_tool.get_complete_osint_report(user['username'])
+                            if results:
+                                filename = osint_tool.save_results(results)
+                                report = osint_tool.generate_advanced_report(results)
+                                print(report)
+                                print(f"\n✅ Reporte completo guardado en: {filename}")
+                        else:
+                            print("❌ Este usuario no tiene username público")
+                else:
+                    print("❌ No se encontraron usuarios con ese nombre")
+            else:
+                print("❌ Ingresa un nombre completo (con apellido) para buscar")
+
+        elif option == "10":
+            print("💬 Obteniendo análisis detallado de mensajes...")
+            enhanced_report = await osint_tool.get_enhanced_osint_report(target)
+            if enhanced_report:
+                filename = osint_tool.save_results(enhanced_report)
+                detailed_report = osint_tool.generate_detailed_message_report(enhanced_report)
+                print(detailed_report)
+                print(f"\n✅ Reporte detallado guardado en: {filename}")
+                ask_report_export(osint_tool, enhanced_report, 'detailed')
+                if enhanced_report.get('full_messages'):
+                    view_more = input("\n¿Ver más mensajes? (s/n): ").strip().lower()
+                    if view_more == 's':
+                        messages = osint_tool.resolve_messages(enhanced_report, enhanced_report['full_messages'])
+                        print(f"\n📨 MOSTRANDO MENSAJES ({len(messages)} total):")
+                        for i, msg in enumerate(messages, 1):
+                            print(f"\n{i}. 📅 {msg['date']}")
+                            if msg.get('text'):
+                                print(f"   💬 {msg['text']}")
+                            if msg.get('media_type') and msg['media_type'] != 'text':
+                                print(f"   📎 {msg['media_type']}")
+                            print("   " + "="*60)
+                            if i % 10 == 0 and i < len(messages):
+                                cont = input("\n¿Continuar? (s/n): ").strip().lower()
+                                if cont != 's':
+                                    break
+            else:
+                print("❌ No se pudo obtener información del usuario")
+
+        elif option == "11":
+            print("🔤 Analizando vocabulario y palabras utilizadas...")
+            word_analysis = await osint_tool.get_all_words_used(target, limit=300)
+            if word_analysis:
+                print(f"\n📊 ESTADÍSTICAS DE VOCABULARIO:")
+                print(f"Palabras únicas utilizadas: {word_analysis.get('total_unique_words', 0)}")
+                print(f"\n📈 PALABRAS MÁS USADAS (Top 30):")
+                for i, (word, count) in enumerate(word_analysis.get('most_common_words', [])[:30], 1):
+                    print(f"{i:2d}. '{word}': {count} veces")
+                total_words = sum(word_analysis.get('word_frequency', {}).values())
+                if total_words > 0:
+                    diversity = (word_analysis.get('total_unique_words', 0) / total_words) * 100
+                    print(f"\n🎯 DIVERSIDAD LÉXICA: {diversity:.1f}% (palabras únicas/totales)")
+            else:
+                print("❌ No se pudo analizar el vocabulario")
+
+        elif option == "12":
+            print("🎯 Identificando temas de conversación...")
+            topics_analysis = await osint_tool.get_conversation_topics(target, limit=300)
+            if topics_analysis:
+                print(f"\n🏷️ TEMAS IDENTIFICADOS:")
+                for topic, count in topics_analysis.get('topic_counts', {}).items():
+                    if count > 0:
+                        print(f"   📌 {topic}: {count} mensajes")
+                common_topics = topics_analysis.get('most_common_topics', [])
+                if common_topics:
+                    print(f"\n🎯 TEMAS PRINCIPALES: {', '.join(common_topics)}")
+                    view_examples = input("\n¿Ver ejemplos de mensajes por tema? (s/n): ").strip().lower()
+                    if view_examples == 's':
+                        topic_messages = topics_analysis.get('topic_messages', {})
+                        for topic in common_topics[:3]:
+                            messages = osint_tool.resolve_messages(topics_analysis, topic_messages.get(topic, [])[:3])
+                            if messages:
+                                print(f"\n📝 EJEMPLOS DE '{topic.upper()}':")
+                                for i, msg in enumerate(messages, 1):
+                                    text = msg['text'][:200] + '...' if len(msg['text']) > 200 else msg['text']
+                                    print(f"   {i}. {msg['date']}: {text}")
+            else:
+                print("❌ No se pudieron identificar temas")
+
+        elif option == "13":
+            print(f"📧 Extrayendo emails del usuario: {target}")
+            try:
+                input_info = osint_tool.validate_telegram_input(target)
+                if input_info['type'] == 'name':
+                    users_found = await osint_tool.search_user_by_name(target)
+                    if not users_found:
+                        print("❌ No se encontró ningún usuario con ese nombre.")
+                    elif len(users_found) == 1 and users_found[0]['username'] != 'N/A':
+                        entity = await osint_tool.client.get_entity(users_found[0]['username'])
+                        all_emails = await osint_tool.extract_emails_from_entity(entity, limit=2000)
+                    else:
+                        entity = await osint_tool.client.get_entity(target)
+                        all_emails = await osint_tool.extract_emails_from_entity(entity, limit=2000)
+                else:
+                    entity = await osint_tool.client.get_entity(target)
+                    all_emails = await osint_tool.extract_emails_from_entity(entity, limit=2000)
+
+                if all_emails:
+                    seen = set()
+                    unique_emails = []
+                    for item in all_emails:
+                        if item['email'] not in seen:
+                            unique_emails.append(item)
+                            seen.add(item['email'])
+                    await osint_tool.save_emails_to_csv(unique_emails, filename=f'emails_{target.replace("@", "").replace(" ", "_")}.csv')
+                    print(f"\n✅ Emails encontrados en {target}:")
+                    for item in unique_emails[:10]:
+                        print(f"📧 {item['email']}")
+                    if len(unique_emails) > 10:
+                        print(f"... y {len(unique_emails) - 10} más")
+                else:
+                    print("❌ No se encontraron emails en los mensajes de este usuario.")
+            except Exception as e:
+                logger.error(f"Error extrayendo emails: {e}")
+                print(f"❌ Error: {e}")
+
+        elif option == "14":
+            print("📞 Extrayendo números de teléfono mencionados...")
+            phones = await osint_tool.extract_phone_numbers(target, limit=300)
+            if phones:
+                print(f"\n✅ Números de teléfono encontrados ({len(phones)}):")
+                for i, phone in enumerate(phones[:10], 1):
+                    print(f"{i}. 📞 {phone['phone']}")
+                    print(f"   📅 {phone['date']}")
+                    print(f"   💬 Contexto: {phone['context']}")
+                    print()
+                if len(phones) > 10:
+                    print(f"... y {len(phones) - 10} más")
+                
+                save = input("¿Guardar resultados? (s/n): ").strip().lower()
+                if save == 's':
+                    filename = f"phones_{target.replace('@', '').replace(' ', '_')}.json"
+                    with open(filename, 'w', encoding='utf-8') as f:
+                        json.dump(phones, f, indent=2, ensure_ascii=False)
+                    print(f"💾 Resultados guardados en: {filename}")
+            else:
+                print("❌ No se encontraron números de teléfono")
+
+        elif option == "15":
+            print("🕸️ Creando mapa de conexiones...")
+            connections = await osint_tool.get_user_connections_map(target)
+            if connections and connections.get('common_groups'):
+                print(f"\n✅ Mapa de conexiones para {target}:")
+                print(f"Grupos en común: {len(connections['common_groups'])}")
+                
+                for i, group in enumerate(connections['common_groups'][:5], 1):
+                    print(f"\n{i}. 🏷️ {group['name']} ({group['type']})")
+                    print(f"   👥 {group['participants_count']} miembros")
+                    print(f"   🤝 {len(group['common_contacts'])} contactos en común")
+                    
+                    if group['common_contacts']:
+                        print("   Contactos destacados:")
+                        for contact in group['common_contacts'][:3]:
+                            name = f"{contact['first_name']} {contact['last_name']}".strip()
+                            print(f"     • {name} (@{contact['username']})")
+
+                graph_info = connections.get('interaction_network', {})
+                print(f"\n🕸️ Grafo: {graph_info.get('nodes', 0)} nodos, {graph_info.get('edges', 0)} aristas, "
+                      f"{graph_info.get('components', 0)} componentes")
+                if connections.get('frequent_contacts'):
+                    print("🤝 Más grupos compartidos:")
+                    for contact in connections['frequent_contacts'][:5]:
+                        print(f"   • {contact['label']}: {contact['shared_groups']} grupos")
+                export = input("\n¿Exportar grafo? (graphml/gexf, Enter para omitir): ").strip().lower()
+                graph = osint_tool.social_graphs.get(connections['target_id'])
+                if export in ('graphml', 'gexf') and graph:
+                    filename = graph.export(f"graph_{target.replace('@', '').replace(' ', '_')}.{export}", export)
+                    print(f"💾 Grafo exportado en: {filename}")
+            else:
+                print("❌ No se pudieron obtener las conexiones")
+
+        elif option == "16":
+            print("✍️ Analizando estilo de escritura...")
+            style_analysis = await osint_tool.analyze_message_style(target, limit=300)
+            if style_analysis:
+                print(f"\n📊 ANÁLISIS DE ESTILO DE ESCRITURA:")
+                print(f"Longitud promedio: {style_analysis.get('avg_message_length', 0):.1f} caracteres")
+                print(f"Mensajes analizados: {style_analysis.get('writing_style_metrics', {}).get('total_messages_analyzed', 0)}")
+                
+                punctuation = style_analysis.get('punctuation_usage', {})
+                print(f"\n📝 USO DE PUNTUACIÓN:")
+                print(f"  • Puntos: {punctuation.get('periods', 0)}")
+                print(f"  • Comas: {punctuation.get('commas', 0)}")
+                print(f"  • Exclamaciones: {punctuation.get('exclamations', 0)}")
+                print(f"  • Preguntas: {punctuation.get('questions', 0)}")
+                
+                emoticons = style_analysis.get('emoticon_usage', {})
+                if emoticons:
+                    print(f"\n😊 EMOTICONOS MÁS USADOS:")
+                    for emoticon, count in Counter(emoticons).most_common(5):
+                        print(f"  • {emoticon}: {count} veces")
+                
+                capitalization = style_analysis.get('capitalization_patterns', {})
+                if capitalization.get('total_words', 0) > 0:
+                    rate = capitalization.get('capitalization_rate', 0)
+                    print(f"\n🔠 TASA DE CAPITALIZACIÓN: {rate:.1f}%")
+                
+                similar = style_analysis.get('similar_accounts', [])
+                if similar:
+                    print(f"\n🧬 CUENTAS CON ESTILO SIMILAR (posibles alts):")
+                    for account in similar:
+                        print(f"  • @{account['target']} ({account['target_id']}): similitud {account['similarity']:.3f}")
+            else:
+                print("❌ No se pudo analizar el estilo de escritura")
+
+        elif option == "17":
+            print("🚀 Generando reporte OSINT PREMIUM...")
+            premium_report = await osint_tool.get_premium_osint_report(target)
+            if premium_report:
+                filename = osint_tool.save_results(premium_report)
+                report = osint_tool.generate_advanced_report(premium_report)
+                print(report)
+                print(f"\n✅ Reporte premium guardado en: {filename}")
+                ask_report_export(osint_tool, premium_report, 'advanced')
+                
+                # Mostrar estadísticas adicionales
+                print(f"\n📈 ESTADÍSTICAS PREMIUM:")
+                print(f"• Emails extraídos: {len(premium_report.get('extracted_emails', []))}")
+                print(f"• Teléfonos encontrados: {len(premium_report.get('extracted_phones', []))}")
+                print(f"• Grupos analizados: {len(premium_report.get('public_groups', []))}")
+                print(f"• Conexiones mapeadas: {len(premium_report.get('connections_map', {}).get('common_groups', []))}")
+            else:
+                print("❌ No se pudo generar el reporte premium")
+
+        elif option == "18":
+            print("🔎 Búsqueda en el índice local de mensajes")
+            print('💡 Sintaxis: palabra, "frase exacta", prefijo*, a AND b, a OR b, a NOT b')
+            query = input("Consulta: ").strip()
+            only_target = input(f"¿Filtrar solo por {target}? (s/n): ").strip().lower() == 's'
+            date_from = input("Desde (AAAA-MM-DD, Enter para omitir): ").strip() or None
+            date_to = input("Hasta (AAAA-MM-DD, Enter para omitir): ").strip() or None
+            media_type = input("Tipo de medio (text/photo/document/..., Enter para omitir): ").strip() or None
+            start = time.perf_counter()
+            hits = osint_tool.search_messages(query, target=target if only_target else None,
+                                              date_from=date_from, date_to=date_to, media_type=media_type)
+            elapsed = (time.perf_counter() - start) * 1000
+            if hits:
+                print(f"\n✅ {len(hits)} resultados en {elapsed:.1f} ms:")
+                for i, hit in enumerate(hits, 1):
+                    print(f"{i}. @{hit['target']} · {hit['date']} · #{hit['message_id']} ({hit['media_type']})")
+                    print(f"   💬 {hit['snippet']}")
+            else:
+                print("❌ Sin resultados en el índice local")
+
+        elif option == "19":
+            print("🔗 Correlación de identificadores entre objetivos")
+            identifier = input("Identificador (email, teléfono, dominio, @mención, wallet; Enter = correlacionar el objetivo): ").strip()
+            if identifier:
+                result = osint_tool.find_identifier(identifier)
+                if result['kind'] is None:
+                    print(f"❌ '{identifier}' no parece un email, teléfono, dominio, @mención ni wallet")
+                elif result['targets']:
+                    print(f"\n✅ {result['kind']} '{result['value']}' aparece en {len(result['targets'])} objetivo(s):")
+                    for item in result['targets']:
+                        print(f"   • @{item['target']} ({item['target_id']}): {item['occurrences']} mensaje(s), "
+                              f"{item['first_seen']} → {item['last_seen']}")
+                else:
+                    print(f"❌ '{result['value']}' no aparece en el índice")
+            else:
+                shared = osint_tool.correlate_target(target)
+                if shared:
+                    print(f"\n✅ Identificadores de {target} compartidos con otros objetivos ({len(shared)}):")
+                    for item in shared:
+                        others = ', '.join(f"@{other['target']}" for other in item['shared_with'])
+                        print(f"   • {item['kind']}: {item['value']} → {others}")
+                else:
+                    print(f"❌ {target} no comparte identificadores indexados con otros objetivos")
+
+        elif option == "20":
+            print("🧹 Barrido de identificadores en los diálogos de la cuenta")
+            kinds = input("Tipos (email, phone, domain, mention, wallet; Enter = email): ").strip()
+            kinds = tuple(kind.strip() for kind in kinds.split(',') if kind.strip()) or ('email',)
+            dialog_filter = input("Filtro de diálogos (users, groups, channels o parte del nombre; Enter = todos): ").strip()
+            limit = input("Mensajes por diálogo (Enter = 2000): ").strip()
+            stats = await osint_tool.sweep_identifiers(
+                kinds=kinds,
+                dialog_filter=dialog_filter or None,
+                limit_per_dialog=int(limit) if limit.isdigit() else 2000
+            )
+            print(f"\n✅ {stats['hits']} identificadores únicos en {stats['scanned_dialogs']} diálogos "
+                  f"({stats['messages']} mensajes, {stats['elapsed']}s, ~{stats['messages_per_hour']} mensajes/hora)")
+            print(f"💾 Resultados en: {stats['output']}")
+
+        elif option == "21":
+            print(f"📈 Tendencias de actividad de: {target}")
+            backfill = input("Mensajes antiguos a añadir al histórico (Enter = solo nuevos): ").strip()
+            rollup = await osint_tool.update_rollups(target, limit=1000, backfill=int(backfill) if backfill.isdigit() else 0)
+            if rollup:
+                granularity = input("Agrupar por (day, week, month, year; Enter = month): ").strip() or 'month'
+                date_from = input("Desde (YYYY-MM-DD, Enter = todo): ").strip() or None
+                date_to = input("Hasta (YYYY-MM-DD, Enter = todo): ").strip() or None
+                curve = osint_tool.activity_curve(rollup['chat_id'], granularity, date_from, date_to)
+                if curve:
+                    peak = max(point['messages'] for point in curve)
+                    print(f"\n📊 ACTIVIDAD DE {rollup['chat']} ({rollup['added']} mensajes nuevos agregados):")
+                    for point in curve:
+                        bar = '█' * max(1, round(point['messages'] * 40 / peak))
+                        print(f"   {point['period']}: {bar} {point['messages']} msgs, {point['media']} media, "
+                              f"{point['senders']} remitentes")
+                    posters = osint_tool.top_posters_by_period(rollup['chat_id'], date_from, date_to)
+                    # sender_id 0 agrupa los mensajes sin remitente (publicaciones del propio canal)
+                    users = await osint_tool.resolve_users([poster['sender_id'] for poster in posters if poster['sender_id']])
+                    print("\n🏆 REMITENTES MÁS ACTIVOS DEL PERIODO:")
+                    for i, poster in enumerate(posters, 1):
+                        sender = f"@{users[poster['sender_id']]['username']}" if poster['sender_id'] else "(el propio canal)"
+                        print(f"   {i}. {sender} ({poster['sender_id']}): {poster['messages']} mensajes "
+                              f"en {poster['active_days']} días")
+                else:
+                    print("❌ No hay actividad agregada en ese periodo")
+            else:
+                print("❌ No se pudo actualizar la actividad del chat")
+
+        elif option == "22":
+            print(f"🗃️ Indexando medios de: {target}")
+            media = await osint_tool.index_media(target)
+            if media and media['summary']:
+                print(f"\n✅ {media['added']} elementos nuevos en el índice de {media['chat']}:")
+                for row in media['summary']:
+                    print(f"   • {row['kind']}: {row['count']} ({row['total_size'] / 1048576:.1f} MB), "
+                          f"{row['first_date']} → {row['last_date']}, {row['downloaded']} descargados")
+                kind = input("\nListar tipo (photo, video, document...; Enter = todos): ").strip() or None
+                items = osint_tool.list_media(media['chat_id'], kind=kind, limit=20)
+                for item in items:
+                    dimensions = f" {item['width']}x{item['height']}" if item['width'] else ''
+                    print(f"   {item['message_id']}: {item['date']} {item['kind']} {item['mime_type'] or ''}"
+                          f"{dimensions} {(item['size'] or 0) / 1024:.0f} KB {item['file_name'] or ''}")
+                ids = input("\nIds de mensaje a descargar (separados por comas; Enter = ninguno): ").strip()
+                if ids:
+                    paths = await osint_tool.fetch_media(target, [int(i) for i in ids.split(',') if i.strip().isdigit()])
+                    for message_id, path in paths.items():
+                        print(f"   ⬇️ {message_id}: {path}")
+            else:
+                print("❌ No se encontraron medios")
+
+        elif option == "23":
+            print(f"🔁 Buscando cambios de {target} desde el último reporte guardado...")
+            delta = await osint_tool.build_report_delta(target)
+            if delta:
+                changes = delta['changes']
+                print(f"\n📅 Reporte previo: {delta['previous_report']} ({delta['previous_timestamp']})")
+                if not delta['changed']:
+                    print("✅ Sin cambios desde el último reporte")
+                for field, change in changes['profile'].items():
+                    print(f"👤 {field}: {change['old']} → {change['new']}")
+                for username in changes['usernames']['added']:
+                    print(f"🆕 Username nuevo en el historial: @{username}")
+                for username in changes['usernames']['removed']:
+                    print(f"🗑️ Username retirado del historial: @{username}")
+                for group in changes['groups']['joined']:
+                    print(f"➕ Nuevo chat en común: {group['name']} ({group['type']})")
+                for group in changes['groups']['left']:
+                    print(f"➖ Ya no comparte: {group['name']} ({group['type']})")
+                if changes['messages']['new_count']:
+                    print(f"💬 {changes['messages']['new_count']} mensajes nuevos:")
+                    for message in changes['messages']['items'][:10]:
+                        print(f"   {message['date']} [{message['media_type']}] {message['text'][:100]}")
+                for email in changes['emails']['added']:
+                    print(f"📧 Email nuevo: {email}")
+                for phone in changes['phones']['added']:
+                    print(f"📞 Teléfono nuevo: {phone}")
+                print(f"\n✅ Cambios guardados en: {delta['saved_at']}")
+                print(f"📁 Nueva línea base: {delta['baseline']}")
+            else:
+                print("❌ No se pudo calcular el delta (¿existe un reporte previo guardado del objetivo?)")
+
+        elif option == "24":
+            print("👁️ Lista de vigilancia")
+            extra = input(f"Objetivos a añadir además de {target} (separados por comas o ruta a un .txt; Enter = solo el objetivo): ").strip()
+            if extra and os.path.exists(extra):
+                with open(extra, encoding='utf-8') as f:
+                    targets = [line.strip() for line in f if line.strip()]
+            else:
+                targets = [item.strip() for item in extra.split(',') if item.strip()]
+            osint_tool.watch_add([target] + targets)
+            minutes = input("Minutos de ejecución del planificador (Enter = 60): ").strip()
+            refreshes = await osint_tool.run_watchlist(duration=float(minutes or 60) * 60)
+            print(f"\n✅ {refreshes} refrescos realizados")
+            status = osint_tool.watch_status(limit=20)
+            if status:
+                print("\n📋 PRÓXIMOS REFRESCOS:")
+                for item in status:
+                    error = f" ⚠️ {item['last_error']}" if item['last_error'] else ''
+                    print(f"   • @{item['target']}: en {max(item['due_in'], 0) / 60:.0f} min "
+                          f"(cada {item['interval'] / 60:.0f} min, {item['messages_per_day']:.1f} msg/día){error}")
+
+        elif option == "25":
+            kinds = ', '.join(INCREMENTAL_ANALYZERS)
+            kind = input(f"Analizador ({kinds}; Enter = patterns): ").strip() or 'patterns'
+            if kind not in INCREMENTAL_ANALYZERS:
+                print("❌ Analizador no válido")
+                return
+            backfill = input("Mensajes anteriores a añadir al estado (Enter = 0): ").strip()
+            print(f"🧮 Actualizando {kind} de {target} con los mensajes nuevos...")
+            result = await osint_tool.update_analysis(kind, target, backfill=int(backfill or 0))
+            if result:
+                filename = osint_tool.save_results(
+                    result, f"osint_{kind}_{osint_tool.normalize_target(target)}_{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
+                )
+                print(f"✅ Resultado de {kind} actualizado y guardado en: {filename}")
+            else:
+                print(f"❌ No se pudo actualizar el análisis {kind}")
+
+        elif option == "26":
+            path = input("Ruta del result.json exportado (Exportar historial del chat > JSON): ").strip().strip('"')
+            sender = input("Participante a analizar (id o nombre visible; Enter = todo el chat): ").strip() or None
+            await report_from_export(osint_tool, path, sender)
+
+        else:
+            print("❌ Opción no válida")
+
+    except Exception as e:
+        logger.error(f"Error en la ejecución: {e}")
+        print(f"❌ Error: {e}")
+    finally:
+        osint_tool.cleanup_temp_files()
+        osint_tool.close_index_db()
+        print("\n🧹 Limpieza completada")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MuleSearch - Telegram OSINT")
+    parser.add_argument('--export', metavar='RESULT_JSON',
+                        help="reporte sin conexión de una exportación de Telegram Desktop (no inicia sesión)")
+    parser.add_argument('--sender', help="con --export: participante a analizar (id o nombre visible)")
+    args = parser.parse_args()
+    for folder in ['photos', 'deleted_photos']:
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+    asyncio.run(main(args.export, args.sender))
\ No newline at end of file